@@ -1,14 +1,19 @@
 import { useEffect, useRef, useCallback } from "react";
 import { useStore } from "@/store/useStore";
-import type { WsEvent, Message } from "@/types";
+import type { Agent, WsEvent, Message } from "@/types";
 import { api } from "@/services/api";
 
 const WS_URL = "ws://127.0.0.1:8000/ws/agents/";
 const RECONNECT_DELAY = 3000;
+const INBOX_TOPIC = "status:unassigned";
 
 export function useWebSocket() {
   const wsRef = useRef<WebSocket | null>(null);
   const reconnectTimer = useRef<ReturnType<typeof setTimeout>>();
+  // Handlers read the current agent, so switching agents keeps the connection
+  const activeAgentRef = useRef<Agent | null>(null);
+  // Agent topic the open connection is subscribed to
+  const agentTopicRef = useRef<string | null>(null);
   const {
     setWsConnected,
     prependMessage,
@@ -16,6 +21,20 @@ export function useWebSocket() {
     removeMessage,
     activeAgent,
   } = useStore();
+  activeAgentRef.current = activeAgent;
+
+  // Only the inbox and this agent's own tickets, instead of every event
+  const syncTopics = useCallback((ws: WebSocket) => {
+    const agent = activeAgentRef.current;
+    const agentTopic = agent ? `agent:${agent.external_id}` : null;
+    if (agentTopicRef.current && agentTopicRef.current !== agentTopic) {
+      ws.send(JSON.stringify({ action: "unsubscribe", topics: [agentTopicRef.current] }));
+    }
+    const topics = [INBOX_TOPIC];
+    if (agentTopic) topics.push(agentTopic);
+    ws.send(JSON.stringify({ action: "subscribe", topics }));
+    agentTopicRef.current = agentTopic;
+  }, []);
 
   const connect = useCallback(() => {
     if (wsRef.current?.readyState === WebSocket.OPEN) return;
@@ -26,16 +45,19 @@ export function useWebSocket() {
     ws.onopen = () => {
       console.log("[WS] Connected");
       setWsConnected(true);
+      agentTopicRef.current = null;
+      syncTopics(ws);
     };
 
     ws.onmessage = async (event) => {
+      const activeAgent = activeAgentRef.current;
       try {
         const data: WsEvent = JSON.parse(event.data);
 
         if (data.type === "message_new") {
-          // Fetch full message details
-          const messages = await api.getMessages("unassigned");
-          const newMsg = messages.find(
+          // Fetch the inbox row for the new ticket
+          const page = await api.getMessages("unassigned");
+          const newMsg = page.results.find(
             (m: Message) => m.external_id === data.message_id
           );
           if (newMsg) {
@@ -53,6 +75,21 @@ export function useWebSocket() {
               assigned_to: data.assigned_to,
             });
           }
+        } else if (data.type === "messages_bulk_update") {
+          // One event for a whole bulk action; assigned_to is absent when closing
+          for (const messageId of data.message_ids) {
+            if (
+              data.status === "in_progress" &&
+              data.assigned_to !== activeAgent?.external_id
+            ) {
+              removeMessage(messageId);
+            } else {
+              updateMessage(messageId, {
+                status: data.status as Message["status"],
+                ...("assigned_to" in data ? { assigned_to: data.assigned_to } : {}),
+              });
+            }
+          }
         }
       } catch (err) {
         console.error("[WS] Parse error:", err);
@@ -69,15 +106,25 @@ export function useWebSocket() {
       console.error("[WS] Error:", err);
       ws.close();
     };
-  }, [setWsConnected, prependMessage, updateMessage, removeMessage, activeAgent]);
+  }, [setWsConnected, prependMessage, updateMessage, removeMessage, syncTopics]);
 
   useEffect(() => {
     connect();
     return () => {
       clearTimeout(reconnectTimer.current);
-      wsRef.current?.close();
+      if (wsRef.current) {
+        // Closed on purpose: no reconnect
+        wsRef.current.onclose = null;
+        wsRef.current.close();
+      }
     };
   }, [connect]);
 
+  // Move the agent subscription when the active agent changes
+  useEffect(() => {
+    const ws = wsRef.current;
+    if (ws?.readyState === WebSocket.OPEN) syncTopics(ws);
+  }, [activeAgent, syncTopics]);
+
   return wsRef;
 }
@@ -27,25 +27,26 @@ export default function InboxPage() {
   const [loadingMore, setLoadingMore] = useState(false);
   const [search, setSearch] = useState("");
   const [filter, setFilter] = useState<"unassigned" | "all">("unassigned");
-  const [page, setPage] = useState(1);
-  const [hasNextPage, setHasNextPage] = useState(false);
+  // Cursor link to the next page, null on the last one
+  const [nextUrl, setNextUrl] = useState<string | null>(null);
   const navigate = useNavigate();
 
-  const fetchMessages = (pageNum: number = 1) => {
-    if (pageNum === 1) setLoading(true);
-    else setLoadingMore(true);
+  const fetchMessages = (more: boolean = false) => {
+    if (more) setLoadingMore(true);
+    else setLoading(true);
 
     api
-      .getMessages(filter === "all" ? undefined : filter, pageNum)
+      .getMessages(filter === "all" ? undefined : filter, more ? nextUrl : null)
       .then((res) => {
         const data = res.results || (Array.isArray(res) ? res : []);
-        if (pageNum === 1) {
-          setMessages(data);
+        if (more) {
+          // A ticket pushed over the websocket may already be listed
+          const listed = new Set(messages.map((m) => m.external_id));
+          setMessages([...messages, ...data.filter((m) => !listed.has(m.external_id))]);
         } else {
-          setMessages([...messages, ...data]);
+          setMessages(data);
         }
-        setHasNextPage(!!res.next);
-        setPage(pageNum);
+        setNextUrl(res.next);
       })
       .catch(console.error)
       .finally(() => {
@@ -55,13 +56,13 @@ export default function InboxPage() {
   };
 
   useEffect(() => {
-    fetchMessages(1);
+    fetchMessages();
   }, [filter]);
 
   const filtered = messages
     .filter(
       (m) =>
-        m.body.toLowerCase().includes(search.toLowerCase()) ||
+        m.body_snippet.toLowerCase().includes(search.toLowerCase()) ||
         (m.customer.name || "Unknown").toLowerCase().includes(search.toLowerCase())
     )
     .sort((a, b) => b.priority - a.priority);
@@ -84,7 +85,7 @@ export default function InboxPage() {
           </p>
         </div>
         <button
-          onClick={() => fetchMessages(1)}
+          onClick={() => fetchMessages()}
           className="p-2 rounded-lg text-muted-foreground hover:text-foreground hover:bg-secondary transition-colors"
         >
           <RefreshCw className={`w-4 h-4 ${loading ? "animate-spin" : ""}`} />
@@ -148,7 +149,7 @@ export default function InboxPage() {
                     <span className="font-medium text-sm truncate">{msg.customer.name || "Unknown"}</span>
                     <span className={`priority-badge ${pInfo.className}`}>{pInfo.label}</span>
                   </div>
-                  <p className="text-sm text-muted-foreground truncate">{msg.body}</p>
+                  <p className="text-sm text-muted-foreground truncate">{msg.body_snippet}</p>
                 </div>
                 <div className="flex items-center gap-1 text-xs text-muted-foreground shrink-0">
                   <Clock className="w-3 h-3" />
@@ -160,9 +161,9 @@ export default function InboxPage() {
               </button>
             );
           })}
-          {hasNextPage && (
+          {nextUrl && (
             <button
-              onClick={() => fetchMessages(page + 1)}
+              onClick={() => fetchMessages(true)}
               disabled={loadingMore}
               className="w-full py-3 mt-4 rounded-xl bg-secondary text-secondary-foreground text-sm font-medium hover:bg-secondary/80 transition-colors flex items-center justify-center gap-2"
             >
@@ -1,7 +1,7 @@
 import { useState, useEffect } from "react";
 import { useStore } from "@/store/useStore";
 import { api } from "@/services/api";
-import type { CannedResponse } from "@/types";
+import type { CannedResponse, MessageThread } from "@/types";
 import {
   MessageSquare,
   Send,
@@ -25,6 +25,7 @@ export default function WorkspacePage() {
   const [sending, setSending] = useState(false);
   const [claimed, setClaimed] = useState(false);
   const [previewCanned, setPreviewCanned] = useState<CannedResponse | null>(null);
+  const [thread, setThread] = useState<MessageThread | null>(null);
   const navigate = useNavigate();
 
   useEffect(() => {
@@ -33,6 +34,15 @@ export default function WorkspacePage() {
       .catch(console.error);
   }, []);
 
+  // Inbox rows only carry a snippet; the body and replies come from the ticket itself
+  const loadThread = (externalId: string) =>
+    api.getMessage(externalId).then(setThread).catch(() => toast.error("Failed to load ticket thread"));
+
+  useEffect(() => {
+    setThread(null);
+    if (selectedMessage) loadThread(selectedMessage.external_id);
+  }, [selectedMessage?.external_id]);
+
   if (!selectedMessage) {
     return (
       <div className="flex items-center justify-center h-full text-muted-foreground">
@@ -74,6 +84,7 @@ export default function WorkspacePage() {
       await api.replyMessage(msg.external_id, activeAgent.external_id, replyText);
       toast.success("Reply sent");
       setReplyText("");
+      loadThread(msg.external_id);
     } catch {
       toast.error("Failed to send reply");
     } finally {
@@ -87,6 +98,7 @@ export default function WorkspacePage() {
     try {
       await api.useCanned(msg.external_id, activeAgent.external_id, canned.external_id);
       toast.success(`Sent canned: "${canned.title}"`);
+      loadThread(msg.external_id);
     } catch {
       toast.error("Failed to send canned response");
     } finally {
@@ -123,12 +135,17 @@ export default function WorkspacePage() {
                   <span className="text-xs">{new Date(msg.created_at).toLocaleString()}</span>
                 </div>
                 <div className="bg-secondary/50 rounded-lg rounded-tl-none p-3 text-sm">
-                  {msg.body}
+                  {thread ? thread.body : msg.body_snippet}
                 </div>
               </div>
 
               {/* Replies */}
-              {(msg.replies || []).map((reply) => (
+              {!thread && msg.reply_count > 0 && (
+                <div className="flex justify-center py-2 text-muted-foreground">
+                  <Loader2 className="w-4 h-4 animate-spin" />
+                </div>
+              )}
+              {(thread?.replies || []).map((reply) => (
                 <div 
                   key={reply.external_id} 
                   className={`flex flex-col ${reply.is_customer ? "mb-2" : "mb-2 items-end"}`}
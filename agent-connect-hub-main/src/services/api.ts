@@ -1,5 +1,5 @@
 import axios from "axios";
-import type { Agent, Message, CannedResponse, ApiResponse, PaginatedResponse } from "@/types";
+import type { Agent, Message, MessageThread, CannedResponse, ApiResponse, PaginatedResponse } from "@/types";
 
 const BASE_URL = "http://127.0.0.1:8000";
 
@@ -12,11 +12,17 @@ export const api = {
   // Agents
   getAgents: () => client.get<PaginatedResponse<Agent>>("/api/agents/").then((r) => r.data.results || (Array.isArray(r.data) ? r.data : [])),
 
-  // Messages
-  getMessages: (status?: string, page: number = 1) =>
-    client
-      .get<PaginatedResponse<Message>>("/api/messages/", { params: { ...(status ? { status } : {}), page } })
-      .then((r) => r.data),
+  // Messages: a first page, or the page behind a previous response's `next` link
+  // (a keyset cursor URL that already carries the status filter)
+  getMessages: (status?: string, next?: string | null) =>
+    (next
+      ? client.get<PaginatedResponse<Message>>(next)
+      : client.get<PaginatedResponse<Message>>("/api/messages/", { params: status ? { status } : {} })
+    ).then((r) => r.data),
+
+  // Full thread for the workspace; list rows only carry a summary
+  getMessage: (messageId: string) =>
+    client.get<MessageThread>(`/api/messages/${messageId}/`).then((r) => r.data),
 
   claimMessage: (messageId: string, agentId: string) =>
     client
@@ -19,7 +19,27 @@ export interface MessageReply {
   created_at: string;
 }
 
+export interface LastReply {
+  created_at: string;
+  is_customer: boolean;
+  agent: string | null;
+}
+
+// Inbox row from GET /api/messages/: a body snippet and thread summary only
 export interface Message {
+  external_id: string;
+  customer: Customer;
+  body_snippet: string;
+  status: "unassigned" | "in_progress" | "closed";
+  priority: number;
+  assigned_to: Agent | null;
+  reply_count: number;
+  last_reply: LastReply | null;
+  created_at: string;
+}
+
+// Full ticket from GET /api/messages/<id>/ (live or archived)
+export interface MessageThread {
   external_id: string;
   customer: Customer;
   body: string;
@@ -28,6 +48,7 @@ export interface Message {
   assigned_to: Agent | null;
   replies: MessageReply[];
   created_at: string;
+  archived_at?: string;
 }
 
 export interface CannedResponse {
@@ -63,4 +84,12 @@ export interface WsMessageUpdate {
   assigned_to: string;
 }
 
-export type WsEvent = WsNewMessage | WsMessageUpdate;
+export interface WsMessagesBulkUpdate {
+  type: "messages_bulk_update";
+  action: "close" | "reassign" | "unassign";
+  status: string;
+  message_ids: string[];
+  assigned_to?: string | null;
+}
+
+export type WsEvent = WsNewMessage | WsMessageUpdate | WsMessagesBulkUpdate;
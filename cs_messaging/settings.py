@@ -14,6 +14,7 @@ from pathlib import Path
 from dotenv import load_dotenv
 load_dotenv()
 import dj_database_url
+from corsheaders.defaults import default_headers
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -85,20 +86,90 @@ WSGI_APPLICATION = 'cs_messaging.wsgi.application'
 CELERY_TIMEZONE = "UTC"
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
-CELERY_BROKER_URL = "redis://127.0.0.1:6379/1"
-CELERY_RESULT_BACKEND = "redis://127.0.0.1:6379/1"
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://127.0.0.1:6379/1")
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", CELERY_BROKER_URL)
+
+# How often (seconds) the stats counters are rewritten from the database
+MESSAGE_COUNTERS_RECONCILE_INTERVAL = 10 * 60
+# Interaction logs are queued in Redis after commit and bulk-inserted by a worker,
+# every INTERACTION_LOG_FLUSH_INTERVAL seconds or as soon as a batch is full.
+# With buffering off (or Redis down) they are inserted right after commit.
+INTERACTION_LOG_BUFFERED = os.getenv("INTERACTION_LOG_BUFFERED", "true").lower() == "true"
+INTERACTION_LOG_BATCH_SIZE = int(os.getenv("INTERACTION_LOG_BATCH_SIZE", "500"))
+INTERACTION_LOG_FLUSH_INTERVAL = float(os.getenv("INTERACTION_LOG_FLUSH_INTERVAL", "5"))
+# Retention: closed tickets idle this long move to the archive tables with their thread,
+# interaction logs older than ARCHIVE_LOGS_AFTER_DAYS move to the log archive
+ARCHIVE_CLOSED_AFTER_DAYS = int(os.getenv("ARCHIVE_CLOSED_AFTER_DAYS", "90"))
+ARCHIVE_LOGS_AFTER_DAYS = int(os.getenv("ARCHIVE_LOGS_AFTER_DAYS", "180"))
+ARCHIVE_INTERVAL = 24 * 60 * 60
+# Websocket events go through the OutboxEvent table and the relay process (manage.py relay_outbox)
+# instead of being sent after commit by the web process. Only enable it where a relay runs.
+REALTIME_OUTBOX = os.getenv("REALTIME_OUTBOX", "false").lower() == "true"
+OUTBOX_RELAY_INTERVAL = float(os.getenv("OUTBOX_RELAY_INTERVAL", "0.2"))
+OUTBOX_RELAY_BATCH_SIZE = int(os.getenv("OUTBOX_RELAY_BATCH_SIZE", "500"))
+# Seconds a relay may spend sending a batch before another relay takes it over
+OUTBOX_CLAIM_TIMEOUT = int(os.getenv("OUTBOX_CLAIM_TIMEOUT", "30"))
+# An oldest pending event older than this (seconds) means no relay is draining the outbox
+OUTBOX_BACKLOG_ALERT_AGE = int(os.getenv("OUTBOX_BACKLOG_ALERT_AGE", "60"))
+# How often (seconds) the hot inbox is compared with the database, and rebuilt if it drifted
+HOT_INBOX_CHECK_INTERVAL = int(os.getenv("HOT_INBOX_CHECK_INTERVAL", str(5 * 60)))
+CELERY_BEAT_SCHEDULE = {
+    "reconcile-message-counters": {
+        "task": "messaging.tasks.reconcile_message_counters",
+        "schedule": MESSAGE_COUNTERS_RECONCILE_INTERVAL,
+    },
+    "flush-interaction-logs": {
+        "task": "messaging.tasks.flush_interaction_logs",
+        "schedule": INTERACTION_LOG_FLUSH_INTERVAL,
+    },
+    "check-outbox-backlog": {
+        "task": "messaging.tasks.check_outbox_backlog",
+        "schedule": OUTBOX_BACKLOG_ALERT_AGE,
+    },
+    "check-hot-inbox": {
+        "task": "messaging.tasks.check_hot_inbox",
+        "schedule": HOT_INBOX_CHECK_INTERVAL,
+    },
+    "archive-old-records": {
+        "task": "messaging.tasks.archive_old_records",
+        "schedule": ARCHIVE_INTERVAL,
+    },
+}
 
 ASGI_APPLICATION = 'cs_messaging.asgi.application'
 
+REDIS_URL = os.getenv("REDIS_URL", "redis://127.0.0.1:6379/0")
+
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
         "CONFIG": {
-            "hosts":[os.getenv("REDIS_URL", "redis://127.0.0.1:6379/0")],
+            "hosts":[REDIS_URL],
         },
     },
 }
 
+# Shared cache for every worker (canned responses, agent lookups); its own Redis db
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("CACHE_REDIS_URL", "redis://127.0.0.1:6379/2"),
+        "KEY_PREFIX": "cs",
+    },
+}
+# Seconds a stored response is replayed for retries carrying the same Idempotency-Key
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", str(24 * 60 * 60)))
+# Seconds a worker trusts its in-process copy before re-checking the shared version key
+TWO_LEVEL_CACHE_VERSION_TTL = float(os.getenv("TWO_LEVEL_CACHE_VERSION_TTL", "1"))
+
+# Redis sorted-set copy of the unassigned inbox, serves its first page without the DB
+HOT_INBOX_ENABLED = os.getenv("HOT_INBOX_ENABLED", "true").lower() == "true"
+
+# Automatic assignment of new tickets: "" (agents claim manually), "least_loaded", "round_robin" or "skill"
+TICKET_ROUTING_STRATEGY = os.getenv("TICKET_ROUTING_STRATEGY", "")
+# Agent load for routing: "redis" (shared across workers, strict capacity) or "memory" (per process)
+TICKET_ROUTING_LOAD_BACKEND = os.getenv("TICKET_ROUTING_LOAD_BACKEND", "redis")
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -141,6 +212,8 @@ USE_I18N = True
 USE_TZ = True
 
 CORS_ALLOW_ALL_ORIGINS = True  # For dev purposes, since frontend uses Vite randomly assigned ports sometimes
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
+CORS_EXPOSE_HEADERS = ["idempotent-replayed"]
 
 
 
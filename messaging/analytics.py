@@ -0,0 +1,204 @@
+from collections import defaultdict
+from datetime import timezone as dt_timezone
+from django.db import connection, transaction
+from django.db.models import F, Max
+from .models import (
+    AgentHourlySLAStats, ArchivedInteractionLog, HourlySLAStats, InteractionLog, Message, TicketSLA
+)
+
+# Actions that (re)assign the ticket to the log's agent
+ASSIGNING_ACTIONS = {"CLAIMED", "ROUTED", "REASSIGNED"}
+
+# Metric -> (starting milestone, completing milestone, agent credited, count field, seconds field)
+METRICS = {
+    "claim": ("created_at", "claimed_at", "claimed_by_id", "claimed", "claim_seconds"),
+    "first_reply": ("created_at", "first_reply_at", "first_reply_by_id", "first_replies", "first_reply_seconds"),
+    "handle": ("claimed_at", "closed_at", "agent_id", "closed", "handle_seconds"),
+}
+
+
+# PostgreSQL advisory lock id that rollup writers share and rebuild() takes exclusively
+ROLLUP_LOCK_ID = 0x534C41
+
+
+def _hour(ts):
+    return ts.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+class SLARollup:
+    """
+    Time-to-claim, time-to-first-reply and handle time per hour and per agent hour,
+    maintained incrementally from InteractionLog events.
+
+    apply() folds a batch of log rows into each ticket's TicketSLA milestones and adds
+    every metric that batch completes to HourlySLAStats / AgentHourlySLAStats. It runs
+    in the same transaction that inserts the logs (InteractionLogBuffer), so the rollups
+    count each stored event once. Events may arrive out of order across batches: a
+    metric is counted when both its milestones are known, whichever arrives last.
+    """
+
+    @staticmethod
+    def lock(exclusive: bool = False):
+        """
+        Take the rollup lock until the current transaction ends: shared for writers of the
+        log or the rollups (apply, log archival), exclusive for rebuild(). PostgreSQL only;
+        SQLite already serializes write transactions.
+        """
+        if connection.vendor != 'postgresql':
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT pg_advisory_xact_lock{'' if exclusive else '_shared'}(%s)", [ROLLUP_LOCK_ID])
+
+    @classmethod
+    def apply(cls, logs):
+        if not logs:
+            return
+        message_ids = {log.message_id for log in logs}
+
+        with transaction.atomic():
+            cls.lock()
+            TicketSLA.objects.bulk_create([TicketSLA(message_id=pk) for pk in message_ids], ignore_conflicts=True)
+            states = {state.message_id: state for state in TicketSLA.objects.select_for_update().filter(message_id__in=message_ids)}
+            hourly, per_agent = cls._fold_all(logs, states, lambda log: log.message_id)
+
+            TicketSLA.objects.bulk_update(
+                states.values(),
+                ['created_at', 'claimed_at', 'claimed_by', 'first_reply_at', 'first_reply_by', 'closed_at', 'agent']
+            )
+            cls._add_stats(hourly, per_agent)
+
+    @classmethod
+    def _fold_all(cls, logs, states, ticket_of):
+        # Fold `logs`, oldest first, into states[ticket_of(log)]; returns the hourly and per-agent deltas
+        hourly = defaultdict(lambda: defaultdict(int))
+        per_agent = defaultdict(lambda: defaultdict(int))
+        for log in sorted(logs, key=lambda log: log.timestamp):
+            state = states[ticket_of(log)]
+            before = cls._completed(state)
+            cls._fold(state, log, hourly, per_agent)
+            for metric in cls._completed(state) - before:
+                start, end, credited, count_field, seconds_field = METRICS[metric]
+                seconds = max((getattr(state, end) - getattr(state, start)).total_seconds(), 0)
+                buckets = [hourly[_hour(getattr(state, end))]]
+                if getattr(state, credited):
+                    buckets.append(per_agent[(getattr(state, credited), _hour(getattr(state, end)))])
+                for bucket in buckets:
+                    bucket[count_field] += 1
+                    bucket[seconds_field] += seconds
+        return hourly, per_agent
+
+    @classmethod
+    def _add_stats(cls, hourly, per_agent):
+        cls._add(HourlySLAStats, ('hour',), {(hour,): deltas for hour, deltas in hourly.items()})
+        cls._add(AgentHourlySLAStats, ('agent_id', 'hour'), per_agent)
+
+    @staticmethod
+    def _completed(state) -> set:
+        return {
+            metric for metric, (start, end, *_) in METRICS.items()
+            if getattr(state, start) is not None and getattr(state, end) is not None
+        }
+
+    @staticmethod
+    def _fold(state, log, hourly, per_agent):
+        ts, agent_id, hour = log.timestamp, log.agent_id, _hour(log.timestamp)
+        if log.action == "CREATED":
+            if state.created_at is None:
+                state.created_at = ts
+                hourly[hour]["created"] += 1
+        elif log.action in ASSIGNING_ACTIONS:
+            if state.claimed_at is None:
+                state.claimed_at, state.claimed_by_id = ts, agent_id
+            state.agent_id = agent_id
+        elif log.action == "UNASSIGNED":
+            state.agent_id = None
+        elif log.action == "REPLIED":
+            hourly[hour]["replies"] += 1
+            if agent_id:
+                per_agent[(agent_id, hour)]["replies"] += 1
+            if state.first_reply_at is None:
+                state.first_reply_at, state.first_reply_by_id = ts, agent_id
+        elif log.action == "CUSTOMER_REPLIED":
+            hourly[hour]["customer_replies"] += 1
+        elif log.action == "CLOSED":
+            # Handle time runs to the first close; a re-opened ticket keeps it
+            if state.closed_at is None:
+                state.closed_at = ts
+
+    @staticmethod
+    def _add(model, key_fields, deltas):
+        # Make sure every row exists, then increment in SQL so concurrent writers add up
+        model.objects.bulk_create(
+            [model(**dict(zip(key_fields, key))) for key in deltas], ignore_conflicts=True
+        )
+        for key, fields in deltas.items():
+            model.objects.filter(**dict(zip(key_fields, key))).update(
+                **{field: F(field) + value for field, value in fields.items()}
+            )
+
+    @classmethod
+    def rebuild(cls, chunk_size: int = 500) -> int:
+        """
+        Recompute every rollup from the full history: ArchivedInteractionLog first (see
+        _replay_archive), then InteractionLog `chunk_size` rows at a time in id order.
+        It all runs in one transaction holding the rollup lock exclusively: readers keep
+        seeing the old rollups until the new ones replace them at commit, and log flushes
+        and archive runs wait (flushes stay queued in Redis) instead of landing between
+        the replay and the swap. Returns the number of log rows processed.
+        """
+        with transaction.atomic():
+            cls.lock(exclusive=True)
+            # Logs committed from here on wait for the lock, and are applied after the swap
+            upto = InteractionLog.objects.aggregate(last=Max('id'))['last'] or 0
+            archived_upto = ArchivedInteractionLog.objects.aggregate(last=Max('id'))['last'] or 0
+            TicketSLA.objects.all().delete()
+            HourlySLAStats.objects.all().delete()
+            AgentHourlySLAStats.objects.all().delete()
+
+            processed, last_id = cls._replay_archive(archived_upto, chunk_size), 0
+            while last_id < upto:
+                chunk = list(
+                    InteractionLog.objects.filter(id__gt=last_id, id__lte=upto).order_by('id')
+                    .only('id', 'message_id', 'agent_id', 'action', 'timestamp')[:chunk_size]
+                )
+                if not chunk:
+                    break
+                cls.apply(chunk)
+                processed += len(chunk)
+                last_id = chunk[-1].id
+        return processed
+
+    @classmethod
+    def _replay_archive(cls, upto: int, chunk_size: int) -> int:
+        """
+        Fold the archived logs (id <= `upto`) into the rollups, `chunk_size` tickets at a time.
+        A ticket still live goes through apply(), and its recent logs fold on top afterwards;
+        an archived ticket took all its logs along, so its milestones are folded in memory
+        and only the rollup deltas are stored.
+        """
+        archived = ArchivedInteractionLog.objects.filter(id__lte=upto)
+        processed, last_key = 0, None
+        while True:
+            keys = archived.order_by('message_external_id').values_list('message_external_id', flat=True).distinct()
+            if last_key is not None:
+                keys = keys.filter(message_external_id__gt=last_key)
+            keys = list(keys[:chunk_size])
+            if not keys:
+                break
+            last_key = keys[-1]
+
+            logs = list(archived.filter(message_external_id__in=keys))
+            live = dict(Message.objects.filter(external_id__in=keys).values_list('external_id', 'pk'))
+            cls.apply([
+                InteractionLog(
+                    message_id=live[log.message_external_id], agent_id=log.agent_id,
+                    action=log.action, timestamp=log.timestamp,
+                )
+                for log in logs if log.message_external_id in live
+            ])
+            gone = [log for log in logs if log.message_external_id not in live]
+            states = {log.message_external_id: TicketSLA() for log in gone}
+            with transaction.atomic():
+                cls._add_stats(*cls._fold_all(gone, states, lambda log: log.message_external_id))
+            processed += len(logs)
+        return processed
@@ -0,0 +1,155 @@
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .analytics import SLARollup
+from .counters import MessageCounters
+from .models import Agent, ArchivedInteractionLog, ArchivedMessage, InteractionLog, Message, MessageReply
+from .serializers import MessageReplyObjectSerializer
+from .utils import calculate_keyword_score
+
+
+class TicketArchiver:
+    """
+    Moves cold rows out of the live tables so the inbox indexes stay small:
+    - closed tickets with no activity (reply or log) for ARCHIVE_CLOSED_AFTER_DAYS
+      become ArchivedMessage rows with their thread inline, their logs move along
+    - InteractionLog rows older than ARCHIVE_LOGS_AFTER_DAYS move to ArchivedInteractionLog
+    Each chunk is copied and deleted in its own transaction, so a run can be stopped
+    at any point and resumed by the next one. restore() moves one ticket back, for a
+    customer replying to it.
+    """
+
+    @classmethod
+    def run(cls, closed_days: int = None, log_days: int = None, chunk_size: int = 500) -> dict:
+        now = timezone.now()
+        closed_days = settings.ARCHIVE_CLOSED_AFTER_DAYS if closed_days is None else closed_days
+        log_days = settings.ARCHIVE_LOGS_AFTER_DAYS if log_days is None else log_days
+        return {
+            "messages": cls.archive_closed(now - timedelta(days=closed_days), chunk_size),
+            "logs": cls.archive_logs(now - timedelta(days=log_days), chunk_size),
+        }
+
+    @staticmethod
+    def closed_before(cutoff):
+        # Closed tickets whose last reply and last log entry are older than `cutoff`
+        return Message.objects.filter(status=Message.STATUS_CLOSED, created_at__lt=cutoff).exclude(
+            Exists(MessageReply.objects.filter(message=OuterRef('pk'), created_at__gte=cutoff))
+        ).exclude(
+            Exists(InteractionLog.objects.filter(message=OuterRef('pk'), timestamp__gte=cutoff))
+        )
+
+    @classmethod
+    def archive_closed(cls, cutoff, chunk_size: int = 500) -> int:
+        archived = 0
+        while True:
+            with transaction.atomic():
+                # Tickets a bulk action holds are left for the next run
+                pks = list(
+                    cls.closed_before(cutoff).select_for_update(skip_locked=True).order_by('id')
+                    .values_list('pk', flat=True)[:chunk_size]
+                )
+                if not pks:
+                    break
+                messages = list(
+                    Message.objects.filter(pk__in=pks).select_related('assigned_to').prefetch_related(
+                        Prefetch('replies', queryset=MessageReply.objects.select_related('agent').order_by('created_at', 'id'))
+                    )
+                )
+                ArchivedMessage.objects.bulk_create([
+                    ArchivedMessage(
+                        external_id=msg.external_id,
+                        customer_id=msg.customer_id,
+                        assigned_to_id=msg.assigned_to_id,
+                        body=msg.body,
+                        status=msg.status,
+                        timestamp=msg.timestamp,
+                        created_at=msg.created_at,
+                        claimed_at=msg.claimed_at,
+                        replies=MessageReplyObjectSerializer(msg.replies.all(), many=True).data,
+                    )
+                    for msg in messages
+                ])
+                cls._move_logs(InteractionLog.objects.filter(message_id__in=pks))
+                # Replies and the SLA milestones go with the ticket; the analytics rollups stay
+                Message.objects.filter(pk__in=pks).delete()
+                MessageCounters.record_removed(
+                    (msg.status, msg.assigned_to.external_id if msg.assigned_to else None) for msg in messages
+                )
+            archived += len(pks)
+        return archived
+
+    @classmethod
+    def archive_logs(cls, cutoff, chunk_size: int = 500) -> int:
+        moved = 0
+        while True:
+            with transaction.atomic():
+                pks = list(
+                    InteractionLog.objects.filter(timestamp__lt=cutoff).order_by('timestamp', 'id')
+                    .values_list('pk', flat=True)[:chunk_size]
+                )
+                if not pks:
+                    break
+                cls._move_logs(InteractionLog.objects.filter(pk__in=pks))
+            moved += len(pks)
+        return moved
+
+    @staticmethod
+    def _move_logs(logs):
+        # Not while SLARollup.rebuild() replays the two log tables
+        SLARollup.lock()
+        rows = list(logs.values_list('pk', 'message__external_id', 'agent_id', 'action', 'timestamp'))
+        ArchivedInteractionLog.objects.bulk_create([
+            ArchivedInteractionLog(message_external_id=external_id, agent_id=agent_id, action=action, timestamp=timestamp)
+            for _, external_id, agent_id, action, timestamp in rows
+        ], batch_size=1000)
+        InteractionLog.objects.filter(pk__in=[row[0] for row in rows]).delete()
+
+    @staticmethod
+    def restore(external_id) -> Message:
+        """
+        Move an archived ticket back into the live tables with its thread, still closed.
+        Returns the live ticket, or None if it was never archived. Its logs stay archived
+        (SLARollup.rebuild folds them by external_id); its SLA milestones start over.
+        """
+        with transaction.atomic():
+            archived = ArchivedMessage.objects.select_for_update(of=('self',)).select_related('assigned_to').filter(
+                external_id=external_id
+            ).first()
+            if archived is None:
+                # Never archived, or a concurrent restore got here first
+                return Message.objects.select_related('assigned_to').filter(external_id=external_id).first()
+
+            # bulk_create: no message_new broadcast for a ticket that is not new
+            msg, = Message.objects.bulk_create([Message(
+                external_id=archived.external_id,
+                customer_id=archived.customer_id,
+                assigned_to=archived.assigned_to,
+                body=archived.body,
+                status=archived.status,
+                timestamp=archived.timestamp,
+                created_at=archived.created_at,
+                claimed_at=archived.claimed_at,
+                keyword_score=calculate_keyword_score(archived.body),
+            )])
+            agents = dict(Agent.objects.filter(
+                external_id__in={reply['agent']['external_id'] for reply in archived.replies if reply['agent']}
+            ).values_list('external_id', 'pk'))
+            MessageReply.objects.bulk_create([
+                MessageReply(
+                    external_id=reply['external_id'],
+                    message=msg,
+                    agent_id=agents.get(uuid.UUID(reply['agent']['external_id'])) if reply['agent'] else None,
+                    is_customer=reply['is_customer'],
+                    text=reply['text'],
+                    created_at=parse_datetime(reply['created_at']),
+                )
+                for reply in archived.replies
+            ])
+            archived.delete()
+            agent = archived.assigned_to.external_id if archived.assigned_to else None
+            MessageCounters.record_transition(None, msg.status, new_agent=agent)
+        return msg
@@ -0,0 +1,200 @@
+import json
+import logging
+import uuid
+from datetime import datetime
+import redis
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, transaction
+from django.utils import timezone
+from .analytics import SLARollup
+from .models import Agent, InteractionLog, Message
+from .utils import get_redis
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = "messaging:interaction_log:queue"
+FLUSH_LOCK_KEY = "messaging:interaction_log:flush_lock"
+# Entries a flush could not store, with the error, kept for inspection instead of blocking the queue
+DEAD_LETTER_KEY = "messaging:interaction_log:dead_letter"
+# Seconds one flusher may hold the lock per batch
+FLUSH_LOCK_TIMEOUT = 60
+
+
+class InteractionLogBuffer:
+    """
+    Write-behind buffer for InteractionLog rows.
+
+    Services record entries inside their transaction; on commit the entries are pushed
+    to a Redis list, so the request (and any row lock it holds) never waits on an audit
+    INSERT. flush() drains the list with bulk_create in batches: the periodic
+    flush_interaction_logs task runs it every INTERACTION_LOG_FLUSH_INTERVAL seconds,
+    and an enqueue that fills a batch triggers it early.
+    Entries leave the list only after their batch is inserted, so a batch can be delivered
+    twice (a flush dying between the insert and the trim); each entry carries an entry_id
+    and one already stored is skipped, so neither the log nor the SLA rollups count it twice.
+    An entry that cannot be stored (malformed, or rejected by the database) is moved to
+    DEAD_LETTER_KEY so the rest of its batch, and the queue behind it, still go through.
+    When Redis is unreachable (or INTERACTION_LOG_BUFFERED is off) the entries are
+    inserted directly after commit instead.
+
+    The log is best effort: entries are pushed after the commit, so a process dying in
+    between, or a Redis restart without persistence, loses them. Run Redis with AOF, or
+    turn INTERACTION_LOG_BUFFERED off where every entry must be kept.
+    """
+
+    @classmethod
+    def record(cls, message_id: int, action: str, agent_id: int = None, timestamp: datetime = None):
+        cls.record_many([(message_id, action, agent_id, timestamp)])
+
+    @classmethod
+    def record_many(cls, entries):
+        """
+        `entries`: (message_id, action, agent_id, timestamp) tuples, written once the transaction commits.
+        """
+        payloads = [
+            {
+                "message_id": message_id,
+                "action": action,
+                "agent_id": agent_id,
+                "timestamp": (timestamp or timezone.now()).isoformat(),
+                "entry_id": uuid.uuid4().hex,
+            }
+            for message_id, action, agent_id, timestamp in entries
+        ]
+        if payloads:
+            transaction.on_commit(lambda: cls._enqueue(payloads))
+
+    @classmethod
+    def _enqueue(cls, payloads):
+        if not settings.INTERACTION_LOG_BUFFERED:
+            cls._write(payloads)
+            return
+        try:
+            length = get_redis().rpush(QUEUE_KEY, *[json.dumps(payload) for payload in payloads])
+        except redis.RedisError as e:
+            logger.warning(f"Interaction log queue unavailable, writing {len(payloads)} entries directly: {str(e)}")
+            cls._write(payloads)
+            return
+
+        batch_size = settings.INTERACTION_LOG_BATCH_SIZE
+        if length >= batch_size > length - len(payloads):
+            # This push filled a batch: flush now rather than at the next interval
+            from .tasks import flush_interaction_logs
+            try:
+                flush_interaction_logs.delay()
+            except Exception as e:
+                logger.warning(f"Could not schedule interaction log flush, leaving it to the periodic task: {str(e)}")
+
+    @classmethod
+    def flush(cls, batch_size: int = None) -> int:
+        """
+        Insert everything queued, batch by batch. Returns the number of entries written,
+        0 when another flusher holds the lock or Redis is unreachable.
+        """
+        batch_size = batch_size or settings.INTERACTION_LOG_BATCH_SIZE
+        r = get_redis()
+        try:
+            if not r.set(FLUSH_LOCK_KEY, "1", nx=True, ex=FLUSH_LOCK_TIMEOUT):
+                return 0
+        except redis.RedisError as e:
+            logger.warning(f"Interaction log queue unavailable, skipping flush: {str(e)}")
+            return 0
+        written = 0
+        try:
+            while True:
+                raw = r.lrange(QUEUE_KEY, 0, batch_size - 1)
+                if not raw:
+                    break
+                stored = cls._write_batch(r, raw)
+                r.ltrim(QUEUE_KEY, len(raw), -1)
+                r.expire(FLUSH_LOCK_KEY, FLUSH_LOCK_TIMEOUT)
+                written += stored
+                if len(raw) < batch_size:
+                    break
+        except (redis.RedisError, OperationalError, InterfaceError) as e:
+            # Whatever was not trimmed stays queued for the next flush
+            logger.error(f"Interaction log flush stopped after {written} entries: {str(e)}")
+        finally:
+            try:
+                r.delete(FLUSH_LOCK_KEY)
+            except redis.RedisError:
+                pass  # expires after FLUSH_LOCK_TIMEOUT
+        return written
+
+    @classmethod
+    def _write_batch(cls, r, raw):
+        """
+        Store one queued batch, dead-lettering the entries that cannot be stored.
+        Returns how many were not dead-lettered. A database outage is raised instead:
+        the whole batch stays queued.
+        """
+        payloads, dead = [], []
+        for item in raw:
+            try:
+                payloads.append(json.loads(item))
+            except ValueError as e:
+                dead.append((item.decode() if isinstance(item, bytes) else item, e))
+        # Savepoints, so a rejected statement does not abort an enclosing transaction
+        try:
+            with transaction.atomic():
+                cls._write(payloads)
+        except (OperationalError, InterfaceError):
+            raise
+        except Exception as e:
+            # Find the bad entries: retry one by one (already stored ones are skipped)
+            logger.warning(f"Interaction log batch of {len(payloads)} failed, retrying entry by entry: {str(e)}")
+            for payload in payloads:
+                try:
+                    with transaction.atomic():
+                        cls._write([payload])
+                except (OperationalError, InterfaceError):
+                    raise
+                except Exception as e:
+                    dead.append((json.dumps(payload, default=str), e))
+        if dead:
+            r.rpush(DEAD_LETTER_KEY, *[json.dumps({"entry": entry, "error": repr(e)}) for entry, e in dead])
+            logger.error(f"Moved {len(dead)} interaction log entries to {DEAD_LETTER_KEY}: {dead[0][1]!r}")
+        return len(raw) - len(dead)
+
+    @classmethod
+    def _write(cls, payloads):
+        # Tickets deleted (and agents removed) since the entry was recorded would fail the FKs
+        message_ids = set(Message.objects.filter(
+            pk__in={payload["message_id"] for payload in payloads}
+        ).values_list('pk', flat=True))
+        agent_ids = {payload["agent_id"] for payload in payloads if payload["agent_id"]}
+        if agent_ids:
+            agent_ids = set(Agent.objects.filter(pk__in=agent_ids).values_list('pk', flat=True))
+
+        # Entries stored by an earlier delivery of this batch (queued before entry ids: always new)
+        entry_ids = {payload["entry_id"] for payload in payloads if payload.get("entry_id")}
+        stored = set()
+        if entry_ids:
+            stored = {entry_id.hex for entry_id in InteractionLog.objects.filter(
+                entry_id__in=entry_ids
+            ).values_list('entry_id', flat=True)}
+
+        missing = {payload["message_id"] for payload in payloads} - message_ids
+        if missing:
+            logger.warning(f"Dropping interaction log entries for {len(missing)} tickets that no longer exist: {sorted(missing)[:20]}")
+
+        logs, seen = [], set()
+        for payload in payloads:
+            entry_id = payload.get("entry_id")
+            if payload["message_id"] not in message_ids or entry_id in stored or entry_id in seen:
+                continue
+            if entry_id:
+                seen.add(entry_id)
+            logs.append(InteractionLog(
+                message_id=payload["message_id"],
+                agent_id=payload["agent_id"] if payload["agent_id"] in agent_ids else None,
+                action=payload["action"],
+                timestamp=datetime.fromisoformat(payload["timestamp"]),
+                entry_id=entry_id,
+            ))
+        # Rollups commit together with the rows they count, so they always match the stored log.
+        # A concurrent insert of the same entries fails the unique entry_id: _write_batch then
+        # retries entry by entry, skipping the ones stored meanwhile
+        with transaction.atomic():
+            InteractionLog.objects.bulk_create(logs, batch_size=1000)
+            SLARollup.apply(logs)
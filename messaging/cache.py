@@ -0,0 +1,112 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+import redis
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Cached None is told apart from a miss with this sentinel
+_MISS = object()
+
+
+class TwoLevelCache:
+    """
+    Per-process LRU in front of the shared Django cache (Redis), for small, read-mostly tables.
+
+    Entries live under a namespace version held in the shared cache. invalidate() bumps
+    it (call it from save/delete signals), which orphans every entry in every worker at
+    once; stale versions simply expire. Each process re-reads the version at most every
+    TWO_LEVEL_CACHE_VERSION_TTL seconds, so a hot L1 hit costs neither a DB query nor,
+    most of the time, a Redis round trip.
+    While Redis is unreachable, reads go straight to the loader (the database) and
+    invalidate() only clears this process.
+    """
+
+    def __init__(self, namespace: str, maxsize: int = 1024, timeout: int = 60 * 60):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._version_key = f"messaging:cache:{namespace}:version"
+        self._lock = threading.Lock()
+        self._local = OrderedDict()
+        self._version = None
+        self._version_checked_at = 0.0
+
+    def get(self, key: str, loader):
+        """
+        Value for `key`, calling loader() on a miss in both levels. Exceptions from the loader
+        propagate and nothing is cached.
+        """
+        try:
+            version = self._current_version()
+        except redis.RedisError as e:
+            # Without the version neither level can be trusted to be current
+            logger.warning(f"Shared cache unavailable, loading {self.namespace}:{key} directly: {str(e)}")
+            return loader()
+        with self._lock:
+            value = self._local.get(key, _MISS)
+            if value is not _MISS:
+                self._local.move_to_end(key)
+                return value
+
+        shared_key = f"messaging:cache:{self.namespace}:{version}:{key}"
+        try:
+            value = cache.get(shared_key, _MISS)
+        except redis.RedisError as e:
+            logger.warning(f"Shared cache read of {self.namespace}:{key} failed: {str(e)}")
+            value = _MISS
+        if value is _MISS:
+            value = loader()
+            try:
+                cache.set(shared_key, value, self.timeout)
+            except redis.RedisError as e:
+                logger.warning(f"Shared cache write of {self.namespace}:{key} failed: {str(e)}")
+
+        with self._lock:
+            if self._version == version:
+                self._local[key] = value
+                self._local.move_to_end(key)
+                while len(self._local) > self.maxsize:
+                    self._local.popitem(last=False)
+        return value
+
+    def invalidate(self):
+        """
+        Drop every entry of the namespace, in all processes.
+        """
+        try:
+            try:
+                cache.incr(self._version_key)
+            except ValueError:
+                # Missing (first write or evicted): any fresh value differs from what readers hold
+                cache.set(self._version_key, time.time_ns(), None)
+        except redis.RedisError as e:
+            # Never fail the write that triggered this; other workers keep their entries
+            # until a later invalidation reaches Redis or the shared entries expire
+            logger.error(f"Could not invalidate the {self.namespace} cache in Redis, cleared this process only: {str(e)}")
+        with self._lock:
+            self._local.clear()
+            self._version = None
+
+    def _current_version(self):
+        now = time.monotonic()
+        if self._version is not None and now - self._version_checked_at < settings.TWO_LEVEL_CACHE_VERSION_TTL:
+            return self._version
+
+        version = cache.get(self._version_key)
+        if version is None:
+            cache.add(self._version_key, time.time_ns(), None)
+            version = cache.get(self._version_key)
+        with self._lock:
+            if version != self._version:
+                self._local.clear()
+                self._version = version
+            self._version_checked_at = now
+        return version
+
+
+agent_cache = TwoLevelCache("agents")
+canned_response_cache = TwoLevelCache("canned_responses")
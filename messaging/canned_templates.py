@@ -0,0 +1,52 @@
+import re
+
+# {{ name }} or {{ name | fallback when empty }}
+PLACEHOLDER_RE = re.compile(r"\{\{\s*(\w+)\s*(?:\|\s*([^}]*?)\s*)?\}\}")
+
+# Placeholder -> value for a ticket (message loaded with its customer) and the replying agent
+PLACEHOLDERS = {
+    "customer_name": lambda msg, agent: msg.customer.name,
+    "customer_first_name": lambda msg, agent: (msg.customer.name or "").split(" ")[0],
+    "customer_id": lambda msg, agent: msg.customer.user_id,
+    "ticket_id": lambda msg, agent: str(msg.external_id),
+    "agent_name": lambda msg, agent: agent.name,
+}
+CUSTOMER_PLACEHOLDERS = {"customer_name", "customer_first_name", "customer_id"}
+
+
+class CannedTemplate:
+    """
+    A canned response body parsed once into literal text and placeholders.
+    render() only joins strings, the reply path loads the customer with the message
+    when `needs_customer` is set.
+    """
+
+    def __init__(self, body: str):
+        self.parts = []
+        position = 0
+        for match in PLACEHOLDER_RE.finditer(body):
+            if match.start() > position:
+                self.parts.append(body[position:match.start()])
+            self.parts.append((match.group(1), match.group(2) or ""))
+            position = match.end()
+        if position < len(body):
+            self.parts.append(body[position:])
+        self.placeholders = {part[0] for part in self.parts if isinstance(part, tuple)}
+        self.needs_customer = bool(self.placeholders & CUSTOMER_PLACEHOLDERS)
+
+    @property
+    def unknown_placeholders(self) -> set:
+        return self.placeholders - PLACEHOLDERS.keys()
+
+    def render(self, msg, agent) -> str:
+        if not self.placeholders:
+            return self.parts[0] if self.parts else ""
+        out = []
+        for part in self.parts:
+            if isinstance(part, str):
+                out.append(part)
+            else:
+                name, fallback = part
+                resolve = PLACEHOLDERS.get(name)
+                out.append((resolve(msg, agent) if resolve else None) or fallback)
+        return "".join(out)
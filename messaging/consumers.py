@@ -1,24 +1,100 @@
 import json
+from collections import deque
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+from .topics import FIREHOSE_GROUP, MAX_SUBSCRIPTIONS, parse_topic
+
+# Event ids a connection remembers; the copies of an event arrive within one relay batch
+RECENT_EVENTS = max(1000, 2 * settings.OUTBOX_RELAY_BATCH_SIZE)
 
 class AgentConsumer(AsyncWebsocketConsumer):
+    """
+    Live ticket events. A new connection gets every event (the "agents" group) until it
+    sends {"action": "subscribe", "topics": [...]}; from then on it only gets events for
+    its topics: "agent:<external_id>", "status:<status>" or "ticket:<external_id>".
+    {"action": "unsubscribe", "topics": [...]} drops topics; {"action": "ping"} gets a pong.
+    An event reaching the connection through several of its topics is sent once.
+    """
+
     async def connect(self):
         # join a group called "agents" so we can broadcast to all agents
-        await self.channel_layer.group_add("agents", self.channel_name)
+        self.topics = {}
+        self.recent_ids, self.recent_order = set(), deque()
+        await self.channel_layer.group_add(FIREHOSE_GROUP, self.channel_name)
         await self.accept()
 
     async def disconnect(self, close_code):
         # leave the group on disconnect
-        await self.channel_layer.group_discard("agents", self.channel_name)
+        await self.channel_layer.group_discard(FIREHOSE_GROUP, self.channel_name)
+        for group in self.topics.values():
+            await self.channel_layer.group_discard(group, self.channel_name)
 
     async def receive(self, text_data=None, bytes_data=None):
-        # This consumer is broadcast-only from server; we can optionally accept ping messages.
-        pass
+        try:
+            data = json.loads(text_data or "")
+        except ValueError:
+            return await self._error("messages must be JSON")
+        if not isinstance(data, dict):
+            return await self._error("messages must be JSON objects")
+
+        action = data.get("action")
+        if action == "ping":
+            return await self.send(text_data=json.dumps({"type": "pong"}))
+        if action not in ("subscribe", "unsubscribe"):
+            return await self._error(f"unknown action {action!r}")
+
+        topics = data.get("topics")
+        if not isinstance(topics, list):
+            return await self._error("topics must be a list")
+        groups = {topic: parse_topic(topic) for topic in topics}
+        invalid = [topic for topic, group in groups.items() if group is None]
+        if invalid:
+            return await self._error(f"invalid topics: {invalid}")
+
+        if action == "subscribe":
+            if len(self.topics.keys() | groups.keys()) > MAX_SUBSCRIPTIONS:
+                return await self._error(f"at most {MAX_SUBSCRIPTIONS} topics per connection")
+            for topic, group in groups.items():
+                if topic not in self.topics:
+                    await self.channel_layer.group_add(group, self.channel_name)
+                    self.topics[topic] = group
+            # Topics replace the everything-feed
+            await self.channel_layer.group_discard(FIREHOSE_GROUP, self.channel_name)
+        else:
+            for topic in groups:
+                group = self.topics.pop(topic, None)
+                if group:
+                    await self.channel_layer.group_discard(group, self.channel_name)
+        await self.send(text_data=json.dumps({"type": "subscriptions", "topics": sorted(self.topics)}))
+
+    async def _error(self, message):
+        await self.send(text_data=json.dumps({"type": "error", "message": message}))
+
+    async def _send_event(self, event):
+        event = dict(event)
+        event_id = event.pop("event_id", None)
+        if event_id:
+            if event_id in self.recent_ids:
+                return
+            self.recent_ids.add(event_id)
+            self.recent_order.append(event_id)
+            if len(self.recent_order) > RECENT_EVENTS:
+                self.recent_ids.discard(self.recent_order.popleft())
+        await self.send(text_data=json.dumps(event))
 
     # Handler for 'message.update' events sent via channel_layer.group_send
     async def message_update(self, event):
         # event is a dict with keys: 'message_id', 'status', 'assigned_to'
-        await self.send(text_data=json.dumps(event))
+        await self._send_event(event)
 
     async def message_new(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self._send_event(event)
+
+    async def messages_bulk_update(self, event):
+        # One event per bulk action: 'action', 'status', 'message_ids' and, unless closing, 'assigned_to'
+        await self._send_event(event)
+
+    async def messages_batch(self, event):
+        # Several events for this connection's group in one group message; clients get the usual frames
+        for item in event["events"]:
+            await self._send_event(item)
@@ -0,0 +1,181 @@
+import logging
+import redis
+from django.db import transaction
+from django.db.models import Count
+from .models import Message
+from .utils import get_redis
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_KEY = "messaging:counters"
+
+# HINCRBY every (field, delta) pair of ARGV, only if the hash exists: one atomic step, so a
+# reconcile or a dropped hash can never interleave between the check and the increments.
+# Returns 0 when the hash is missing, 1 once applied.
+APPLY_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+for i = 1, #ARGV, 2 do
+    redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+return 1
+"""
+
+
+class MessageCounters:
+    """
+    Ticket counts per status and per agent/status, kept in one Redis hash.
+
+    MessageService applies deltas with HINCRBY once its transaction commits, so
+    reading the stats is a single HGETALL. reconcile() rewrites the hash from the
+    database (periodic task) and corrects any drift; when an update cannot be
+    applied the hash is dropped and the next read reconciles.
+    Fields: "status:<status>" and "agent:<agent external_id>:<status>".
+    """
+
+    @staticmethod
+    def status_field(status: str) -> str:
+        return f"status:{status}"
+
+    @staticmethod
+    def agent_field(agent_external_id, status: str) -> str:
+        return f"agent:{agent_external_id}:{status}"
+
+    @classmethod
+    def transition_deltas(cls, old_status: str, new_status: str, old_agent=None, new_agent=None) -> dict:
+        """
+        Counter changes for a ticket moving between statuses/agents.
+        `old_status` None means the ticket is new. Agents are external_ids.
+        """
+        deltas = {}
+        def add(field, delta):
+            deltas[field] = deltas.get(field, 0) + delta
+
+        if old_status is not None:
+            add(cls.status_field(old_status), -1)
+            if old_agent:
+                add(cls.agent_field(old_agent, old_status), -1)
+        add(cls.status_field(new_status), 1)
+        if new_agent:
+            add(cls.agent_field(new_agent, new_status), 1)
+        return {field: delta for field, delta in deltas.items() if delta}
+
+    @classmethod
+    def record_created(cls, count: int = 1):
+        """
+        `count` new unassigned tickets, applied on commit.
+        """
+        deltas = {cls.status_field(Message.STATUS_UNASSIGNED): count}
+        transaction.on_commit(lambda: cls.apply(deltas))
+
+    @classmethod
+    def record_transition(cls, old_status, new_status, old_agent=None, new_agent=None, count: int = 1):
+        """
+        Apply the deltas of `count` identical transitions once the surrounding transaction commits.
+        """
+        deltas = {
+            field: delta * count
+            for field, delta in cls.transition_deltas(old_status, new_status, old_agent, new_agent).items()
+        }
+        transaction.on_commit(lambda: cls.apply(deltas))
+
+    @classmethod
+    def record_removed(cls, tickets):
+        """
+        (status, agent external_id) of tickets deleted from the live table, applied on commit.
+        """
+        deltas = {}
+        for status, agent in tickets:
+            fields = [cls.status_field(status)] + ([cls.agent_field(agent, status)] if agent else [])
+            for field in fields:
+                deltas[field] = deltas.get(field, 0) - 1
+        if deltas:
+            transaction.on_commit(lambda: cls.apply(deltas))
+
+    @classmethod
+    def record_transitions(cls, transitions):
+        """
+        Summed deltas of many (old_status, new_status, old_agent, new_agent) transitions,
+        applied in one round trip on commit.
+        """
+        deltas = {}
+        for transition in transitions:
+            for field, delta in cls.transition_deltas(*transition).items():
+                deltas[field] = deltas.get(field, 0) + delta
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        transaction.on_commit(lambda: cls.apply(deltas))
+
+    @classmethod
+    def apply(cls, deltas: dict):
+        """
+        Apply all deltas atomically (APPLY_SCRIPT). Does nothing before the first reconcile.
+        """
+        if not deltas:
+            return
+        args = []
+        for field, delta in deltas.items():
+            args += [field, delta]
+        try:
+            get_redis().register_script(APPLY_SCRIPT)(keys=[COUNTERS_KEY], args=args)
+        except redis.RedisError as e:
+            logger.error(f"Failed to update message counters, dropping them until reconcile: {str(e)}")
+            try:
+                get_redis().delete(COUNTERS_KEY)
+            except redis.RedisError:
+                pass
+
+    @classmethod
+    def snapshot(cls) -> dict:
+        """
+        {"by_status": {status: n}, "by_agent": {agent external_id: {status: n}}}.
+        Reconciles from the database if the hash is missing or Redis is down.
+        """
+        try:
+            raw = get_redis().hgetall(COUNTERS_KEY)
+        except redis.RedisError as e:
+            logger.warning(f"Message counters unavailable, counting in DB: {str(e)}")
+            return cls._format(cls._count_from_db())
+        if not raw:
+            raw = cls.reconcile()
+        return cls._format({k.decode() if isinstance(k, bytes) else k: int(v) for k, v in raw.items()})
+
+    @classmethod
+    def reconcile(cls) -> dict:
+        """
+        Replace the Redis hash with fresh counts from the database.
+        """
+        counts = cls._count_from_db()
+        try:
+            pipe = get_redis().pipeline(transaction=True)
+            pipe.delete(COUNTERS_KEY)
+            # The hash must exist even with no tickets, apply() skips a missing hash
+            pipe.hset(COUNTERS_KEY, mapping={**counts, "status:_": 0})
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.error(f"Failed to store reconciled message counters: {str(e)}")
+        return counts
+
+    @classmethod
+    def _count_from_db(cls) -> dict:
+        counts = {cls.status_field(status): 0 for status, _ in Message.STATUS_CHOICES}
+        for row in Message.objects.order_by().values('status').annotate(n=Count('id')):
+            counts[cls.status_field(row['status'])] = row['n']
+        per_agent = Message.objects.filter(assigned_to__isnull=False).order_by().values(
+            'assigned_to__external_id', 'status'
+        ).annotate(n=Count('id'))
+        for row in per_agent:
+            counts[cls.agent_field(row['assigned_to__external_id'], row['status'])] = row['n']
+        return counts
+
+    @classmethod
+    def _format(cls, counts: dict) -> dict:
+        by_status = {status: 0 for status, _ in Message.STATUS_CHOICES}
+        by_agent = {}
+        for field, value in counts.items():
+            kind, _, rest = field.partition(':')
+            if kind == 'status' and rest in by_status:
+                by_status[rest] = value
+            elif kind == 'agent':
+                agent, _, status = rest.rpartition(':')
+                if value:
+                    by_agent.setdefault(agent, {})[status] = value
+        return {"by_status": by_status, "by_agent": by_agent}
@@ -0,0 +1,97 @@
+import functools
+import hashlib
+import json
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+from .utils import generic_response
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+# Seconds a first request may hold its key before a retry is allowed to run instead
+LOCK_TIMEOUT = 30
+
+
+def _fingerprint(request) -> str:
+    payload = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{request.method} {request.path}\n{payload}".encode()).hexdigest()
+
+
+def _release(lock_key):
+    try:
+        cache.delete(lock_key)
+    except Exception as e:
+        logger.warning(f"Failed to release idempotency lock: {str(e)}")
+
+
+def idempotent(view_method):
+    """
+    Honour an Idempotency-Key header on a POST view action.
+
+    The first request runs and its response (anything below 500) is stored in the
+    shared cache for IDEMPOTENCY_KEY_TTL seconds; retries with the same key get that
+    response back, marked with Idempotent-Replayed, without running the action again.
+    Reusing a key for a different request body is rejected with 422, and a retry that
+    arrives while the first request is still running gets 409.
+    Requests without the header, or arriving while the cache is unreachable, run normally.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return generic_response(
+                message=f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters",
+                success=False,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        scope = hashlib.sha256(f"{request.path}\n{key}".encode()).hexdigest()
+        response_key, lock_key = f"idempotency:{scope}", f"idempotency:{scope}:lock"
+        fingerprint = _fingerprint(request)
+        try:
+            stored = cache.get(response_key)
+            if stored is None and not cache.add(lock_key, fingerprint, LOCK_TIMEOUT):
+                stored = cache.get(response_key)
+                if stored is None:
+                    return generic_response(
+                        message="A request with this Idempotency-Key is still being processed",
+                        success=False,
+                        status_code=status.HTTP_409_CONFLICT
+                    )
+        except Exception as e:
+            logger.warning(f"Idempotency store unavailable, running request without it: {str(e)}")
+            return view_method(self, request, *args, **kwargs)
+
+        if stored is not None:
+            if stored["fingerprint"] != fingerprint:
+                return generic_response(
+                    message=f"{IDEMPOTENCY_HEADER} was already used for a different request",
+                    success=False,
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            return Response(stored["data"], status=stored["status"], headers={REPLAYED_HEADER: "true"})
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            _release(lock_key)
+            raise
+        try:
+            if response.status_code < 500:
+                cache.set(
+                    response_key,
+                    {"fingerprint": fingerprint, "status": response.status_code, "data": response.data},
+                    settings.IDEMPOTENCY_KEY_TTL
+                )
+        except Exception as e:
+            logger.error(f"Failed to store idempotent response, retries will run again: {str(e)}")
+        _release(lock_key)
+        return response
+    return wrapper
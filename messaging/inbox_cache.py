@@ -0,0 +1,302 @@
+import json
+import logging
+from datetime import datetime, timezone as dt_timezone
+import redis
+from django.conf import settings
+from django.utils import timezone
+from .models import Message
+from .selectors import MessageSelector
+from .serializers import MessageListSerializer
+from .utils import calculate_age_score, get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "messaging:hot_inbox"
+READY_KEY = f"{KEY_PREFIX}:ready"
+KEYWORD_SCORES_KEY = f"{KEY_PREFIX}:keyword_scores"
+ROWS_KEY = f"{KEY_PREFIX}:rows"
+
+# (newest, oldest) ticket age in hours; an unassigned ticket's age score is constant inside a band
+AGE_BANDS = ((None, 24), (24, 48), (48, None))
+# Tickets loaded per inbox query when syncing a batch (imports can sync thousands)
+SYNC_CHUNK_SIZE = 1000
+# Seconds a removal's version bump is kept; far longer than any sync takes between its reads
+VERSION_TTL = 60 * 60
+
+# KEYS: keyword scores set, rows hash, then (bucket, version key) per ticket.
+# ARGV: (version read before the DB read, member, created_at epoch, keyword score, payload) per ticket.
+# A ticket removed since its version was read is skipped, so a slow sync cannot re-add it.
+UPSERT_SCRIPT = """
+local applied = 0
+for i = 0, #ARGV / 5 - 1 do
+    local expected, member = ARGV[i * 5 + 1], ARGV[i * 5 + 2]
+    if (redis.call('GET', KEYS[i * 2 + 4]) or '') == expected then
+        redis.call('ZADD', KEYS[i * 2 + 3], ARGV[i * 5 + 3], member)
+        redis.call('SADD', KEYS[1], ARGV[i * 5 + 4])
+        redis.call('HSET', KEYS[2], member, ARGV[i * 5 + 5])
+        applied = applied + 1
+    end
+end
+return applied
+"""
+# KEYS: rows hash, then (bucket, version key) per ticket. ARGV: version TTL, then the members.
+REMOVE_SCRIPT = """
+for i = 2, #ARGV do
+    redis.call('ZREM', KEYS[i * 2 - 2], ARGV[i])
+    redis.call('INCR', KEYS[i * 2 - 1])
+    redis.call('EXPIRE', KEYS[i * 2 - 1], ARGV[1])
+    redis.call('HDEL', KEYS[1], ARGV[i])
+end
+return #ARGV - 1
+"""
+
+
+class HotInbox:
+    """
+    Redis copy of the unassigned inbox, used to serve its first page without the DB.
+
+    One sorted set per keyword score (member: zero-padded pk, score: created_at epoch)
+    plus a hash of serialized inbox rows. Within one keyword score and age band every
+    ticket has the same effective priority, so the first page is an exact merge of a
+    few ZRANGEBYSCORE reads. Reads are served only while the ready flag written by
+    rebuild() exists; a failed write drops it so the inbox falls back to the DB.
+
+    Writes are Lua scripts. Every removal bumps a per-ticket version, and an upsert only
+    lands if the version is the one read before the ticket was loaded from the DB, so a
+    sync racing a claim cannot put the claimed ticket back. Rows embed the customer, which
+    is re-synced when it changes (signals.resync_customer_tickets); the periodic
+    check_hot_inbox task rebuilds the cache when it drifts from the database.
+    """
+    # Same ordering as MessageSelector.get_priority_inbox, for keyset cursors
+    ORDERING = [('effective_priority', True), ('created_at', False), ('id', False)]
+
+    @staticmethod
+    def enabled() -> bool:
+        return settings.HOT_INBOX_ENABLED
+
+    @staticmethod
+    def _bucket_key(keyword_score: int) -> str:
+        return f"{KEY_PREFIX}:kw:{keyword_score}"
+
+    @staticmethod
+    def _member(pk: int) -> str:
+        # Zero-padded so equal created_at ties sort by pk, like the DB ordering
+        return f"{pk:012d}"
+
+    @classmethod
+    def _version_key(cls, pk: int) -> str:
+        return f"{KEY_PREFIX}:version:{cls._member(pk)}"
+
+    @classmethod
+    def sync(cls, message: Message):
+        """
+        Bring one ticket's entry in line with the database after a transition.
+        """
+        if not cls.enabled():
+            return
+        try:
+            if message.status == Message.STATUS_UNASSIGNED:
+                cls._load([message.pk])
+            else:
+                cls._remove([message])
+        except redis.RedisError as e:
+            cls._invalidate(f"sync of {message.external_id}", e)
+
+    @classmethod
+    def sync_many(cls, messages):
+        """
+        sync() for a batch: inbox queries of SYNC_CHUNK_SIZE for the unassigned ones, one pipeline to drop the rest.
+        """
+        if not cls.enabled() or not messages:
+            return
+        unassigned = [message.pk for message in messages if message.status == Message.STATUS_UNASSIGNED]
+        removed = [message for message in messages if message.status != Message.STATUS_UNASSIGNED]
+        try:
+            for start in range(0, len(unassigned), SYNC_CHUNK_SIZE):
+                cls._load(unassigned[start:start + SYNC_CHUNK_SIZE])
+            if removed:
+                cls._remove(removed)
+        except redis.RedisError as e:
+            cls._invalidate(f"sync of {len(messages)} tickets", e)
+
+    @classmethod
+    def discard(cls, messages):
+        """
+        Drop tickets that left the unassigned inbox, in one round trip.
+        """
+        if not cls.enabled() or not messages:
+            return
+        try:
+            cls._remove(messages)
+        except redis.RedisError as e:
+            cls._invalidate(f"removal of {len(messages)} tickets", e)
+
+    @classmethod
+    def _remove(cls, messages):
+        keys, members = [ROWS_KEY], []
+        for message in messages:
+            keys += [cls._bucket_key(message.keyword_score), cls._version_key(message.pk)]
+            members.append(cls._member(message.pk))
+        get_redis().register_script(REMOVE_SCRIPT)(keys=keys, args=[VERSION_TTL, *members])
+
+    @classmethod
+    def _load(cls, pks) -> int:
+        """
+        Upsert the tickets in `pks` that are unassigned in the DB. Returns how many were written.
+        """
+        # Versions first: a removal committed after this read makes the ticket's write a no-op
+        versions = get_redis().mget([cls._version_key(pk) for pk in pks])
+        rows = MessageSelector.get_inbox_rows().filter(pk__in=pks, status=Message.STATUS_UNASSIGNED)
+        return cls._upsert(rows, dict(zip(pks, versions)))
+
+    @classmethod
+    def _upsert(cls, rows, versions) -> int:
+        keys, args = [KEYWORD_SCORES_KEY, ROWS_KEY], []
+        for row in rows:
+            version = versions.get(row.pk)
+            keys += [cls._bucket_key(row.keyword_score), cls._version_key(row.pk)]
+            args += [
+                version.decode() if version is not None else '', cls._member(row.pk),
+                row.created_at.timestamp(), row.keyword_score, json.dumps(MessageListSerializer(row).data),
+            ]
+        if not args:
+            return 0
+        return get_redis().register_script(UPSERT_SCRIPT)(keys=keys, args=args)
+
+    @classmethod
+    def _invalidate(cls, context: str, exc: Exception):
+        logger.error(f"Hot inbox {context} failed, serving inbox from DB until rebuild: {str(exc)}")
+        try:
+            get_redis().delete(READY_KEY)
+        except redis.RedisError:
+            pass
+
+    @classmethod
+    def first_page(cls, limit: int, with_count: bool = True, now=None):
+        """
+        Returns (results, boundary, has_next, count) for the first `limit` tickets as of `now`,
+        or None when the cache cannot serve the page.
+        `boundary` holds the last row's values for ORDERING.
+        """
+        if not cls.enabled():
+            return None
+        try:
+            r = get_redis()
+            ready, keyword_scores = r.pipeline(transaction=False).exists(READY_KEY).smembers(KEYWORD_SCORES_KEY).execute()
+            if not ready:
+                return None
+
+            now = now or timezone.now()
+            now_ts = now.timestamp()
+            pipe = r.pipeline(transaction=False)
+            buckets = sorted(int(kw) for kw in keyword_scores)
+            for kw in buckets:
+                for newest, oldest in AGE_BANDS:
+                    max_score = '+inf' if newest is None else now_ts - newest * 3600
+                    min_score = '-inf' if oldest is None else f"({now_ts - oldest * 3600}"
+                    pipe.zrangebyscore(cls._bucket_key(kw), min_score, max_score, start=0, num=limit + 1, withscores=True)
+            if with_count:
+                for kw in buckets:
+                    pipe.zcard(cls._bucket_key(kw))
+            replies = pipe.execute()
+
+            candidates = []
+            for index, kw in enumerate(buckets):
+                for band in replies[index * len(AGE_BANDS):(index + 1) * len(AGE_BANDS)]:
+                    for member, created_ts in band:
+                        created_at = datetime.fromtimestamp(created_ts, tz=dt_timezone.utc)
+                        priority = kw + calculate_age_score(created_at, Message.STATUS_UNASSIGNED, now)
+                        candidates.append((-priority, created_ts, int(member), priority))
+            candidates.sort()
+            has_next = len(candidates) > limit
+            candidates = candidates[:limit]
+            count = sum(replies[len(buckets) * len(AGE_BANDS):]) if with_count else None
+
+            if not candidates:
+                return [], None, False, count
+            payloads = r.hmget(ROWS_KEY, [cls._member(pk) for _, _, pk, _ in candidates])
+        except redis.RedisError as e:
+            logger.warning(f"Hot inbox read failed, using DB: {str(e)}")
+            return None
+
+        if any(payload is None for payload in payloads):
+            return None
+        results = []
+        for (_, _, pk, priority), payload in zip(candidates, payloads):
+            row = json.loads(payload)
+            row['priority'] = priority
+            results.append(row)
+        boundary = [candidates[-1][3], results[-1]['created_at'], candidates[-1][2]]
+        return results, boundary, has_next, count
+
+    @classmethod
+    def rebuild(cls, chunk_size: int = 1000) -> int:
+        """
+        Reload every unassigned ticket from the database. Reads fall back to the DB meanwhile.
+        """
+        r = get_redis()
+        r.delete(READY_KEY)
+        stale_keys = list(r.scan_iter(match=f"{KEY_PREFIX}:*", count=1000))
+        if stale_keys:
+            r.delete(*stale_keys)
+
+        pks = Message.objects.filter(status=Message.STATUS_UNASSIGNED).order_by('pk').values_list('pk', flat=True)
+        loaded = 0
+        batch = []
+        for pk in pks.iterator(chunk_size=chunk_size):
+            batch.append(pk)
+            if len(batch) >= chunk_size:
+                loaded += cls._load(batch)
+                batch = []
+        if batch:
+            loaded += cls._load(batch)
+
+        r.set(READY_KEY, timezone.now().isoformat())
+        return loaded
+
+    @classmethod
+    def check(cls) -> dict:
+        """
+        Compare the cache with the database. Returns pks per kind of drift:
+        missing (unassigned in DB, absent from Redis), stale (in Redis, not unassigned
+        in DB), misplaced (wrong keyword bucket or created_at) and rowless (no payload).
+        """
+        r = get_redis()
+        cached = {}
+        for kw in r.smembers(KEYWORD_SCORES_KEY):
+            for member, created_ts in r.zscan_iter(cls._bucket_key(int(kw))):
+                cached[int(member)] = (int(kw), created_ts)
+        row_members = {int(member) for member in r.hkeys(ROWS_KEY)}
+
+        drift = {'ready': bool(r.exists(READY_KEY)), 'missing': [], 'stale': [], 'misplaced': [], 'rowless': []}
+        seen = set()
+        unassigned = Message.objects.filter(status=Message.STATUS_UNASSIGNED).values_list('pk', 'keyword_score', 'created_at')
+        for pk, kw, created_at in unassigned.iterator(chunk_size=5000):
+            seen.add(pk)
+            entry = cached.get(pk)
+            if entry is None:
+                drift['missing'].append(pk)
+            elif entry[0] != kw or abs(entry[1] - created_at.timestamp()) > 1e-3:
+                drift['misplaced'].append(pk)
+            if entry is not None and pk not in row_members:
+                drift['rowless'].append(pk)
+        drift['stale'] = sorted(set(cached) - seen)
+        return drift
+
+    @classmethod
+    def repair(cls) -> dict:
+        """
+        check(), then rebuild() if the cache is not ready or has drifted. Returns the drift found.
+        """
+        if not cls.enabled():
+            return {}
+        try:
+            drift = cls.check()
+            problems = {kind: len(pks) for kind, pks in drift.items() if kind != 'ready' and pks}
+            if problems or not drift['ready']:
+                logger.warning(f"Hot inbox out of sync with the database ({problems or 'not ready'}), rebuilding")
+                cls.rebuild()
+        except redis.RedisError as e:
+            logger.warning(f"Hot inbox check failed: {str(e)}")
+            return {}
+        return drift
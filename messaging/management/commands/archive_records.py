@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from messaging.archive import TicketArchiver
+
+
+class Command(BaseCommand):
+    help = "Move closed tickets and old interaction logs past their retention window to the archive tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--closed-days", type=int, default=settings.ARCHIVE_CLOSED_AFTER_DAYS,
+            help="Archive closed tickets idle for this many days"
+        )
+        parser.add_argument(
+            "--log-days", type=int, default=settings.ARCHIVE_LOGS_AFTER_DAYS,
+            help="Archive interaction logs older than this many days"
+        )
+        parser.add_argument("--chunk-size", type=int, help="Rows moved per transaction", default=500)
+
+    def handle(self, *args, **options):
+        moved = TicketArchiver.run(
+            closed_days=options["closed_days"], log_days=options["log_days"], chunk_size=options["chunk_size"]
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {moved['messages']} closed tickets and {moved['logs']} interaction log rows."
+        ))
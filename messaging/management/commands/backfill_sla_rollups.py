@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from messaging.analytics import SLARollup
+
+
+class Command(BaseCommand):
+    help = "Recompute the SLA analytics rollups from the whole InteractionLog, archived entries included"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, help="Log rows loaded per batch", default=500)
+
+    def handle(self, *args, **options):
+        processed = SLARollup.rebuild(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"SLA rollups rebuilt from {processed} interaction log rows."))
@@ -0,0 +1,124 @@
+import threading
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.utils import timezone
+from messaging.counters import MessageCounters
+from messaging.models import Agent, Customer, Message
+from messaging.selectors import MessageSelector
+from messaging.services import ApplicationError, MessageService
+from messaging.utils import calculate_keyword_score
+
+BENCHMARK_USER_ID = "benchmark-claims"
+SAMPLE_BODIES = [
+    "My loan was approved but not disbursed yet",
+    "Urgent: the app keeps crashing when I pay",
+    "How do I update my phone number?",
+    "Payment failed but my account was debited",
+    "Thanks for the help yesterday",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Contention benchmark: concurrent agents draining the inbox by listing and claiming "
+        "the top ticket (the old client flow) versus claim_next. Development databases only, "
+        "it claims every unassigned ticket."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--agents", type=int, default=50, help="Concurrent agents (threads)")
+        parser.add_argument("--tickets", type=int, default=1000, help="Unassigned tickets created per flow")
+        parser.add_argument("--batch", type=int, default=1, help="Tickets per claim_next call")
+
+    def handle(self, *args, **options):
+        agents = [str(external_id) for external_id in Agent.objects.values_list("external_id", flat=True)]
+        if not agents:
+            raise CommandError("No agents, run seed_data first")
+        if connection.vendor == "sqlite":
+            self.stdout.write(self.style.WARNING(
+                "SQLite has no row locks and serializes writers: expect 'database is locked' errors, "
+                "run against PostgreSQL for representative numbers"
+            ))
+
+        for label, worker in (("list+claim", self._list_and_claim), ("claim_next", self._claim_next)):
+            self._seed(options["tickets"])
+            stats = self._run(worker, agents, options)
+            requests = stats["claims"] + stats["conflicts"] + stats["errors"] + stats["empty"]
+            self.stdout.write(
+                f"{label:<11} {stats['elapsed']:7.2f} s  {stats['claims']:6d} claimed in {requests:6d} requests  "
+                f"409 rate {stats['conflicts'] / max(requests, 1):6.1%}  errors {stats['errors']:4d}  "
+                f"{stats['claims'] / stats['elapsed']:8.1f} claims/s"
+            )
+
+        # The seeded tickets bypassed MessageService
+        MessageCounters.reconcile()
+
+    def _seed(self, count):
+        customer, _ = Customer.objects.get_or_create(user_id=BENCHMARK_USER_ID)
+        now = timezone.now()
+        Message.objects.bulk_create([
+            Message(
+                customer=customer,
+                body=SAMPLE_BODIES[i % len(SAMPLE_BODIES)],
+                keyword_score=calculate_keyword_score(SAMPLE_BODIES[i % len(SAMPLE_BODIES)]),
+                status=Message.STATUS_UNASSIGNED,
+                timestamp=now,
+            )
+            for i in range(count)
+        ], batch_size=1000)
+
+    def _run(self, worker, agents, options):
+        stats = {"claims": 0, "conflicts": 0, "errors": 0, "empty": 0}
+        lock = threading.Lock()
+
+        def agent_loop(agent_external_id):
+            local = {"claims": 0, "conflicts": 0, "errors": 0, "empty": 0}
+            try:
+                worker(agent_external_id, options["batch"], local)
+            finally:
+                connection.close()
+                with lock:
+                    for key, value in local.items():
+                        stats[key] += value
+
+        threads = [
+            threading.Thread(target=agent_loop, args=(agents[i % len(agents)],))
+            for i in range(options["agents"])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats["elapsed"] = time.perf_counter() - started
+        return stats
+
+    @staticmethod
+    def _list_and_claim(agent_external_id, batch, stats):
+        # Every agent sees the same inbox and goes for its top ticket
+        while True:
+            top = MessageSelector.get_priority_inbox(Message.STATUS_UNASSIGNED).values_list("external_id", flat=True).first()
+            if top is None:
+                stats["empty"] += 1
+                return
+            try:
+                MessageService.claim_message(message_external_id=top, agent_external_id=agent_external_id)
+                stats["claims"] += 1
+            except ApplicationError:
+                stats["conflicts"] += 1
+            except OperationalError:
+                stats["errors"] += 1
+
+    @staticmethod
+    def _claim_next(agent_external_id, batch, stats):
+        while True:
+            try:
+                claimed = MessageService.claim_next(agent_external_id=agent_external_id, count=batch)
+            except OperationalError:
+                stats["errors"] += 1
+                continue
+            if not claimed:
+                stats["empty"] += 1
+                return
+            stats["claims"] += len(claimed)
@@ -0,0 +1,55 @@
+import re
+import timeit
+from pathlib import Path
+import pandas as pd
+from django.core.management.base import BaseCommand
+from messaging.utils import URGENT_KEYWORDS, calculate_keyword_score
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+CSV_PATH = BASE_DIR / "data" / "GeneralistRails_Project_MessageData.csv"
+
+
+def legacy_keyword_score(body: str) -> int:
+    """
+    Previous implementation: one re.search per keyword pattern.
+    """
+    if not body:
+        return 0
+    text = body.lower()
+    score = 0
+    for pattern, weight in URGENT_KEYWORDS.items():
+        if re.search(pattern, text):
+            score += weight
+    return score
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark calculate_keyword_score against the per-pattern implementation"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", type=str, help="CSV file path", default=CSV_PATH)
+        parser.add_argument("--rows", type=int, help="Number of bodies to score per run", default=100_000)
+        parser.add_argument("--repeat", type=int, help="Number of timed runs", default=5)
+
+    def handle(self, *args, **options):
+        bodies = pd.read_csv(options["path"])["Message Body"].dropna().astype(str).tolist()
+        if not bodies:
+            self.stdout.write(self.style.ERROR("No message bodies to benchmark"))
+            return
+        # Repeat the sample up to the requested volume
+        bodies = (bodies * (options["rows"] // len(bodies) + 1))[:options["rows"]]
+
+        mismatches = sum(1 for body in bodies if legacy_keyword_score(body) != calculate_keyword_score(body))
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f"{mismatches} bodies scored differently"))
+            return
+
+        results = {}
+        for label, func in (("per-pattern", legacy_keyword_score), ("single-pass", calculate_keyword_score)):
+            best = min(timeit.repeat(lambda: [func(body) for body in bodies], number=1, repeat=options["repeat"]))
+            results[label] = best
+            self.stdout.write(f"{label:<12} {best * 1000:9.1f} ms  ({best / len(bodies) * 1e6:.2f} us/body)")
+
+        speedup = results["per-pattern"] / results["single-pass"]
+        self.stdout.write(self.style.SUCCESS(f"single-pass is {speedup:.1f}x faster over {len(bodies)} bodies"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from messaging.inbox_cache import HotInbox
+
+
+class Command(BaseCommand):
+    help = "Compare the Redis hot inbox with the database and report drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Rebuild the hot inbox when drift is found")
+
+    def handle(self, *args, **options):
+        drift = HotInbox.check()
+        problems = {kind: pks for kind, pks in drift.items() if kind != "ready" and pks}
+
+        if not drift["ready"]:
+            self.stdout.write(self.style.WARNING("Hot inbox is not marked ready; the inbox is served from the DB."))
+        for kind, pks in problems.items():
+            sample = ", ".join(str(pk) for pk in pks[:10])
+            self.stdout.write(self.style.ERROR(f"{kind}: {len(pks)} (e.g. {sample})"))
+
+        if not problems and drift["ready"]:
+            self.stdout.write(self.style.SUCCESS("Hot inbox is consistent with the database."))
+            return
+        if options["fix"]:
+            loaded = HotInbox.rebuild()
+            self.stdout.write(self.style.SUCCESS(f"Hot inbox rebuilt with {loaded} unassigned tickets."))
@@ -0,0 +1,101 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from messaging.models import Agent, CannedResponse, Customer, Message
+from messaging.selectors import AgentSelector, CannedResponseSelector
+from messaging.services import ApplicationError, MessageService
+
+# Max SQL statements per service call on the hot write paths, agents and canned responses already cached.
+# Savepoints are not counted: they only appear because the checks run inside a rollback.
+# Paths that change a ticket's status include the one realtime outbox insert (counted with REALTIME_OUTBOX on).
+QUERY_BUDGETS = {
+    "claim_message": 2,
+    "claim_message (lost race)": 2,
+    "claim_next": 3,
+    "reply_message": 2,
+    "reply_message (auto-assign)": 4,
+    "use_canned_reply": 2,
+    "customer_reply": 2,
+    "customer_reply (re-open)": 4,
+}
+
+
+class Command(BaseCommand):
+    help = "Count the SQL statements of MessageService write paths and fail if any exceeds its budget"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--verbose-sql", action="store_true", help="Print every captured statement")
+
+    def handle(self, *args, **options):
+        agents = list(Agent.objects.all()[:2])
+        if len(agents) < 2:
+            raise CommandError("Needs two agents, run seed_data first")
+        canned = CannedResponse.objects.first()
+        if canned is None:
+            raise CommandError("Needs a canned response, run seed_data first")
+
+        over_budget = []
+        # Everything is rolled back: on_commit hooks (broadcasts, Redis) never fire.
+        # Budgets are for the deployed configuration, which writes events to the outbox.
+        with override_settings(REALTIME_OUTBOX=True), transaction.atomic():
+            for agent in agents:
+                AgentSelector.get_by_external_id(agent.external_id)
+            CannedResponseSelector.get_by_external_id(canned.external_id)
+            tickets = self._tickets([Message.STATUS_UNASSIGNED, Message.STATUS_UNASSIGNED, Message.STATUS_CLOSED])
+
+            for label, call in self._cases(agents, tickets, canned):
+                with CaptureQueriesContext(connection) as captured:
+                    call()
+                statements = [q["sql"] for q in captured.captured_queries if "SAVEPOINT" not in q["sql"]]
+                budget = QUERY_BUDGETS[label]
+                style = self.style.SUCCESS if len(statements) <= budget else self.style.ERROR
+                self.stdout.write(style(f"{label:<28} {len(statements)} queries (budget {budget})"))
+                if options["verbose_sql"]:
+                    for sql in statements:
+                        self.stdout.write(f"    {sql}")
+                if len(statements) > budget:
+                    over_budget.append(label)
+            transaction.set_rollback(True)
+
+        if over_budget:
+            raise CommandError(f"Over query budget: {', '.join(over_budget)}")
+
+    def _tickets(self, statuses):
+        customer, _ = Customer.objects.get_or_create(user_id="query-budget-check")
+        # bulk_create: no post_save broadcast for throwaway rows
+        return Message.objects.bulk_create([
+            Message(customer=customer, body="query budget check", status=status, timestamp=timezone.now())
+            for status in statuses
+        ])
+
+    def _cases(self, agents, tickets, canned):
+        winner, loser = agents
+        claimed, unassigned, closed = (str(ticket.external_id) for ticket in tickets)
+        agent_id = str(winner.external_id)
+
+        def lost_race():
+            try:
+                MessageService.claim_message(message_external_id=claimed, agent_external_id=str(loser.external_id))
+            except ApplicationError:
+                pass
+            else:
+                raise CommandError("Second claim of the same ticket succeeded")
+
+        return [
+            ("claim_message", lambda: MessageService.claim_message(message_external_id=claimed, agent_external_id=agent_id)),
+            ("claim_message (lost race)", lost_race),
+            ("reply_message", lambda: MessageService.reply_message(
+                message_external_id=claimed, agent_external_id=agent_id, text="On it"
+            )),
+            ("reply_message (auto-assign)", lambda: MessageService.reply_message(
+                message_external_id=unassigned, agent_external_id=agent_id, text="Looking into it"
+            )),
+            ("use_canned_reply", lambda: MessageService.use_canned_reply(
+                message_external_id=claimed, agent_external_id=agent_id, canned_external_id=str(canned.external_id)
+            )),
+            ("customer_reply", lambda: MessageService.customer_reply(message_external_id=claimed, text="Thanks")),
+            ("customer_reply (re-open)", lambda: MessageService.customer_reply(message_external_id=closed, text="Again")),
+            # Last: it takes the top of the whole inbox, which may include the tickets above
+            ("claim_next", lambda: MessageService.claim_next(agent_external_id=agent_id, count=2)),
+        ]
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from messaging.models import Agent, Message
+from messaging.selectors import MessageSelector
+
+
+class Command(BaseCommand):
+    help = "Print the database query plan for the priority inbox (or an agent queue), per status"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--status", type=str, choices=[s for s, _ in Message.STATUS_CHOICES], help="Only explain this status")
+        parser.add_argument("--agent", type=str, help="Explain this agent's queue (agent external_id) instead of the inbox")
+        parser.add_argument("--analyze", action="store_true", help="Execute the query (EXPLAIN ANALYZE, PostgreSQL only)")
+
+    def handle(self, *args, **options):
+        statuses = [options["status"]] if options["status"] else [s for s, _ in Message.STATUS_CHOICES]
+        explain_options = {"analyze": True} if options["analyze"] and connection.vendor == "postgresql" else {}
+
+        agent = Agent.objects.get(external_id=options["agent"]) if options["agent"] else None
+
+        for status in statuses:
+            if agent:
+                qs = MessageSelector.get_agent_queue(agent.id, status)
+            else:
+                qs = MessageSelector.get_priority_inbox(status)
+            self.stdout.write(self.style.MIGRATE_HEADING(f"[{connection.vendor}] status={status}"))
+            self.stdout.write(str(qs.query))
+            self.stdout.write(qs.explain(**explain_options))
+            self.stdout.write("")
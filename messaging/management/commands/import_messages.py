@@ -2,10 +2,13 @@ import os
 from pathlib import Path
 import pandas as pd
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.utils import timezone
 from dateutil import parser  # more flexible date parsing
+from messaging.counters import MessageCounters
+from messaging.inbox_cache import HotInbox
 from messaging.models import Customer, Message
-from messaging.utils import calculate_priority
+from messaging.utils import calculate_keyword_score_batch
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent  
@@ -27,6 +30,8 @@ class Command(BaseCommand):
         df = pd.read_csv(path)
         imported = 0
         failed = 0
+        rows = []
+        created = []
 
         for idx, row in df.iterrows():
             cust_id = str(row.get("User ID")).strip() if pd.notna(row.get("User ID")) else None
@@ -49,21 +54,28 @@ class Command(BaseCommand):
             else:
                 created_at = timezone.now()
 
+            rows.append((cust_id, body, created_at))
+
+        # Score all valid rows at once
+        bodies = [body for _, body, _ in rows]
+        keyword_scores = calculate_keyword_score_batch(bodies)
+
+        for (cust_id, body, created_at), keyword_score in zip(rows, keyword_scores):
             # Create or get the customer
             customer, _ = Customer.objects.get_or_create(user_id=cust_id)
 
-            # Calculate priority
-            priority = calculate_priority(body, created_at, "unassigned")
-
             # Create message safely
-            Message.objects.create(
+            created.append(Message.objects.create(
                 customer=customer,
                 body=body,
                 timestamp=created_at,  
                 created_at=created_at,
-                priority=priority,
+                keyword_score=int(keyword_score),
                 status=Message.STATUS_UNASSIGNED
-            )
+            ))
             imported += 1
 
+        MessageCounters.record_created(imported)
+        transaction.on_commit(lambda: HotInbox.sync_many(created))
+
         self.stdout.write(self.style.SUCCESS(f" CSV import completed: {imported} messages imported, {failed} skipped."))
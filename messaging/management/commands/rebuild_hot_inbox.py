@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from messaging.inbox_cache import HotInbox
+
+
+class Command(BaseCommand):
+    help = "Rebuild the Redis hot inbox (unassigned tickets) from the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, help="Rows loaded per batch", default=1000)
+
+    def handle(self, *args, **options):
+        loaded = HotInbox.rebuild(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Hot inbox rebuilt with {loaded} unassigned tickets."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from messaging.outbox import OutboxRelay
+
+
+class Command(BaseCommand):
+    help = "Send queued websocket events from the outbox to the channel layer (runs until stopped)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, help="Seconds between polls when the outbox is empty")
+        parser.add_argument("--batch-size", type=int, help="Events read per batch")
+        parser.add_argument("--once", action="store_true", help="Drain the outbox once and exit")
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            sent = OutboxRelay.drain(options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"Relayed {sent} outbox events."))
+            return
+        self.stdout.write(f"Relaying outbox events, queue: {OutboxRelay.depth()}")
+        OutboxRelay.run(options["interval"], options["batch_size"])
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0004_remove_message_responded_at_remove_message_response_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['status', 'created_at'], name='messaging_m_status_17edaf_idx'),
+        ),
+    ]
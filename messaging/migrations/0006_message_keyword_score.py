@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:40
+
+from django.db import migrations, models
+from messaging.utils import calculate_keyword_score
+
+
+def backfill_keyword_score(apps, schema_editor):
+    Message = apps.get_model('messaging', 'Message')
+
+    batch = []
+    for row in Message.objects.only('id', 'body').order_by('pk').iterator(chunk_size=1000):
+        row.keyword_score = calculate_keyword_score(row.body)
+        batch.append(row)
+        if len(batch) >= 1000:
+            Message.objects.bulk_update(batch, ['keyword_score'])
+            batch = []
+    if batch:
+        Message.objects.bulk_update(batch, ['keyword_score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0005_message_status_created_at_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='message',
+            name='messaging_m_status_96ffc5_idx',
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='keyword_score',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_keyword_score, reverse_code=migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['status', 'keyword_score', 'created_at'], name='messaging_m_status_b90fef_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:05
+
+from django.db import migrations
+from messaging.search import install_search_index, uninstall_search_index
+
+
+def create_search_index(apps, schema_editor):
+    install_search_index(schema_editor.connection)
+
+def drop_search_index(apps, schema_editor):
+    uninstall_search_index(schema_editor.connection)
+
+class Migration(migrations.Migration):
+    # PostgreSQL backfills in batches and builds the index with CREATE INDEX CONCURRENTLY,
+    # neither of which may run inside one migration transaction
+    atomic = False
+
+    dependencies = [
+        ('messaging', '0006_message_keyword_score'),
+    ]
+
+    operations = [
+        # PostgreSQL: trigger-maintained tsvector column + GIN index; SQLite: FTS5 table + triggers
+        migrations.RunPython(create_search_index, reverse_code=drop_search_index),
+    ]
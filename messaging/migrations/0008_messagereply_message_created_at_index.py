@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0007_message_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='messagereply',
+            index=models.Index(fields=['message', 'created_at'], name='messaging_m_message_1d3cff_idx'),
+        ),
+    ]
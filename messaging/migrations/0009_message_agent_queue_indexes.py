@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0008_messagereply_message_created_at_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['assigned_to', 'status', '-keyword_score', 'created_at'], name='message_agent_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('status', 'unassigned')), fields=['keyword_score', 'created_at'], name='message_unassigned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('status', 'in_progress')), fields=['assigned_to', 'keyword_score', 'created_at'], name='message_in_progress_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0009_message_agent_queue_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agent',
+            name='capacity',
+            field=models.PositiveIntegerField(default=10),
+        ),
+        migrations.AddField(
+            model_name='agent',
+            name='skills',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
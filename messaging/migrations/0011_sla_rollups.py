@@ -0,0 +1,65 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0010_agent_capacity_skills'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlySLAStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('claimed', models.PositiveIntegerField(default=0)),
+                ('claim_seconds', models.FloatField(default=0)),
+                ('first_replies', models.PositiveIntegerField(default=0)),
+                ('first_reply_seconds', models.FloatField(default=0)),
+                ('closed', models.PositiveIntegerField(default=0)),
+                ('handle_seconds', models.FloatField(default=0)),
+                ('replies', models.PositiveIntegerField(default=0)),
+                ('created', models.PositiveIntegerField(default=0)),
+                ('customer_replies', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('hour',), name='hourly_sla_stats_hour_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TicketSLA',
+            fields=[
+                ('message', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sla', serialize=False, to='messaging.message')),
+                ('created_at', models.DateTimeField(blank=True, null=True)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('first_reply_at', models.DateTimeField(blank=True, null=True)),
+                ('closed_at', models.DateTimeField(blank=True, null=True)),
+                ('agent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='messaging.agent')),
+                ('claimed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='messaging.agent')),
+                ('first_reply_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='messaging.agent')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AgentHourlySLAStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('claimed', models.PositiveIntegerField(default=0)),
+                ('claim_seconds', models.FloatField(default=0)),
+                ('first_replies', models.PositiveIntegerField(default=0)),
+                ('first_reply_seconds', models.FloatField(default=0)),
+                ('closed', models.PositiveIntegerField(default=0)),
+                ('handle_seconds', models.FloatField(default=0)),
+                ('replies', models.PositiveIntegerField(default=0)),
+                ('agent', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_sla_stats', to='messaging.agent')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='messaging_a_hour_316510_idx')],
+                'constraints': [models.UniqueConstraint(fields=('agent', 'hour'), name='agent_hourly_sla_stats_uniq')],
+            },
+        ),
+    ]
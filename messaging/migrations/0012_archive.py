@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0011_sla_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedInteractionLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message_external_id', models.UUIDField(db_index=True)),
+                ('action', models.CharField(max_length=50)),
+                ('timestamp', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('external_id', models.UUIDField(unique=True)),
+                ('body', models.TextField()),
+                ('status', models.CharField(default='closed', max_length=20)),
+                ('priority', models.IntegerField(default=0)),
+                ('timestamp', models.DateTimeField()),
+                ('created_at', models.DateTimeField()),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('replies', models.JSONField(default=list)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='interactionlog',
+            index=models.Index(fields=['timestamp'], name='messaging_i_timesta_20f9fc_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedinteractionlog',
+            name='agent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='messaging.agent'),
+        ),
+        migrations.AddField(
+            model_name='archivedmessage',
+            name='assigned_to',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='messaging.agent'),
+        ),
+        migrations.AddField(
+            model_name='archivedmessage',
+            name='customer',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_messages', to='messaging.customer'),
+        ),
+    ]
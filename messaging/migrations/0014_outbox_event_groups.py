@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0013_outbox_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxevent',
+            name='groups',
+            field=models.JSONField(default=list),
+        ),
+    ]
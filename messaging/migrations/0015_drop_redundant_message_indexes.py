@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:22
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0014_outbox_event_groups'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='message',
+            name='message_unassigned_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='message',
+            name='message_in_progress_idx',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0015_drop_redundant_message_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='interactionlog',
+            name='entry_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
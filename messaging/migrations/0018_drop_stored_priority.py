@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:54
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0017_outboxevent_claimed_until'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='archivedmessage',
+            name='priority',
+        ),
+        migrations.RemoveField(
+            model_name='message',
+            name='priority',
+        ),
+    ]
@@ -17,6 +17,10 @@ class Customer(models.Model):
 class Agent(models.Model):
     name = models.CharField(max_length=100)
     external_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    # Most in-progress tickets automatic routing gives this agent (0: never routed to)
+    capacity = models.PositiveIntegerField(default=10)
+    # KEYWORD_CATEGORIES names this agent handles, for skill-based routing
+    skills = models.JSONField(default=list, blank=True)
 
     def __str__(self):
         return self.name
@@ -39,12 +43,17 @@ class Message(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_UNASSIGNED)
     assigned_to = models.ForeignKey(Agent, on_delete=models.SET_NULL, null=True, blank=True, related_name='assigned_messages')
     claimed_at = models.DateTimeField(null=True, blank=True)
-    priority = models.IntegerField(default=0)
+    # Content-only part of the priority; the age-dependent part is computed at query time
+    # (utils.priority_expression), so no priority is stored
+    keyword_score = models.IntegerField(default=0)
     external_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
 
     class Meta:
         indexes = [
-            models.Index(fields=["status", "priority", "created_at"]),
+            models.Index(fields=["status", "keyword_score", "created_at"]),
+            models.Index(fields=["status", "created_at"]),
+            # Per-agent queue: finds an agent's tickets by status; the queue itself is sorted on read
+            models.Index(fields=["assigned_to", "status", "-keyword_score", "created_at"], name="message_agent_queue_idx"),
         ]
 
     def __str__(self):
@@ -58,6 +67,11 @@ class MessageReply(models.Model):
     text = models.TextField()
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["message", "created_at"]),
+        ]
+
     def __str__(self):
         return f"Reply to {self.message.external_id}"
 
@@ -75,7 +89,111 @@ class InteractionLog(models.Model):
     agent = models.ForeignKey(Agent, on_delete=models.SET_NULL, null=True, blank=True)
     action = models.CharField(max_length=50) # e.g. CLAIMED, CLOSED
     timestamp = models.DateTimeField(default=timezone.now)
+    # Set when the entry is recorded, so a re-delivered entry (audit.InteractionLogBuffer) is stored once
+    entry_id = models.UUIDField(null=True, blank=True, unique=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Retention scans (archive.TicketArchiver)
+            models.Index(fields=["timestamp"]),
+        ]
 
     def __str__(self):
         agent_name = self.agent.name if self.agent else "System"
-        return f"{self.message.external_id} - {self.action} by {agent_name} at {self.timestamp}"
\ No newline at end of file
+        return f"{self.message.external_id} - {self.action} by {agent_name} at {self.timestamp}"
+
+class TicketSLA(models.Model):
+    """
+    Per-ticket milestones, folded in from InteractionLog events by analytics.SLARollup.
+    """
+    message = models.OneToOneField(Message, on_delete=models.CASCADE, primary_key=True, related_name='sla')
+    created_at = models.DateTimeField(null=True, blank=True)
+    # First assignment (claim or automatic routing) and the agent it went to
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    claimed_by = models.ForeignKey(Agent, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    first_reply_at = models.DateTimeField(null=True, blank=True)
+    first_reply_by = models.ForeignKey(Agent, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    closed_at = models.DateTimeField(null=True, blank=True)
+    # Current assignee, credited with the handle time when the ticket closes
+    agent = models.ForeignKey(Agent, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+
+class SLAStats(models.Model):
+    # Metrics are credited to the hour of the event that completes them (claim, first reply, close)
+    hour = models.DateTimeField()
+    claimed = models.PositiveIntegerField(default=0)
+    claim_seconds = models.FloatField(default=0)
+    first_replies = models.PositiveIntegerField(default=0)
+    first_reply_seconds = models.FloatField(default=0)
+    closed = models.PositiveIntegerField(default=0)
+    handle_seconds = models.FloatField(default=0)
+    replies = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class HourlySLAStats(SLAStats):
+    created = models.PositiveIntegerField(default=0)
+    customer_replies = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["hour"], name="hourly_sla_stats_hour_uniq"),
+        ]
+
+
+class AgentHourlySLAStats(SLAStats):
+    agent = models.ForeignKey(Agent, on_delete=models.CASCADE, related_name='hourly_sla_stats')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["agent", "hour"], name="agent_hourly_sla_stats_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["hour"]),
+        ]
+
+
+class ArchivedMessage(models.Model):
+    """
+    A closed ticket moved out of the live tables by archive.TicketArchiver.
+    The thread is kept inline, in the shape the API returns replies.
+    """
+    external_id = models.UUIDField(unique=True)
+    customer = models.ForeignKey(Customer, on_delete=models.PROTECT, related_name='archived_messages')
+    assigned_to = models.ForeignKey(Agent, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    body = models.TextField()
+    status = models.CharField(max_length=20, default=Message.STATUS_CLOSED)
+    timestamp = models.DateTimeField()
+    created_at = models.DateTimeField()
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    replies = models.JSONField(default=list)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Archived msg {self.external_id}"
+
+
+class ArchivedInteractionLog(models.Model):
+    # Keyed by the ticket's external_id: the ticket itself may be archived too
+    message_external_id = models.UUIDField(db_index=True)
+    agent = models.ForeignKey(Agent, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    action = models.CharField(max_length=50)
+    timestamp = models.DateTimeField()
+
+
+class OutboxEvent(models.Model):
+    """
+    A websocket event written in the transaction that raised it, sent by outbox.OutboxRelay.
+    """
+    # Ticket external_id the event is about, '' when it covers several
+    key = models.CharField(max_length=64, blank=True)
+    event = models.JSONField()
+    # Channel layer groups it goes to (topics.event_groups)
+    groups = models.JSONField(default=list)
+    created_at = models.DateTimeField(default=timezone.now)
+    # Failed relay attempts so far
+    attempts = models.PositiveIntegerField(default=0)
+    # Set while a relay is sending it; a relay that dies mid-send lets it lapse
+    claimed_until = models.DateTimeField(null=True, blank=True)
@@ -0,0 +1,122 @@
+import logging
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, Min
+from django.utils import timezone
+from .models import OutboxEvent
+from .signals import BroadcastBatch
+
+logger = logging.getLogger(__name__)
+
+# Longest pause (seconds) between retries while the channel layer keeps failing
+MAX_RETRY_DELAY = 30
+
+
+class OutboxRelay:
+    """
+    Sends OutboxEvent rows to the channel layer, oldest first, and deletes them once sent.
+
+    A relay claims the head of the outbox in a short transaction (claimed_until), then
+    sends with no transaction or row lock open, so writers and other relays never wait on
+    the channel layer. Relays take turns rather than reordering events: while the head
+    is claimed, the others send nothing. A batch that fails to send is released at the
+    head of the outbox (attempts + 1) to be retried before anything newer, and the claim
+    of a relay that died mid-send lapses after OUTBOX_CLAIM_TIMEOUT. Delivery is at least
+    once: a batch can be re-sent if the relay dies, or overruns its claim, before deleting it.
+    Events for the same ticket in one batch are coalesced to its final state.
+    """
+
+    @classmethod
+    def relay_once(cls, batch_size: int = None) -> int:
+        """
+        Send one batch. Returns the number of rows sent (0 while another relay holds the head
+        of the outbox); raises if the channel layer failed.
+        """
+        rows = cls._claim(batch_size or settings.OUTBOX_RELAY_BATCH_SIZE)
+        if not rows:
+            return 0
+        claimed = OutboxEvent.objects.filter(id__in=[row.id for row in rows])
+        batch = BroadcastBatch()
+        for row in rows:
+            batch.add(row.key, row.event, row.groups)
+        try:
+            batch.send(raise_errors=True)
+        except Exception:
+            claimed.update(attempts=F('attempts') + 1, claimed_until=None)
+            raise
+        claimed.delete()
+        return len(rows)
+
+    @staticmethod
+    def _claim(batch_size: int) -> list:
+        # Lock the head rows just long enough to mark them as ours
+        now = timezone.now()
+        with transaction.atomic():
+            rows = list(OutboxEvent.objects.select_for_update().order_by('id')[:batch_size])
+            if any(row.claimed_until and row.claimed_until > now for row in rows):
+                return []
+            OutboxEvent.objects.filter(id__in=[row.id for row in rows]).update(
+                claimed_until=now + timedelta(seconds=settings.OUTBOX_CLAIM_TIMEOUT)
+            )
+        return rows
+
+    @classmethod
+    def drain(cls, batch_size: int = None, max_batches: int = None) -> int:
+        """
+        Send batches until the outbox is empty (or `max_batches` were sent).
+        """
+        sent, batches = 0, 0
+        while max_batches is None or batches < max_batches:
+            count = cls.relay_once(batch_size)
+            if not count:
+                break
+            sent += count
+            batches += 1
+        return sent
+
+    @classmethod
+    def run(cls, poll_interval: float = None, batch_size: int = None):
+        """
+        Relay loop for a dedicated worker: drain, sleep `poll_interval`, repeat.
+        Backs off exponentially while sends fail.
+        """
+        poll_interval = poll_interval or settings.OUTBOX_RELAY_INTERVAL
+        failures = 0
+        while True:
+            try:
+                cls.drain(batch_size)
+                failures = 0
+                time.sleep(poll_interval)
+            except Exception as e:
+                failures += 1
+                delay = min(poll_interval * 2 ** failures, MAX_RETRY_DELAY)
+                logger.error(f"Outbox relay failed ({failures} in a row), retrying in {delay:.1f}s: {str(e)}")
+                time.sleep(delay)
+
+    @classmethod
+    def check_backlog(cls) -> dict:
+        """
+        Log an error if the oldest pending event is older than OUTBOX_BACKLOG_ALERT_AGE, which
+        means no relay_outbox process is running (or it keeps failing). Returns depth().
+        """
+        depth = cls.depth()
+        if depth["oldest_age_seconds"] > settings.OUTBOX_BACKLOG_ALERT_AGE:
+            logger.error(
+                f"Outbox backlog: {depth['pending']} websocket events pending, oldest {depth['oldest_age_seconds']}s old "
+                f"(max attempts {depth['max_attempts']}). Is a relay_outbox process running?"
+            )
+        return depth
+
+    @staticmethod
+    def depth() -> dict:
+        """
+        Queue metrics to alert on: pending events, age of the oldest (seconds), most failed attempts.
+        """
+        stats = OutboxEvent.objects.aggregate(pending=Count('id'), oldest=Min('created_at'), max_attempts=Max('attempts'))
+        return {
+            "pending": stats["pending"],
+            "oldest_age_seconds": round((timezone.now() - stats["oldest"]).total_seconds(), 1) if stats["oldest"] else 0,
+            "max_attempts": stats["max_attempts"] or 0,
+        }
@@ -0,0 +1,239 @@
+import json
+from base64 import b64decode, b64encode
+from datetime import datetime
+from uuid import UUID
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor (keyset) pagination over the queryset's own ordering.
+
+    The cursor holds the ordering values of the row at the page boundary and the
+    next page is fetched with a tuple comparison on them, so there is no OFFSET
+    and pages stay stable while tickets are inserted or change state. `id` is
+    appended as a tie-breaker when the ordering does not already end in it.
+    Ordering fields must be non-null model fields or annotations.
+
+    Dropping OFFSET makes a deep page cost what the first one does, which is only
+    independent of the table size when an index serves the ordering. The inbox orders
+    on effective_priority, an expression over created_at that no index can hold: every
+    page evaluates it for each row left by the filters (the status index narrows those)
+    and keeps the best page_size in a top-N sort, so a page costs a scan of the slice.
+
+    The cursor also carries the instant the first page was read at. Orderings that
+    depend on the clock (effective_priority) must be built with get_now(request), so
+    every page of a listing compares tickets as of that instant: a ticket crossing an
+    age step between two fetches is neither skipped nor shown twice.
+
+    `?count=false` skips the COUNT(*) query; `count` is then null.
+    """
+    cursor_query_param = 'cursor'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        self.count = self.get_count(queryset, request)
+        self.now = self.get_now(request)
+
+        values, reverse = self.decode_cursor(request)
+        if values is not None:
+            values = self.clean_cursor_values(queryset, values)
+        if reverse:
+            ordering = [(field, not descending) for field, descending in self.ordering]
+        else:
+            ordering = self.ordering
+
+        queryset = queryset.order_by(*[('-' if descending else '') + field for field, descending in ordering])
+        if values is not None:
+            queryset = queryset.filter(self.build_keyset_filter(ordering, values))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        # Going backwards we always came from a later page; going forwards from an earlier one
+        self.has_next = has_more if not reverse else bool(results)
+        self.has_previous = has_more if reverse else values is not None and bool(results)
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'nullable': True},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, queryset):
+        ordering = []
+        for field in queryset.query.order_by:
+            if not isinstance(field, str):
+                raise TypeError("KeysetPagination only supports ordering by field or annotation names")
+            ordering.append((field.lstrip('-'), field.startswith('-')))
+        if not ordering or ordering[-1][0] not in ('id', 'pk'):
+            ordering.append(('id', False))
+        return ordering
+
+    def get_count(self, queryset, request):
+        if not self.count_requested(request):
+            return None
+        return queryset.order_by().count()
+
+    def count_requested(self, request) -> bool:
+        return request.query_params.get(self.count_query_param, '').lower() not in ('0', 'false', 'no')
+
+    def get_first_page_response(self, request, results, boundary, has_next, count, ordering):
+        """
+        Response for a first page assembled outside the ORM (see inbox_cache.HotInbox).
+        `boundary` holds the last row's values for `ordering`; deeper pages use the DB.
+        """
+        self.base_url = request.build_absolute_uri()
+        self.ordering = ordering
+        self.now = self.get_now(request)
+        return Response({
+            'count': count,
+            'next': self._cursor_link(boundary, reverse=False) if has_next else None,
+            'previous': None,
+            'results': results,
+        })
+
+    def build_keyset_filter(self, ordering, values):
+        # (a, b, c) after (x, y, z)  =>  a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        keyset = Q()
+        for index, (field, descending) in enumerate(ordering):
+            lookup = {prev_field: values[prev] for prev, (prev_field, _) in enumerate(ordering[:index])}
+            lookup[f"{field}__{'lt' if descending else 'gt'}"] = values[index]
+            keyset |= Q(**lookup)
+        return keyset
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, obj, reverse):
+        return self._cursor_link([getattr(obj, field) for field, _ in self.ordering], reverse)
+
+    def _cursor_link(self, values, reverse):
+        values = [self._to_json(value) for value in values]
+        cursor = {'v': values, 'r': reverse, 't': self.now.isoformat()}
+        token = b64encode(json.dumps(cursor).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def get_now(self, request):
+        """
+        The listing's evaluation time: the cursor's, or the current time on a first page.
+        """
+        if getattr(self, '_now_request', None) is not request:
+            cursor = self.load_cursor(request)
+            now = timezone.now()
+            if cursor is not None and 't' in cursor:
+                try:
+                    now = parse_datetime(cursor['t'])
+                except (TypeError, ValueError):
+                    now = None
+                if now is None or timezone.is_naive(now):
+                    raise NotFound(self.invalid_cursor_message)
+            self._now_request, self._now = request, now
+        return self._now
+
+    def load_cursor(self, request):
+        # The decoded cursor token, None without one
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            cursor = json.loads(b64decode(token.encode('ascii')).decode('ascii'))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(cursor, dict):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def decode_cursor(self, request):
+        cursor = self.load_cursor(request)
+        if cursor is None:
+            return None, False
+        try:
+            values, reverse = cursor['v'], bool(cursor['r'])
+        except KeyError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def clean_cursor_values(self, queryset, values):
+        """
+        Cursor values converted by their ordering fields, so a tampered token is a 404
+        rather than a database error.
+        """
+        cleaned = []
+        for (field, _), value in zip(self.ordering, values):
+            output_field = self._output_field(queryset, field)
+            if value is None or isinstance(value, (bool, dict, list)):
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                cleaned.append(output_field.to_python(value))
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        return cleaned
+
+    @staticmethod
+    def _output_field(queryset, name):
+        annotation = queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        try:
+            return queryset.model._meta.get_field('id' if name == 'pk' else name)
+        except FieldDoesNotExist:
+            raise TypeError(f"KeysetPagination cannot order by {name!r}")
+
+    @staticmethod
+    def _to_json(value):
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, UUID):
+            return str(value)
+        return value
@@ -0,0 +1,154 @@
+from django.db import connection
+from django.db.models import FloatField, BooleanField, Q, QuerySet, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+from .models import Customer
+
+# PostgreSQL: tsvector column kept current by a trigger + GIN index on messaging_message
+PG_SEARCH_COLUMN = "search_vector"
+PG_SEARCH_INDEX = "messaging_message_search_idx"
+PG_SEARCH_TRIGGER = "messaging_message_search_trg"
+PG_SEARCH_FUNCTION = "messaging_message_search_vector"
+# Rows (by id range) filled per backfill statement, each its own short transaction
+PG_BACKFILL_BATCH = 5000
+# SQLite: FTS5 external-content table mirrored from messaging_message by triggers
+SQLITE_FTS_TABLE = "messaging_message_fts"
+
+SQLITE_FTS_STATEMENTS = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE}
+        USING fts5(body, content='messaging_message', content_rowid='id', tokenize='porter unicode61')""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_ai AFTER INSERT ON messaging_message BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}(rowid, body) VALUES (new.id, new.body);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_ad AFTER DELETE ON messaging_message BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, body) VALUES ('delete', old.id, old.body);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_au AFTER UPDATE OF body ON messaging_message BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, body) VALUES ('delete', old.id, old.body);
+        INSERT INTO {SQLITE_FTS_TABLE}(rowid, body) VALUES (new.id, new.body);
+    END""",
+]
+
+
+PG_SEARCH_STATEMENTS = [
+    # Nullable, no default: a catalog-only change, the table is not rewritten
+    f"ALTER TABLE messaging_message ADD COLUMN IF NOT EXISTS {PG_SEARCH_COLUMN} tsvector",
+    f"""CREATE OR REPLACE FUNCTION {PG_SEARCH_FUNCTION}() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.{PG_SEARCH_COLUMN} := to_tsvector('english', coalesce(NEW.body, ''));
+            RETURN NEW;
+        END
+    $$""",
+    f"""CREATE OR REPLACE TRIGGER {PG_SEARCH_TRIGGER} BEFORE INSERT OR UPDATE OF body ON messaging_message
+        FOR EACH ROW EXECUTE FUNCTION {PG_SEARCH_FUNCTION}()""",
+]
+
+
+def install_search_index(conn=connection):
+    """
+    Create the vendor-specific full-text index for Message.body. Idempotent.
+    On PostgreSQL, outside a transaction, no step blocks writes for longer than
+    a catalog change: existing rows are backfilled in batches and the index is
+    built concurrently (migration 0007 is non-atomic for this).
+    SQLite drops triggers whenever Django rebuilds the messaging_message table,
+    so this also runs after every migrate (see signals.py) and rebuilds the FTS
+    table when a trigger had to be recreated.
+    """
+    with conn.cursor() as cursor:
+        if conn.vendor == "postgresql":
+            # The trigger goes in before the backfill, so rows written meanwhile are never missed
+            for statement in PG_SEARCH_STATEMENTS:
+                cursor.execute(statement)
+            _backfill_search_column(cursor)
+            _create_search_index(cursor, concurrently=not conn.in_atomic_block)
+        elif conn.vendor == "sqlite":
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+                [f"{SQLITE_FTS_TABLE}_a_"]
+            )
+            existing_triggers = cursor.fetchone()[0]
+            for statement in SQLITE_FTS_STATEMENTS:
+                cursor.execute(statement)
+            if existing_triggers < 3:
+                cursor.execute(f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('rebuild')")
+
+
+def _backfill_search_column(cursor):
+    # Walk the primary key in ranges; in autocommit each batch commits on its own
+    cursor.execute("SELECT coalesce(max(id), 0) FROM messaging_message")
+    last_id = cursor.fetchone()[0]
+    for start in range(0, last_id, PG_BACKFILL_BATCH):
+        cursor.execute(
+            f"UPDATE messaging_message SET {PG_SEARCH_COLUMN} = to_tsvector('english', coalesce(body, '')) "
+            f"WHERE id > %s AND id <= %s AND {PG_SEARCH_COLUMN} IS NULL",
+            [start, start + PG_BACKFILL_BATCH]
+        )
+
+
+def _create_search_index(cursor, concurrently=True):
+    option = "CONCURRENTLY " if concurrently else ""
+    # A failed concurrent build leaves an invalid index behind, which IF NOT EXISTS would keep
+    cursor.execute(
+        "SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", [PG_SEARCH_INDEX]
+    )
+    row = cursor.fetchone()
+    if row and row[0]:
+        cursor.execute(f"DROP INDEX {option}{PG_SEARCH_INDEX}")
+    cursor.execute(
+        f"CREATE INDEX {option}IF NOT EXISTS {PG_SEARCH_INDEX} ON messaging_message USING GIN ({PG_SEARCH_COLUMN})"
+    )
+
+
+def uninstall_search_index(conn=connection):
+    with conn.cursor() as cursor:
+        if conn.vendor == "postgresql":
+            cursor.execute(f"DROP INDEX IF EXISTS {PG_SEARCH_INDEX}")
+            cursor.execute(f"DROP TRIGGER IF EXISTS {PG_SEARCH_TRIGGER} ON messaging_message")
+            cursor.execute(f"DROP FUNCTION IF EXISTS {PG_SEARCH_FUNCTION}()")
+            cursor.execute(f"ALTER TABLE messaging_message DROP COLUMN IF EXISTS {PG_SEARCH_COLUMN}")
+        elif conn.vendor == "sqlite":
+            for suffix in ("ai", "ad", "au"):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_{suffix}")
+            cursor.execute(f"DROP TABLE IF EXISTS {SQLITE_FTS_TABLE}")
+
+
+def _fts5_query(search_q: str) -> str:
+    # Quote every term so user input is never parsed as FTS5 syntax; terms are AND-ed
+    return " ".join('"{}"'.format(term.replace('"', '""')) for term in search_q.split())
+
+
+def search_messages(qs: QuerySet, search_q: str) -> QuerySet:
+    """
+    Filter a Message queryset to full-text matches on body (or an exact customer
+    user_id) and annotate `search_rank`, higher is better.
+    Backends without a full-text index fall back to a substring match with rank 0.
+    """
+    # Index lookup on customer_id rather than a join, so the OR can use both indexes
+    by_customer = Q(customer_id__in=Customer.objects.filter(user_id=search_q).values('id'))
+
+    if connection.vendor == "postgresql":
+        tsquery = "websearch_to_tsquery('english', %s)"
+        matches = RawSQL(f"messaging_message.{PG_SEARCH_COLUMN} @@ {tsquery}", [search_q], output_field=BooleanField())
+        rank = RawSQL(f"ts_rank_cd(messaging_message.{PG_SEARCH_COLUMN}, {tsquery})", [search_q], output_field=FloatField())
+    elif connection.vendor == "sqlite":
+        fts_q = _fts5_query(search_q)
+        if not fts_q:
+            return qs.annotate(search_rank=Value(0.0, output_field=FloatField())).none()
+        matches = RawSQL(
+            f"messaging_message.id IN (SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH %s)",
+            [fts_q], output_field=BooleanField()
+        )
+        # bm25() is lower-is-better, negate it so every backend ranks descending
+        rank = RawSQL(
+            f"(SELECT -bm25({SQLITE_FTS_TABLE}) FROM {SQLITE_FTS_TABLE} "
+            f"WHERE {SQLITE_FTS_TABLE} MATCH %s AND rowid = messaging_message.id)",
+            [fts_q], output_field=FloatField()
+        )
+    else:
+        return qs.filter(Q(body__icontains=search_q) | by_customer).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+    return qs.filter(Q(matches) | by_customer).annotate(
+        search_rank=Coalesce(rank, Value(0.0), output_field=FloatField())
+    )
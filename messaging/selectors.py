@@ -1,18 +1,161 @@
-from .models import Message
-from django.db.models import QuerySet, Q
+from .cache import agent_cache, canned_response_cache
+from .canned_templates import CannedTemplate
+from .models import (
+    Agent, AgentHourlySLAStats, ArchivedMessage, CannedResponse, HourlySLAStats, Message, MessageReply
+)
+from .search import search_messages
+from .utils import MAX_AGE_SCORE, priority_expression
+from django.db.models import QuerySet, Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Substr
+
+# Characters of the body shown per row in the inbox list
+SNIPPET_LENGTH = 140
+# Below any stored keyword score (an int column), for an open-ended range
+MIN_KEYWORD_SCORE = -2 ** 31
 
 class MessageSelector:
     @staticmethod
-    def get_priority_inbox(status_q: str=None, search_q: str=None) -> QuerySet[Message]:
-        # Eliminates N+1 queries by fetching relationships
-        qs = Message.objects.select_related('customer', 'assigned_to').prefetch_related('replies', 'replies__agent').all()
+    def get_priority_inbox(status_q: str=None, search_q: str=None, now=None) -> QuerySet[Message]:
+        # `now`: the instant effective_priority is evaluated at (KeysetPagination.get_now)
+        qs = MessageSelector.get_inbox_rows(now)
 
         if status_q:
             qs = qs.filter(status=status_q)
 
         if search_q:
-            qs = qs.filter(Q(body__icontains=search_q) | Q(customer__user_id__icontains=search_q))
+            # Full-text index match, best match first
+            qs = search_messages(qs, search_q)
+            return qs.order_by('-search_rank', '-effective_priority', 'created_at')
+
+        # Sort by high priority then oldest first. The priority is computed per row, so the
+        # status index only narrows the rows: the sort runs over the whole slice on every page
+        return qs.order_by('-effective_priority', 'created_at')
+
+    @staticmethod
+    def get_agent_queue(agent_id: int, status_q: str = Message.STATUS_IN_PROGRESS, now=None) -> QuerySet[Message]:
+        # Tickets assigned to one agent. message_agent_queue_idx only finds the (agent, status) rows:
+        # the priority depends on age, so they are sorted on every page like the inbox slice
+        qs = MessageSelector.get_inbox_rows(now).filter(assigned_to_id=agent_id, status=status_q)
+        return qs.order_by('-effective_priority', 'created_at')
+
+    @staticmethod
+    def get_claim_queue(limit: int = None) -> QuerySet[Message]:
+        # Bare unassigned rows in inbox order, for locking in the claim dispatcher.
+        # With `limit`, only rows that can still make the top `limit`: the age terms add at most
+        # MAX_AGE_SCORE, so nothing scoring under the limit-th keyword score minus that can.
+        # The bound is an index range on (status, keyword_score), so the sort only sees those rows.
+        qs = Message.objects.filter(status=Message.STATUS_UNASSIGNED)
+        if limit:
+            floor = Message.objects.filter(status=Message.STATUS_UNASSIGNED).order_by('-keyword_score').annotate(
+                floor=F('keyword_score') - MAX_AGE_SCORE
+            ).values('floor')[limit - 1:limit]
+            # Fewer than `limit` unassigned rows: no bound
+            qs = qs.filter(keyword_score__gte=Coalesce(Subquery(floor), Value(MIN_KEYWORD_SCORE)))
+        return qs.annotate(effective_priority=priority_expression()).order_by('-effective_priority', 'created_at', 'id')
+
+    @staticmethod
+    def get_message_thread() -> QuerySet[Message]:
+        # Full ticket with its replies, for a single message view
+        return Message.objects.select_related('customer', 'assigned_to').prefetch_related(
+            'replies', 'replies__agent'
+        ).annotate(effective_priority=priority_expression())
+
+    @staticmethod
+    def get_message_replies(message_id: int) -> QuerySet[MessageReply]:
+        # Newest first, served from the (message, created_at) index
+        return MessageReply.objects.select_related('agent').filter(
+            message_id=message_id
+        ).order_by('-created_at', '-id')
+
+    @staticmethod
+    def get_inbox_rows(now=None) -> QuerySet[Message]:
+        # Inbox rows only carry a thread summary: no reply prefetch, no full body.
+        # Priority is computed in SQL so it is always current for the ticket's age
+        return Message.objects.select_related('customer', 'assigned_to').defer('body').annotate(
+            effective_priority=priority_expression(now),
+            body_snippet=Substr('body', 1, SNIPPET_LENGTH),
+            **MessageSelector._thread_summary()
+        )
+
+    @staticmethod
+    def _thread_summary() -> dict:
+        # Correlated subqueries on the message FK: reply count plus the latest reply
+        replies = MessageReply.objects.filter(message=OuterRef('pk'))
+        latest = replies.order_by('-created_at', '-id')
+        reply_count = replies.order_by().values('message').annotate(count=Count('id')).values('count')
+        return {
+            'reply_count': Coalesce(Subquery(reply_count), 0),
+            'last_reply_at': Subquery(latest.values('created_at')[:1]),
+            'last_reply_agent': Subquery(latest.values('agent__name')[:1]),
+            'last_reply_is_customer': Subquery(latest.values('is_customer')[:1]),
+        }
+
+
+class ArchiveSelector:
+    @staticmethod
+    def get_archived_thread(external_id) -> ArchivedMessage:
+        # Archived ticket with its inline thread, or None
+        return ArchivedMessage.objects.select_related('customer', 'assigned_to').filter(external_id=external_id).first()
+
 
-        # Sort by high priority then oldest first
-        return qs.order_by('-priority', 'created_at')
+class AgentSelector:
+    @staticmethod
+    def get_by_external_id(external_id) -> Agent:
+        """
+        Agent for a write path, served from the two-level cache. Raises Agent.DoesNotExist.
+        """
+        return agent_cache.get(
+            f"external_id:{external_id}",
+            lambda: Agent.objects.only('id', 'external_id', 'name').get(external_id=external_id)
+        )
+
+    @staticmethod
+    def forget():
+        agent_cache.invalidate()
+
+
+class CannedResponseSelector:
+    @staticmethod
+    def get_by_external_id(external_id) -> CannedResponse:
+        # Raises CannedResponse.DoesNotExist
+        return canned_response_cache.get(
+            f"external_id:{external_id}",
+            lambda: CannedResponse.objects.get(external_id=external_id)
+        )
+
+    @staticmethod
+    def get_template(external_id) -> CannedTemplate:
+        # Parsed body, cached under the same version as the row. Raises CannedResponse.DoesNotExist
+        return canned_response_cache.get(
+            f"template:{external_id}",
+            lambda: CannedTemplate(CannedResponseSelector.get_by_external_id(external_id).body)
+        )
+
+    @staticmethod
+    def list_all() -> list[CannedResponse]:
+        # The whole (small) table, in a stable order for page-number pagination
+        return canned_response_cache.get("all", lambda: list(CannedResponse.objects.order_by('id')))
+
+    @staticmethod
+    def forget():
+        canned_response_cache.invalidate()
+
+
+# Summed per agent over a range of AgentHourlySLAStats rows
+SLA_TOTAL_FIELDS = (
+    'claimed', 'claim_seconds', 'first_replies', 'first_reply_seconds', 'closed', 'handle_seconds', 'replies'
+)
 
+
+class AnalyticsSelector:
+    @staticmethod
+    def get_hourly(since, until, agent_id: int = None) -> QuerySet:
+        # One row per hour with activity, overall or for one agent
+        qs = AgentHourlySLAStats.objects.filter(agent_id=agent_id) if agent_id else HourlySLAStats.objects.all()
+        return qs.filter(hour__gte=since, hour__lt=until).order_by('hour')
+
+    @staticmethod
+    def get_agent_totals(since, until) -> QuerySet:
+        return AgentHourlySLAStats.objects.filter(hour__gte=since, hour__lt=until).values(
+            'agent__external_id', 'agent__name'
+        ).annotate(**{field: Sum(field) for field in SLA_TOTAL_FIELDS}).order_by('agent__name', 'agent__external_id')
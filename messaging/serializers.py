@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import Message, Customer, CannedResponse, Agent, MessageReply
+from .models import Message, Customer, CannedResponse, Agent, MessageReply, ArchivedMessage
+from .canned_templates import PLACEHOLDERS, CannedTemplate
+from .utils import calculate_age_score, calculate_priority
 
 class CustomerSerializer(serializers.ModelSerializer):
     class Meta:
@@ -22,16 +24,70 @@ class MessageSerializer(serializers.ModelSerializer):
     customer = CustomerSerializer()
     assigned_to = AgentSerializer()
     replies = MessageReplyObjectSerializer(many=True, read_only=True)
+    priority = serializers.SerializerMethodField()
 
     class Meta:
         model = Message
         fields = ['external_id', 'customer', 'body', 'created_at', 'status', 'assigned_to', 'priority', 'replies']
 
+    def get_priority(self, obj) -> int:
+        # Selector querysets annotate it; single rows (e.g. a create response) are scored here
+        if hasattr(obj, 'effective_priority'):
+            return obj.effective_priority
+        return obj.keyword_score + calculate_age_score(obj.created_at, obj.status)
+
+class ArchivedMessageSerializer(serializers.ModelSerializer):
+    """
+    Same shape as MessageSerializer; replies were serialized when the ticket was archived.
+    """
+    customer = CustomerSerializer()
+    assigned_to = AgentSerializer()
+    priority = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ArchivedMessage
+        fields = ['external_id', 'customer', 'body', 'created_at', 'status', 'assigned_to', 'priority', 'replies', 'archived_at']
+
+    def get_priority(self, obj) -> int:
+        return calculate_priority(obj.body, obj.created_at, obj.status)
+
+class MessageListSerializer(serializers.ModelSerializer):
+    """
+    Inbox row: body snippet and thread summary instead of the full thread.
+    """
+    customer = CustomerSerializer()
+    assigned_to = AgentSerializer()
+    priority = serializers.IntegerField(source='effective_priority', read_only=True)
+    body_snippet = serializers.CharField(read_only=True)
+    reply_count = serializers.IntegerField(read_only=True)
+    last_reply = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Message
+        fields = ['external_id', 'customer', 'body_snippet', 'created_at', 'status', 'assigned_to', 'priority', 'reply_count', 'last_reply']
+
+    def get_last_reply(self, obj) -> dict:
+        if obj.last_reply_at is None:
+            return None
+        return {
+            'created_at': serializers.DateTimeField().to_representation(obj.last_reply_at),
+            'is_customer': bool(obj.last_reply_is_customer),
+            'agent': obj.last_reply_agent,
+        }
+
 class CannedResponseSerializer(serializers.ModelSerializer):
     class Meta:
         model = CannedResponse
         fields = ['external_id', 'title', 'body']
 
+    def validate_body(self, value):
+        unknown = CannedTemplate(value).unknown_placeholders
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown placeholders: {', '.join(sorted(unknown))}. Available: {', '.join(PLACEHOLDERS)}"
+            )
+        return value
+
 class MessageCreateSerializer(serializers.Serializer):
     user_id = serializers.CharField(max_length=50)
     body = serializers.CharField()
@@ -42,6 +98,16 @@ class MessageCreateSerializer(serializers.Serializer):
 class MessageClaimSerializer(serializers.Serializer):
     agent_id = serializers.UUIDField()
 
+class MessageClaimNextSerializer(serializers.Serializer):
+    agent_id = serializers.UUIDField()
+    count = serializers.IntegerField(min_value=1, default=1)
+
+class MessageBulkActionSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=['close', 'reassign', 'unassign'])
+    # Strings, not UUIDField: a malformed id is reported per id ("invalid"), not as a 400 for the batch
+    external_ids = serializers.ListField(child=serializers.CharField(allow_blank=True), allow_empty=False)
+    agent_id = serializers.UUIDField(required=False)
+
 class MessageReplySerializer(serializers.Serializer):
     agent_id = serializers.UUIDField()
     text = serializers.CharField()
@@ -52,3 +118,50 @@ class MessageCannedReplySerializer(serializers.Serializer):
 
 class CustomerReplySerializer(serializers.Serializer):
     text = serializers.CharField()
+
+
+class AnalyticsQuerySerializer(serializers.Serializer):
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+    agent_id = serializers.UUIDField(required=False)
+
+    def validate(self, attrs):
+        if attrs.get('since') and attrs.get('until') and attrs['since'] >= attrs['until']:
+            raise serializers.ValidationError("since must be before until")
+        return attrs
+
+class SLAStatsSerializer(serializers.Serializer):
+    """
+    Rollup counts with the mean durations (seconds) derived from their totals.
+    """
+    claimed = serializers.IntegerField()
+    avg_time_to_claim = serializers.SerializerMethodField()
+    first_replies = serializers.IntegerField()
+    avg_time_to_first_reply = serializers.SerializerMethodField()
+    closed = serializers.IntegerField()
+    avg_handle_time = serializers.SerializerMethodField()
+    replies = serializers.IntegerField()
+
+    @staticmethod
+    def _mean(row, total, count):
+        row = row if isinstance(row, dict) else vars(row)
+        return round(row[total] / row[count], 1) if row[count] else None
+
+    def get_avg_time_to_claim(self, obj) -> float:
+        return self._mean(obj, 'claim_seconds', 'claimed')
+
+    def get_avg_time_to_first_reply(self, obj) -> float:
+        return self._mean(obj, 'first_reply_seconds', 'first_replies')
+
+    def get_avg_handle_time(self, obj) -> float:
+        return self._mean(obj, 'handle_seconds', 'closed')
+
+class HourlySLAStatsSerializer(SLAStatsSerializer):
+    hour = serializers.DateTimeField()
+    # Only on the overall rows, not per agent
+    created = serializers.IntegerField(required=False)
+    customer_replies = serializers.IntegerField(required=False)
+
+class AgentSLAStatsSerializer(SLAStatsSerializer):
+    agent_id = serializers.UUIDField(source='agent__external_id')
+    agent_name = serializers.CharField(source='agent__name')
@@ -1,11 +1,38 @@
-from django.db import transaction
+import uuid
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
 from django.utils import timezone
-from .models import Message, Agent, CannedResponse, InteractionLog, Customer, MessageReply
-from .utils import calculate_priority
+from .models import Message, Agent, CannedResponse, Customer, MessageReply
+from .archive import TicketArchiver
+from .audit import InteractionLogBuffer
+from .utils import calculate_keyword_score
+from .inbox_cache import HotInbox
+from .counters import MessageCounters
+from .ticket_routing import TicketRouter
+from .selectors import AgentSelector, CannedResponseSelector, MessageSelector
+from .signals import broadcast_bulk_transition, broadcast_bulk_update
+
+# Most tickets one claim_next call may take
+MAX_CLAIM_BATCH = 20
+
+# Bulk actions: target status and the InteractionLog action recorded per ticket
+BULK_ACTIONS = {
+    "close": (Message.STATUS_CLOSED, "CLOSED"),
+    "reassign": (Message.STATUS_IN_PROGRESS, "REASSIGNED"),
+    "unassign": (Message.STATUS_UNASSIGNED, "UNASSIGNED"),
+}
+MAX_BULK_ACTION = 5000
+# external_ids per IN (...) lookup / UPDATE, under SQLite's bound parameter limit
+BULK_CHUNK_SIZE = 500
 
 class ApplicationError(Exception):
     pass
 
+def _supports_update_returning() -> bool:
+    if connection.vendor == 'postgresql':
+        return True
+    return connection.vendor == 'sqlite' and connection.Database.sqlite_version_info >= (3, 35)
+
 class MessageService:
     @staticmethod
     def create_message(*, user_id: str, body: str, name: str = None, phone: str = None, email: str = None) -> Message:
@@ -19,120 +46,381 @@ class MessageService:
             customer.save()
 
         now = timezone.now()
-        
-        # Calculate priority right on creation
-        priority = calculate_priority(body, now, Message.STATUS_UNASSIGNED)
-        
-        msg = Message.objects.create(
-            customer=customer,
-            body=body,
-            status=Message.STATUS_UNASSIGNED,
-            timestamp=now,
-            priority=priority
-        )
-        InteractionLog.objects.create(message=msg, action="CREATED")
+
+        # Routed tickets are created already assigned, no claim round trip.
+        # The agent's slot is taken now, so it is given back if the insert rolls back
+        # (if an enclosing transaction rolls back later, the counter reconcile corrects it)
+        agent = TicketRouter.pick_agent(body)
+        status = Message.STATUS_IN_PROGRESS if agent else Message.STATUS_UNASSIGNED
+
+        try:
+            with transaction.atomic():
+                msg = Message.objects.create(
+                    customer=customer,
+                    body=body,
+                    status=status,
+                    assigned_to=agent,
+                    claimed_at=now if agent else None,
+                    timestamp=now,
+                    keyword_score=calculate_keyword_score(body)
+                )
+                logs = [(msg.pk, "CREATED", None, now)]
+                if agent:
+                    logs.append((msg.pk, "ROUTED", agent.pk, now))
+                    TicketRouter.record_routed(agent)
+                else:
+                    transaction.on_commit(lambda: HotInbox.sync(msg))
+                    MessageCounters.record_created()
+                InteractionLogBuffer.record_many(logs)
+        except Exception:
+            if agent:
+                TicketRouter.release(agent)
+            raise
         return msg
 
     @staticmethod
     def claim_message(*, message_external_id: str, agent_external_id: str) -> Message:
+        """
+        Claim one unassigned ticket with a conditional UPDATE, no row lock held across queries.
+        Queries: the claim UPDATE and the realtime outbox insert (plus the agent lookup when
+        it is not cached yet); a lost race costs the UPDATE and one lookup for the winner's
+        name. The CLAIMED log is written after commit by InteractionLogBuffer.
+        Returns a partially loaded Message (pk, external_id, status, assignment, keyword_score).
+        """
         try:
-            agent = Agent.objects.get(external_id=agent_external_id)
-        except Agent.DoesNotExist:
+            agent = AgentSelector.get_by_external_id(agent_external_id)
+        except (Agent.DoesNotExist, ValidationError):
             raise ApplicationError("Invalid agent_id")
 
         now = timezone.now()
 
         with transaction.atomic():
-            # Best in class concurrency control: select_for_update with skip_locked
-            msg = Message.objects.select_for_update(skip_locked=True).filter(
-                external_id=message_external_id,
-                status=Message.STATUS_UNASSIGNED
-            ).first()
+            try:
+                claimed = MessageService._claim_unassigned(message_external_id, agent, now)
+            except ValidationError:
+                raise ApplicationError("message not found")
 
-            if not msg:
+            if claimed is None:
                 # Check if it was already claimed by someone else
-                existing = Message.objects.filter(external_id=message_external_id).select_related('assigned_to').first()
+                existing = Message.objects.filter(external_id=message_external_id).values_list(
+                    'pk', 'assigned_to__name'
+                ).first()
                 if not existing:
                     raise ApplicationError("message not found")
-                
-                assigned_name = existing.assigned_to.name if existing.assigned_to else "Unknown Agent"
+
+                assigned_name = existing[1] or "Unknown Agent"
                 raise ApplicationError(f"already_claimed_by:{assigned_name}")
 
-            msg.assigned_to = agent
-            msg.status = Message.STATUS_IN_PROGRESS
-            msg.claimed_at = now
-            msg.save(update_fields=['assigned_to', 'status', 'claimed_at'])
+            pk, keyword_score = claimed
+            msg = Message(
+                pk=pk, external_id=Message._meta.get_field('external_id').to_python(message_external_id),
+                keyword_score=keyword_score, status=Message.STATUS_IN_PROGRESS, assigned_to=agent, claimed_at=now
+            )
 
-            InteractionLog.objects.create(message=msg, agent=agent, action="CLAIMED")
+            InteractionLogBuffer.record(msg.pk, "CLAIMED", agent.pk, now)
+            # QuerySet/raw updates send no post_save
+            transaction.on_commit(lambda: HotInbox.discard([msg]))
+            broadcast_bulk_update([msg], agent.external_id, previous_status=Message.STATUS_UNASSIGNED)
+            MessageCounters.record_transition(
+                Message.STATUS_UNASSIGNED, Message.STATUS_IN_PROGRESS, new_agent=agent.external_id
+            )
             return msg
 
+    @staticmethod
+    def _claim_unassigned(message_external_id, agent: Agent, now):
+        """
+        UPDATE the ticket to in_progress only if it is still unassigned.
+        Returns (pk, keyword_score), or None when nothing was updated.
+        """
+        field = Message._meta.get_field
+        if _supports_update_returning():
+            table = Message._meta.db_table
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {table} SET {field('assigned_to').column} = %s, status = %s, claimed_at = %s "
+                    f"WHERE external_id = %s AND status = %s RETURNING id, keyword_score",
+                    [
+                        agent.pk, Message.STATUS_IN_PROGRESS,
+                        field('claimed_at').get_db_prep_value(now, connection),
+                        field('external_id').get_db_prep_value(message_external_id, connection),
+                        Message.STATUS_UNASSIGNED,
+                    ]
+                )
+                return cursor.fetchone()
+
+        # Portable fallback: the same conditional UPDATE, then read the row back
+        updated = Message.objects.filter(external_id=message_external_id, status=Message.STATUS_UNASSIGNED).update(
+            assigned_to=agent, status=Message.STATUS_IN_PROGRESS, claimed_at=now
+        )
+        if not updated:
+            return None
+        return Message.objects.filter(external_id=message_external_id).values_list('pk', 'keyword_score').get()
+
+    @staticmethod
+    def claim_next(*, agent_external_id: str, count: int = 1) -> list[Message]:
+        """
+        Claim the `count` highest-priority unassigned tickets for an agent.
+        Rows locked by a concurrent claimer are skipped rather than waited on, so
+        parallel callers get disjoint tickets instead of already_claimed conflicts.
+        """
+        if not 1 <= count <= MAX_CLAIM_BATCH:
+            raise ApplicationError(f"count must be between 1 and {MAX_CLAIM_BATCH}")
+        try:
+            agent = AgentSelector.get_by_external_id(agent_external_id)
+        except (Agent.DoesNotExist, ValidationError):
+            raise ApplicationError("Invalid agent_id")
+
+        now = timezone.now()
+
+        with transaction.atomic():
+            # Top rows by effective priority among those that can make the top `count`, skipping
+            # rows other claimers hold. If those held most of the range, widen to the whole inbox
+            candidates = list(
+                MessageSelector.get_claim_queue(limit=count).select_for_update(skip_locked=True)
+                .only('pk', 'external_id', 'keyword_score')[:count]
+            )
+            if len(candidates) < count and connection.features.has_select_for_update_skip_locked:
+                candidates = list(
+                    MessageSelector.get_claim_queue().select_for_update(skip_locked=True)
+                    .only('pk', 'external_id', 'keyword_score')[:count]
+                )
+            if not candidates:
+                return []
+
+            pks = [msg.pk for msg in candidates]
+            claimed = Message.objects.filter(pk__in=pks, status=Message.STATUS_UNASSIGNED).update(
+                assigned_to=agent, status=Message.STATUS_IN_PROGRESS, claimed_at=now
+            )
+            if claimed != len(candidates):
+                # Backends without row locks (SQLite): keep only the rows this update won
+                won = set(Message.objects.filter(pk__in=pks, assigned_to=agent, claimed_at=now).values_list('pk', flat=True))
+                candidates = [msg for msg in candidates if msg.pk in won]
+            for msg in candidates:
+                msg.status = Message.STATUS_IN_PROGRESS
+
+            InteractionLogBuffer.record_many([(msg.pk, "CLAIMED", agent.pk, now) for msg in candidates])
+            transaction.on_commit(lambda: HotInbox.discard(candidates))
+            broadcast_bulk_update(candidates, agent.external_id, previous_status=Message.STATUS_UNASSIGNED)
+            MessageCounters.record_transition(
+                Message.STATUS_UNASSIGNED, Message.STATUS_IN_PROGRESS,
+                new_agent=agent.external_id, count=len(candidates)
+            )
+            return candidates
+
+    @staticmethod
+    def bulk_action(*, action: str, message_external_ids: list, agent_external_id: str = None) -> dict:
+        """
+        Apply one transition to many tickets in a single transaction.
+        - close: open ticket -> closed, assignment kept
+        - reassign: open ticket -> in progress for `agent_external_id`
+        - unassign: ticket in progress -> back to the unassigned inbox
+        `agent_external_id` is the new owner for reassign and is logged as the actor otherwise.
+        Returns {external_id: result} with result "ok", "unchanged", "not_found",
+        "closed" (reassign/unassign of a closed ticket) or "invalid" (not a UUID).
+        """
+        if action not in BULK_ACTIONS:
+            raise ApplicationError(f"action must be one of: {', '.join(BULK_ACTIONS)}")
+        if not message_external_ids:
+            raise ApplicationError("external_ids is required")
+        if len(message_external_ids) > MAX_BULK_ACTION:
+            raise ApplicationError(f"at most {MAX_BULK_ACTION} external_ids per request")
+
+        # One malformed id is reported in the results instead of failing the whole batch
+        results, external_ids = {}, []
+        for raw_id in message_external_ids:
+            try:
+                external_id = str(uuid.UUID(str(raw_id)))
+            except ValueError:
+                results[str(raw_id)] = "invalid"
+                continue
+            if external_id not in results:
+                results[external_id] = "not_found"
+                external_ids.append(external_id)
+
+        agent = None
+        if agent_external_id:
+            try:
+                agent = AgentSelector.get_by_external_id(agent_external_id)
+            except (Agent.DoesNotExist, ValidationError):
+                raise ApplicationError("Invalid agent_id")
+        if action == "reassign" and agent is None:
+            raise ApplicationError("agent_id is required to reassign")
+
+        new_status, log_action = BULK_ACTIONS[action]
+        new_agent = agent if action == "reassign" else None
+        now = timezone.now()
+
+        with transaction.atomic():
+            messages = []
+            for start in range(0, len(external_ids), BULK_CHUNK_SIZE):
+                messages += Message.objects.select_for_update(of=('self',)).select_related('assigned_to').filter(
+                    external_id__in=external_ids[start:start + BULK_CHUNK_SIZE]
+                ).only('id', 'external_id', 'status', 'keyword_score', 'assigned_to', 'assigned_to__external_id')
+
+            changed, transitions = [], []
+            for msg in messages:
+                key = str(msg.external_id)
+                if msg.status == Message.STATUS_CLOSED and action != "close":
+                    results[key] = "closed"
+                    continue
+                if msg.status == new_status and (action != "reassign" or msg.assigned_to_id == agent.pk):
+                    results[key] = "unchanged"
+                    continue
+
+                old_status = msg.status
+                old_agent = msg.assigned_to.external_id if msg.assigned_to_id else None
+                msg.status = new_status
+                if action != "close":
+                    msg.assigned_to = new_agent
+                transitions.append((
+                    old_status, new_status, old_agent, msg.assigned_to.external_id if msg.assigned_to_id else None
+                ))
+                changed.append(msg)
+                results[key] = "ok"
+
+            # Every changed row gets the same values, so one UPDATE per chunk covers them
+            values = {'status': new_status}
+            if action != "close":
+                values.update(assigned_to=new_agent, claimed_at=now if new_agent else None)
+            changed_pks = [msg.pk for msg in changed]
+            for start in range(0, len(changed_pks), BULK_CHUNK_SIZE):
+                Message.objects.filter(pk__in=changed_pks[start:start + BULK_CHUNK_SIZE]).update(**values)
+
+            InteractionLogBuffer.record_many([
+                (msg.pk, log_action, agent.pk if agent else None, now) for msg in changed
+            ])
+
+            transaction.on_commit(lambda: HotInbox.sync_many(changed))
+            broadcast_bulk_transition(
+                action, new_status, [msg.external_id for msg in changed], new_agent.external_id if new_agent else None,
+                previous_statuses={old_status for old_status, *_ in transitions},
+                previous_agents={old_agent for _, _, old_agent, _ in transitions}
+            )
+            MessageCounters.record_transitions(transitions)
+        return results
+
     @staticmethod
     def reply_message(*, message_external_id: str, agent_external_id: str, text: str) -> Message:
+        """
+        Queries: message lookup and reply insert, plus the assigning UPDATE and its outbox
+        event when the ticket was unassigned (agent cached).
+        """
         if not text or not text.strip():
             raise ApplicationError("non-empty text is required")
+        return MessageService._agent_reply(message_external_id, agent_external_id, lambda msg, agent: text)
 
+    @staticmethod
+    def _agent_reply(message_external_id: str, agent_external_id: str, render, needs_customer: bool = False) -> Message:
+        # render(msg, agent) -> reply text, called once the ticket is loaded and checked
         try:
-            agent = Agent.objects.get(external_id=agent_external_id)
-            msg = Message.objects.get(external_id=message_external_id)
-        except (Agent.DoesNotExist, Message.DoesNotExist):
+            agent = AgentSelector.get_by_external_id(agent_external_id)
+        except (Agent.DoesNotExist, ValidationError):
+            raise ApplicationError("agent or message not found")
+
+        fields = ['id', 'external_id', 'status', 'assigned_to', 'keyword_score']
+        qs = Message.objects.all()
+        if needs_customer:
+            qs = qs.select_related('customer')
+            fields += ['customer', 'customer__name', 'customer__user_id']
+        try:
+            msg = qs.only(*fields).get(external_id=message_external_id)
+        except (Message.DoesNotExist, ValidationError):
             raise ApplicationError("agent or message not found")
 
         if msg.status == Message.STATUS_CLOSED:
             raise ApplicationError("cannot reply to a closed message")
 
-        if msg.assigned_to_id and str(msg.assigned_to.external_id) != str(agent_external_id):
+        if msg.assigned_to_id and msg.assigned_to_id != agent.pk:
             raise ApplicationError("message assigned to another agent")
 
-        reply = MessageReply.objects.create(
-            message=msg,
-            agent=agent,
-            is_customer=False,
-            text=text
-        )
+        text = render(msg, agent)
+        if not text or not text.strip():
+            raise ApplicationError("non-empty text is required")
 
-        # If it was unassigned, automatically assign it to this agent
-        if not msg.assigned_to_id:
-            msg.assigned_to = agent
-            msg.status = Message.STATUS_IN_PROGRESS
-            msg.save(update_fields=['status', 'assigned_to'])
-            
-        InteractionLog.objects.create(message=msg, agent=agent, action="REPLIED")
+        now = timezone.now()
+        with transaction.atomic():
+            # If it was unassigned, automatically assign it to this agent, unless someone claimed it meanwhile
+            if not msg.assigned_to_id:
+                assigned = Message.objects.filter(pk=msg.pk, assigned_to__isnull=True).exclude(
+                    status=Message.STATUS_CLOSED
+                ).update(assigned_to=agent, status=Message.STATUS_IN_PROGRESS, claimed_at=now)
+                if not assigned:
+                    raise ApplicationError("message assigned to another agent")
+                old_status = msg.status
+                msg.assigned_to = agent
+                msg.status = Message.STATUS_IN_PROGRESS
+                msg.claimed_at = now
+                transaction.on_commit(lambda: HotInbox.sync(msg))
+                broadcast_bulk_update([msg], agent.external_id, previous_status=old_status)
+                MessageCounters.record_transition(old_status, msg.status, new_agent=agent.external_id)
+
+            MessageReply.objects.create(
+                message=msg,
+                agent=agent,
+                is_customer=False,
+                text=text,
+                created_at=now
+            )
+            InteractionLogBuffer.record(msg.pk, "REPLIED", agent.pk, now)
         return msg
 
     @staticmethod
     def customer_reply(*, message_external_id: str, text: str) -> Message:
+        """
+        Queries: message lookup (with its agent's external_id) and reply insert, plus the
+        re-opening UPDATE and its outbox event for a closed ticket. An archived ticket is
+        restored first (TicketArchiver.restore) and re-opened like any closed one.
+        """
         if not text or not text.strip():
             raise ApplicationError("non-empty text is required")
             
         try:
-            msg = Message.objects.get(external_id=message_external_id)
-        except Message.DoesNotExist:
+            # No body: only what the re-open, its broadcast and the hot inbox sync read
+            msg = Message.objects.select_related('assigned_to').only(
+                'id', 'external_id', 'status', 'keyword_score', 'assigned_to', 'assigned_to__external_id'
+            ).get(external_id=message_external_id)
+        except ValidationError:
             raise ApplicationError("message not found")
-            
-        reply = MessageReply.objects.create(
-            message=msg,
-            is_customer=True,
-            text=text
-        )
-        
-        # If the ticket was closed, re-open it
-        if msg.status == Message.STATUS_CLOSED:
-            msg.status = Message.STATUS_IN_PROGRESS
-            msg.save(update_fields=['status'])
-            
-        InteractionLog.objects.create(message=msg, action="CUSTOMER_REPLIED")
+        except Message.DoesNotExist:
+            # Closed tickets past retention are archived; the reply brings them back and re-opens them
+            msg = TicketArchiver.restore(message_external_id)
+            if msg is None:
+                raise ApplicationError("message not found")
+
+        now = timezone.now()
+        with transaction.atomic():
+            MessageReply.objects.create(
+                message=msg,
+                is_customer=True,
+                text=text,
+                created_at=now
+            )
+
+            # If the ticket was closed, re-open it
+            if msg.status == Message.STATUS_CLOSED:
+                msg.status = Message.STATUS_IN_PROGRESS
+                msg.save(update_fields=['status'])
+                agent_id = msg.assigned_to.external_id if msg.assigned_to_id else None
+                MessageCounters.record_transition(Message.STATUS_CLOSED, msg.status, agent_id, agent_id)
+
+            InteractionLogBuffer.record(msg.pk, "CUSTOMER_REPLIED", timestamp=now)
+            if msg.status == Message.STATUS_UNASSIGNED:
+                # Reply count / last reply shown in the cached inbox row changed
+                transaction.on_commit(lambda: HotInbox.sync(msg))
         return msg
 
     @staticmethod
     def use_canned_reply(*, message_external_id: str, agent_external_id: str, canned_external_id: str) -> Message:
+        """
+        reply_message with the canned body, placeholders filled in for this ticket.
+        The parsed template comes from the two-level cache; the customer is joined
+        into the message lookup only when the template uses it.
+        """
         try:
-            canned = CannedResponse.objects.get(external_id=canned_external_id)
-        except CannedResponse.DoesNotExist:
+            template = CannedResponseSelector.get_template(canned_external_id)
+        except (CannedResponse.DoesNotExist, ValidationError):
             raise ApplicationError("canned reply not found")
 
-        # Reuse reply text logic
-        return MessageService.reply_message(
-            message_external_id=message_external_id,
-            agent_external_id=agent_external_id,
-            text=canned.body
+        return MessageService._agent_reply(
+            message_external_id, agent_external_id, template.render, needs_customer=template.needs_customer
         )
@@ -1,40 +1,198 @@
 import logging
-from django.db.models.signals import post_save
+import threading
+import uuid
+import weakref
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_init, post_save, post_migrate
 from django.dispatch import receiver
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
-from .models import Message
+from .inbox_cache import HotInbox
+from .models import Agent, CannedResponse, Customer, Message, OutboxEvent
+from .search import install_search_index
+from .selectors import AgentSelector, CannedResponseSelector
+from .topics import event_groups
 
 logger = logging.getLogger(__name__)
 
+@receiver(post_migrate)
+def ensure_sqlite_search_index(sender, using, **kwargs):
+    # SQLite table rebuilds during migrations drop the FTS triggers; put them back
+    connection = connections[using]
+    if sender.name != 'messaging' or connection.vendor != 'sqlite':
+        return
+    if Message._meta.db_table in connection.introspection.table_names():
+        install_search_index(connection)
+
+@receiver([post_save, post_delete], sender=Agent)
+def forget_cached_agents(sender, instance, **kwargs):
+    # After commit, so no worker re-caches the old row in between.
+    # Also drops the routing roster, it lives in the same cache namespace
+    transaction.on_commit(AgentSelector.forget)
+
+@receiver([post_save, post_delete], sender=CannedResponse)
+def forget_cached_canned_responses(sender, instance, **kwargs):
+    transaction.on_commit(CannedResponseSelector.forget)
+
+@receiver(post_save, sender=Customer)
+def resync_customer_tickets(sender, instance, created, **kwargs):
+    # Hot inbox rows embed the customer's details
+    if created or not HotInbox.enabled():
+        return
+    transaction.on_commit(lambda: HotInbox.sync_many(list(
+        instance.messages.filter(status=Message.STATUS_UNASSIGNED).only('pk', 'status', 'keyword_score')
+    )))
+
+# Events per group_send when a batch is sent
+BROADCAST_BATCH_SIZE = 100
+
+# Weak reference to the batch the current transaction queues into (see queue_broadcasts)
+_local = threading.local()
+
+
+class BroadcastBatch:
+    """
+    Websocket events sent together. Each event goes to its topic groups (topics.event_groups);
+    every group gets one group_send per BROADCAST_BATCH_SIZE of its events.
+    Events are keyed by ticket, so a ticket changed several times is broadcast once,
+    in its final state, to every group any of its changes concerned (an empty key never coalesces).
+    """
+
+    def __init__(self):
+        self.events = {}
+
+    def add(self, key, event, groups):
+        key = key or object()
+        previous, previous_groups = self.events.pop(key, (None, ()))
+        if previous and previous["type"] == "message_new":
+            # Still a new ticket to the clients, just with its latest state
+            event = {**event, "type": "message_new", "body": previous["body"]}
+            event.pop("assigned_to", None)
+        self.events[key] = (event, set(previous_groups) | set(groups))
+
+    def send(self, raise_errors: bool = False):
+        if _current_batch() is self:
+            _local.batch = None
+        channel_layer = get_channel_layer()
+        if not channel_layer or not self.events:
+            return
+        by_group = {}
+        for event, groups in self.events.values():
+            # Overlapping topics put one event in several groups of a connection; AgentConsumer drops the copies
+            event = {**event, "event_id": uuid.uuid4().hex}
+            for group in groups:
+                by_group.setdefault(group, []).append(event)
+        for group, events in by_group.items():
+            for start in range(0, len(events), BROADCAST_BATCH_SIZE):
+                chunk = events[start:start + BROADCAST_BATCH_SIZE]
+                try:
+                    async_to_sync(channel_layer.group_send)(
+                        group, chunk[0] if len(chunk) == 1 else {"type": "messages_batch", "events": chunk}
+                    )
+                except Exception as e:
+                    if raise_errors:
+                        raise
+                    logger.error(f"Failed to broadcast {len(chunk)} message events to {group}: {str(e)}")
+
+
+def queue_broadcasts(items):
+    """
+    (key, event, groups) raised by the current transaction.
+    With REALTIME_OUTBOX they are written to the outbox in that transaction and sent by
+    the relay (outbox.OutboxRelay); otherwise they are sent as one batch after commit
+    (at once outside a transaction), and lost if the channel layer is down.
+    """
+    if settings.REALTIME_OUTBOX:
+        OutboxEvent.objects.bulk_create([
+            OutboxEvent(key=key, event=event, groups=sorted(groups)) for key, event, groups in items
+        ])
+        return
+
+    batch = _current_batch()
+    if batch is not None:
+        for item in items:
+            batch.add(*item)
+        return
+
+    batch = BroadcastBatch()
+    for item in items:
+        batch.add(*item)
+    # The on_commit hook holds the only strong reference: when a rollback (or a savepoint
+    # rollback) discards the hook, the batch goes with it and the next event starts a new one
+    _local.batch = weakref.ref(batch)
+    transaction.on_commit(batch.send)
+
+
+def _current_batch():
+    ref = getattr(_local, "batch", None)
+    return ref() if ref else None
+
+
+@receiver(post_init, sender=Message)
+def remember_loaded_status(sender, instance, **kwargs):
+    # So an update also reaches the status group the ticket left (unless status was deferred)
+    instance._loaded_status = instance.__dict__.get('status')
+
 @receiver(post_save, sender=Message)
 def broadcast_message_update(sender, instance, created, **kwargs):
-    channel_layer = get_channel_layer()
-    if not channel_layer:
+    assigned_to = str(instance.assigned_to.external_id) if instance.assigned_to else None
+    if created:
+        event = {
+            "type": "message_new",
+            "message_id": str(instance.external_id),
+            "status": instance.status,
+            "body": instance.body
+        }
+    else:
+        # It's an update (claimed, replied, etc.)
+        event = {
+            "type": "message_update",
+            "message_id": str(instance.external_id),
+            "status": instance.status,
+            "assigned_to": assigned_to
+        }
+    groups = event_groups([event["message_id"]], [instance._loaded_status, instance.status], [assigned_to])
+    instance._loaded_status = instance.status
+    queue_broadcasts([(event["message_id"], event, groups)])
+
+def broadcast_bulk_update(messages, assigned_to_external_id=None, previous_status=None):
+    """
+    message_update events for tickets changed with QuerySet.update(), which sends no post_save.
+    Queued like post_save events: call it inside the transaction that made the change.
+    """
+    assigned_to = str(assigned_to_external_id) if assigned_to_external_id else None
+    queue_broadcasts([
+        (str(message.external_id), {
+            "type": "message_update",
+            "message_id": str(message.external_id),
+            "status": message.status,
+            "assigned_to": assigned_to
+        }, event_groups([message.external_id], [previous_status, message.status], [assigned_to]))
+        for message in messages
+    ])
+
+def broadcast_bulk_transition(action, status, message_external_ids, assigned_to_external_id=None,
+                              previous_statuses=(), previous_agents=()):
+    """
+    One messages_bulk_update event for a whole bulk action instead of a message_update per ticket.
+    `assigned_to` is only sent when the action changed the assignment (reassign, unassign).
+    Queued with the transaction's other events; it reaches every ticket's group and the
+    status/agent groups the tickets left (`previous_*`) or entered.
+    """
+    if not message_external_ids:
         return
 
-    try:
-        if created:
-            async_to_sync(channel_layer.group_send)(
-                "agents",
-                {
-                    "type": "message_new",
-                    "message_id": str(instance.external_id),
-                    "status": instance.status,
-                    "body": instance.body
-                }
-            )
-        else:
-            # It's an update (claimed, replied, etc.)
-            async_to_sync(channel_layer.group_send)(
-                "agents",
-                {
-                    "type": "message_update",
-                    "message_id": str(instance.external_id),
-                    "status": instance.status,
-                    "assigned_to": str(instance.assigned_to.external_id) if instance.assigned_to else None
-                }
-            )
-    except Exception as e:
-        # Prevent broadcast failures from crashing the main transaction
-        logger.error(f"Failed to broadcast message update for {instance.external_id}: {str(e)}")
+    event = {
+        "type": "messages_bulk_update",
+        "action": action,
+        "status": status,
+        "message_ids": [str(external_id) for external_id in message_external_ids],
+    }
+    if action != "close":
+        event["assigned_to"] = str(assigned_to_external_id) if assigned_to_external_id else None
+    groups = event_groups(
+        event["message_ids"], [*previous_statuses, status], [*previous_agents, event.get("assigned_to")]
+    )
+    # Covers many tickets, so it is never coalesced
+    queue_broadcasts([("", event, groups)])
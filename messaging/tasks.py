@@ -3,7 +3,12 @@ from django.db import transaction
 import csv
 from io import StringIO
 from .models import Customer, Message
-from .utils import calculate_priority
+from .archive import TicketArchiver
+from .audit import InteractionLogBuffer
+from .counters import MessageCounters
+from .inbox_cache import HotInbox
+from .outbox import OutboxRelay
+from .utils import calculate_keyword_score_batch
 from django.utils import timezone
 
 @shared_task
@@ -46,6 +51,7 @@ def ingest_csv_data(file_content: str):
     f.seek(0)
     next(reader) # skip header
     now = timezone.now()
+    rows = []
     
     for row in reader:
         user_id = row.get('User ID')
@@ -53,23 +59,68 @@ def ingest_csv_data(file_content: str):
         
         if not user_id or not body or user_id not in customer_map:
             continue
-            
-        # Parse actual timestamp from CSV
-        # Doing lightweight insertion logic
-        priority = calculate_priority(body, now, Message.STATUS_UNASSIGNED)
+        rows.append((user_id, body))
         
+    # Score every row in one vectorized pass
+    bodies = [body for _, body in rows]
+    keyword_scores = calculate_keyword_score_batch(bodies)
+    
+    for (user_id, body), keyword_score in zip(rows, keyword_scores):
         messages_to_create.append(Message(
             customer=customer_map[user_id],
             body=body,
             status=Message.STATUS_UNASSIGNED,
             timestamp=now,  # Ideally parsed from CSV Timestamp (UTC)
-            priority=priority
+            keyword_score=int(keyword_score)
         ))
         
     # Bulk Create Messages in chunks to save memory
     if messages_to_create:
-        Message.objects.bulk_create(messages_to_create, batch_size=1000)
+        created = Message.objects.bulk_create(messages_to_create, batch_size=1000)
+        MessageCounters.record_created(len(created))
+        # bulk_create skips the services, so the hot inbox has to be told about the new tickets
+        transaction.on_commit(lambda: HotInbox.sync_many(created))
     
     print(f"Finished ingesting {len(messages_to_create)} messages.")
     return len(messages_to_create)
 
+
+@shared_task
+def reconcile_message_counters():
+    """
+    Periodic: rewrite the stats counters from the database to correct any drift.
+    """
+    counts = MessageCounters.reconcile()
+    return sum(v for k, v in counts.items() if k.startswith("status:"))
+
+
+@shared_task
+def flush_interaction_logs():
+    """
+    Periodic (and triggered when a batch fills): bulk-insert the queued interaction logs.
+    """
+    return InteractionLogBuffer.flush()
+
+
+@shared_task
+def archive_old_records():
+    """
+    Periodic: move closed tickets and interaction logs past their retention window to the archive tables.
+    """
+    return TicketArchiver.run()
+
+
+@shared_task
+def check_outbox_backlog():
+    """
+    Periodic: log an error when websocket events sit in the outbox with no relay sending them.
+    """
+    return OutboxRelay.check_backlog()
+
+
+@shared_task
+def check_hot_inbox():
+    """
+    Periodic: rebuild the Redis hot inbox when it has drifted from the database (or was never built).
+    """
+    return HotInbox.repair()
@@ -0,0 +1,52 @@
+import uuid
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from messaging.archive import TicketArchiver
+from messaging.counters import MessageCounters
+from messaging.models import Agent, ArchivedMessage, Customer, Message, MessageReply
+
+
+@override_settings(HOT_INBOX_ENABLED=False)
+@mock.patch.object(MessageCounters, "apply", lambda deltas: None)
+class ArchivedTicketReplyTests(TestCase):
+    def setUp(self):
+        self.agent = Agent.objects.create(name="Ann")
+        long_ago = timezone.now() - timedelta(days=200)
+        ticket = Message.objects.create(
+            customer=Customer.objects.create(user_id="archive-test"), body="my loan is late",
+            status=Message.STATUS_CLOSED, assigned_to=self.agent, claimed_at=long_ago,
+            timestamp=long_ago, created_at=long_ago,
+        )
+        self.replies = MessageReply.objects.bulk_create([
+            MessageReply(message=ticket, agent=self.agent, text="On it", created_at=long_ago + timedelta(hours=1)),
+            MessageReply(message=ticket, is_customer=True, text="Thanks", created_at=long_ago + timedelta(hours=2)),
+        ])
+        self.assertEqual(TicketArchiver.run(closed_days=90, log_days=90)["messages"], 1)
+        self.external_id = str(ticket.external_id)
+
+    def customer_reply(self, external_id, text):
+        return APIClient().post(
+            f"/api/messages/{external_id}/customer_reply/", {"text": text}, format="json", SERVER_NAME="127.0.0.1"
+        )
+
+    def test_reply_restores_and_reopens_the_ticket(self):
+        response = self.customer_reply(self.external_id, "It happened again")
+        self.assertEqual(response.status_code, 200)
+
+        self.assertFalse(ArchivedMessage.objects.exists())
+        msg = Message.objects.get(external_id=self.external_id)
+        self.assertEqual((msg.status, msg.assigned_to), (Message.STATUS_IN_PROGRESS, self.agent))
+        thread = msg.replies.order_by('created_at')
+        self.assertEqual(
+            [(reply.external_id, reply.agent_id, reply.text) for reply in thread[:2]],
+            [(reply.external_id, reply.agent_id, reply.text) for reply in self.replies],
+        )
+        self.assertEqual([reply.text for reply in thread], ["On it", "Thanks", "It happened again"])
+
+    def test_unknown_ticket_is_not_found(self):
+        response = self.customer_reply(uuid.uuid4(), "Hello?")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "message not found")
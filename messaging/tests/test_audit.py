@@ -0,0 +1,114 @@
+import json
+from datetime import datetime
+from unittest import mock
+import redis
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from messaging.audit import DEAD_LETTER_KEY, FLUSH_LOCK_KEY, QUEUE_KEY, InteractionLogBuffer
+from messaging.models import Customer, HourlySLAStats, InteractionLog, Message
+from messaging.utils import get_redis
+from .utils import requires_redis
+
+
+class InteractionLogBufferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.msg = Message.objects.create(
+            customer=Customer.objects.create(user_id="audit-test"), body="help", timestamp=timezone.now()
+        )
+
+    def test_default_timestamp_is_aware_utc(self):
+        with mock.patch.object(InteractionLogBuffer, "_enqueue") as enqueue, \
+                self.captureOnCommitCallbacks(execute=True):
+            InteractionLogBuffer.record(self.msg.pk, "CREATED")
+        timestamp = datetime.fromisoformat(enqueue.call_args.args[0][0]["timestamp"])
+        self.assertEqual(timestamp.utcoffset().total_seconds(), 0)
+
+    def test_flush_with_redis_down(self):
+        client = mock.Mock(**{"set.side_effect": redis.ConnectionError("Connection refused")})
+        with mock.patch("messaging.audit.get_redis", return_value=client), \
+                self.assertLogs("messaging.audit", "WARNING"):
+            self.assertEqual(InteractionLogBuffer.flush(), 0)
+
+    def test_flush_interrupted_mid_batch_keeps_the_rest_queued(self):
+        queued = json.dumps({"message_id": self.msg.pk, "action": "CREATED", "agent_id": None,
+                             "timestamp": "2026-01-01T00:00:00+00:00"})
+        client = mock.Mock(**{
+            "set.return_value": True,
+            "lrange.return_value": [queued],
+            "ltrim.side_effect": redis.ConnectionError("Connection reset"),
+        })
+        with mock.patch("messaging.audit.get_redis", return_value=client), \
+                self.assertLogs("messaging.audit", "ERROR"):
+            self.assertEqual(InteractionLogBuffer.flush(), 0)
+        client.delete.assert_called_once_with(FLUSH_LOCK_KEY)
+
+    def test_redelivered_batch_is_stored_and_counted_once(self):
+        # A flush that dies after inserting a batch but before trimming it delivers the batch again
+        with mock.patch.object(InteractionLogBuffer, "_enqueue") as enqueue, \
+                self.captureOnCommitCallbacks(execute=True):
+            InteractionLogBuffer.record_many([(self.msg.pk, "CREATED", None, None), (self.msg.pk, "CUSTOMER_REPLIED", None, None)])
+        payloads = enqueue.call_args.args[0]
+        InteractionLogBuffer._write(payloads)
+        InteractionLogBuffer._write(payloads + payloads[:1])
+
+        self.assertEqual(InteractionLog.objects.count(), 2)
+        stats = HourlySLAStats.objects.get()
+        self.assertEqual((stats.created, stats.customer_replies), (1, 1))
+
+    def test_entries_queued_without_entry_id_are_written(self):
+        payload = {"message_id": self.msg.pk, "action": "CREATED", "agent_id": None,
+                   "timestamp": "2026-01-01T00:00:00+00:00"}
+        InteractionLogBuffer._write([payload, payload])
+        self.assertEqual(InteractionLog.objects.filter(entry_id__isnull=True).count(), 2)
+
+    def test_bad_entries_are_dead_lettered(self):
+        good = {"message_id": self.msg.pk, "action": "CREATED", "agent_id": None,
+                "timestamp": "2026-01-01T00:00:00+00:00", "entry_id": "a" * 32}
+        bad_timestamp = dict(good, timestamp="yesterday", entry_id="b" * 32)
+        client = mock.Mock(**{"set.return_value": True, "lrange.return_value": [
+            json.dumps(good), "{not json", json.dumps(bad_timestamp),
+        ]})
+        with mock.patch("messaging.audit.get_redis", return_value=client), \
+                self.assertLogs("messaging.audit", "ERROR"):
+            self.assertEqual(InteractionLogBuffer.flush(), 1)
+
+        self.assertEqual(list(InteractionLog.objects.values_list('action', flat=True)), ["CREATED"])
+        key, *dead = client.rpush.call_args.args
+        self.assertEqual(key, DEAD_LETTER_KEY)
+        self.assertEqual([json.loads(item)["entry"] for item in dead], ["{not json", json.dumps(bad_timestamp)])
+        # The queue moves past the whole batch
+        client.ltrim.assert_called_once_with(QUEUE_KEY, 3, -1)
+
+    def test_database_outage_keeps_the_batch_queued(self):
+        queued = json.dumps({"message_id": self.msg.pk, "action": "CREATED", "agent_id": None,
+                             "timestamp": "2026-01-01T00:00:00+00:00"})
+        client = mock.Mock(**{"set.return_value": True, "lrange.return_value": [queued]})
+        with mock.patch("messaging.audit.get_redis", return_value=client), \
+                mock.patch.object(InteractionLogBuffer, "_write", side_effect=OperationalError("server closed the connection")), \
+                self.assertLogs("messaging.audit", "ERROR"):
+            self.assertEqual(InteractionLogBuffer.flush(), 0)
+        client.ltrim.assert_not_called()
+        client.rpush.assert_not_called()
+
+    def test_entries_for_missing_tickets_are_logged(self):
+        payload = {"message_id": self.msg.pk + 1000, "action": "CLOSED", "agent_id": None,
+                   "timestamp": "2026-01-01T00:00:00+00:00"}
+        with self.assertLogs("messaging.audit", "WARNING") as logs:
+            InteractionLogBuffer._write([payload])
+        self.assertFalse(InteractionLog.objects.exists())
+        self.assertIn(str(self.msg.pk + 1000), logs.output[0])
+
+    @requires_redis
+    @override_settings(INTERACTION_LOG_BUFFERED=True)
+    def test_enqueue_and_flush(self):
+        r = get_redis()
+        r.delete(QUEUE_KEY, FLUSH_LOCK_KEY)
+        self.addCleanup(r.delete, QUEUE_KEY, FLUSH_LOCK_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            InteractionLogBuffer.record_many([(self.msg.pk, "CREATED", None, None), (self.msg.pk, "CLOSED", None, None)])
+        self.assertFalse(InteractionLog.objects.exists())
+        self.assertEqual(InteractionLogBuffer.flush(), 2)
+        self.assertEqual(list(InteractionLog.objects.order_by('id').values_list('action', flat=True)), ["CREATED", "CLOSED"])
+        self.assertEqual(r.llen(QUEUE_KEY), 0)
@@ -0,0 +1,71 @@
+from unittest import mock
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from messaging.models import Customer, Message, OutboxEvent
+from messaging.topics import FIREHOSE_GROUP
+
+
+class FakeChannelLayer:
+    def __init__(self):
+        self.sent = []
+
+    async def group_send(self, group, message):
+        self.sent.append((group, message))
+
+
+@override_settings(REALTIME_OUTBOX=False)
+class AfterCommitBroadcastTests(TestCase):
+    """Without the outbox, a transaction's events go out as one batch once it commits."""
+
+    def setUp(self):
+        self.customer = Customer.objects.create(user_id="broadcast-test")
+        self.layer = FakeChannelLayer()
+        patcher = mock.patch("messaging.signals.get_channel_layer", return_value=self.layer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create(self, body):
+        return Message.objects.create(customer=self.customer, body=body, timestamp=timezone.now())
+
+    def firehose(self):
+        return [message for group, message in self.layer.sent if group == FIREHOSE_GROUP]
+
+    def test_sent_once_on_commit_coalesced_per_ticket(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            msg = self.create("hello")
+            msg.status = Message.STATUS_IN_PROGRESS
+            msg.save()
+            other = self.create("other")
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self.layer.sent, [])
+
+        callbacks[0]()
+        [batch] = self.firehose()
+        self.assertEqual(batch["type"], "messages_batch")
+        # Still new to clients, in its final state
+        self.assertEqual(
+            [(event["type"], event["message_id"], event["status"]) for event in batch["events"]],
+            [("message_new", str(msg.external_id), Message.STATUS_IN_PROGRESS),
+             ("message_new", str(other.external_id), Message.STATUS_UNASSIGNED)],
+        )
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_rolled_back_events_are_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.create("rolled back")
+                raise RuntimeError
+            kept = self.create("kept")
+        # The rolled back batch went with its hook; the next event started a new one
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual([message["message_id"] for message in self.firehose()], [str(kept.external_id)])
+
+    def test_next_transaction_gets_a_new_batch(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.create("first")
+        with self.captureOnCommitCallbacks(execute=True):
+            second = self.create("second")
+        self.assertEqual(
+            [message["message_id"] for message in self.firehose()], [str(first.external_id), str(second.external_id)]
+        )
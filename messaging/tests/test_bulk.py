@@ -0,0 +1,50 @@
+import uuid
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from messaging.models import Agent, Customer, Message
+
+
+@override_settings(HOT_INBOX_ENABLED=False)
+class BulkActionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agent = Agent.objects.create(name="Ann")
+        customer = Customer.objects.create(user_id="bulk-test")
+        cls.open_ticket, cls.closed_ticket = Message.objects.bulk_create([
+            Message(customer=customer, body="open", status=Message.STATUS_UNASSIGNED, timestamp=timezone.now()),
+            Message(customer=customer, body="closed", status=Message.STATUS_CLOSED, timestamp=timezone.now()),
+        ])
+
+    def post(self, **body):
+        return APIClient().post("/api/messages/bulk/", body, format="json", SERVER_NAME="127.0.0.1")
+
+    def test_malformed_ids_are_reported_per_id(self):
+        missing = str(uuid.uuid4())
+        response = self.post(action="reassign", agent_id=str(self.agent.external_id), external_ids=[
+            str(self.open_ticket.external_id), "not-a-uuid", str(self.closed_ticket.external_id), missing, "",
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"]["results"], {
+            str(self.open_ticket.external_id): "ok",
+            "not-a-uuid": "invalid",
+            str(self.closed_ticket.external_id): "closed",
+            missing: "not_found",
+            "": "invalid",
+        })
+        self.assertEqual(response.json()["data"]["summary"], {"ok": 1, "invalid": 2, "closed": 1, "not_found": 1})
+        self.open_ticket.refresh_from_db()
+        self.assertEqual(self.open_ticket.assigned_to, self.agent)
+
+    def test_ids_are_normalized_and_deduplicated(self):
+        external_id = str(self.open_ticket.external_id)
+        response = self.post(action="close", external_ids=[external_id.upper(), external_id])
+        self.assertEqual(response.json()["data"]["results"], {external_id: "ok"})
+
+    def test_only_invalid_ids(self):
+        response = self.post(action="close", external_ids=["nope"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"]["results"], {"nope": "invalid"})
+
+    def test_empty_list_is_rejected(self):
+        self.assertEqual(self.post(action="close", external_ids=[]).status_code, 400)
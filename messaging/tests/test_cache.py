@@ -0,0 +1,77 @@
+from unittest import mock
+import redis
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from messaging.cache import TwoLevelCache
+from messaging.models import Agent, Customer, Message
+from .utils import LOCMEM_CACHES
+
+
+def redis_down():
+    # The shared cache as the Django Redis backend behaves with the server unreachable
+    error = redis.ConnectionError("Error 111 connecting to 127.0.0.1:6379. Connection refused.")
+    return mock.patch("messaging.cache.cache", mock.Mock(**{
+        f"{method}.side_effect": error for method in ("get", "set", "add", "incr")
+    }))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TwoLevelCacheRedisDownTests(TestCase):
+    """Outages are simulated on an in-memory shared cache, so no Redis server is needed or touched."""
+
+    def setUp(self):
+        cache.clear()
+        self.cache = TwoLevelCache("tests")
+        self.loads = 0
+
+    def loader(self):
+        self.loads += 1
+        return "value"
+
+    def test_reads_fall_through_to_the_loader(self):
+        with redis_down(), self.assertLogs("messaging.cache", "WARNING"):
+            self.assertEqual(self.cache.get("key", self.loader), "value")
+            self.assertEqual(self.cache.get("key", self.loader), "value")
+        # Nothing was cached under a version it could not read
+        self.assertEqual(self.loads, 2)
+
+    def test_failed_shared_write_still_returns_the_value(self):
+        self.cache.get("warm-up", self.loader)
+        with mock.patch("messaging.cache.cache.set", side_effect=redis.ConnectionError("down")), \
+                self.assertLogs("messaging.cache", "WARNING"):
+            self.assertEqual(self.cache.get("key", self.loader), "value")
+        self.assertEqual(self.cache.get("key", self.loader), "value")
+        self.assertEqual(self.loads, 2)
+
+    def test_invalidate_clears_this_process(self):
+        self.cache.get("key", self.loader)
+        with redis_down(), self.assertLogs("messaging.cache", "WARNING") as logs:
+            self.cache.invalidate()
+            self.cache.get("key", self.loader)
+        self.assertEqual(self.loads, 2)
+        self.assertIn("cleared this process only", logs.output[0])
+
+
+@override_settings(HOT_INBOX_ENABLED=False)
+class RedisDownRequestTests(TestCase):
+    """Agent writes and claims keep working while the shared cache is down."""
+
+    def test_agent_save(self):
+        with redis_down(), self.assertLogs("messaging.cache", "ERROR"), self.captureOnCommitCallbacks(execute=True):
+            agent = Agent.objects.create(name="Ann")
+        self.assertTrue(Agent.objects.filter(pk=agent.pk).exists())
+
+    def test_claim(self):
+        agent = Agent.objects.create(name="Ann")
+        msg = Message.objects.create(
+            customer=Customer.objects.create(user_id="cache-down"), body="help", timestamp=timezone.now()
+        )
+        with redis_down(), self.assertLogs("messaging.cache", "WARNING"):
+            response = APIClient().post(
+                f"/api/messages/{msg.external_id}/claim/", {"agent_id": str(agent.external_id)},
+                format="json", SERVER_NAME="127.0.0.1",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"]["claimed_by"], "Ann")
@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+from unittest import mock
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from messaging.canned_templates import CannedTemplate
+from messaging.counters import MessageCounters
+from messaging.models import Agent, CannedResponse, Customer, Message, MessageReply
+from .utils import LOCMEM_CACHES
+
+TICKET = SimpleNamespace(
+    external_id="7d0c6a3e-0000-4000-8000-000000000001",
+    customer=SimpleNamespace(name="Ada Lovelace", user_id="42"),
+)
+AGENT = SimpleNamespace(name="Ann")
+
+
+class CannedTemplateTests(SimpleTestCase):
+    def render(self, body, ticket=TICKET):
+        return CannedTemplate(body).render(ticket, AGENT)
+
+    def test_placeholders(self):
+        self.assertEqual(
+            self.render("Hi {{customer_first_name}} ({{ customer_id }}), {{  agent_name  }} here about {{ ticket_id }}"),
+            f"Hi Ada (42), Ann here about {TICKET.external_id}",
+        )
+
+    def test_fallback_when_empty(self):
+        nameless = SimpleNamespace(external_id="x", customer=SimpleNamespace(name=None, user_id="42"))
+        self.assertEqual(self.render("Hi {{ customer_name | there }}!", nameless), "Hi there!")
+        self.assertEqual(self.render("Hi {{ customer_name | there }}!"), "Hi Ada Lovelace!")
+        self.assertEqual(self.render("Hi {{ customer_name }}!", nameless), "Hi !")
+
+    def test_unknown_placeholders(self):
+        template = CannedTemplate("Dear {{ customer_nmae | customer }}, {{ agent_name }}, {{ order_id }}")
+        self.assertEqual(template.unknown_placeholders, {"customer_nmae", "order_id"})
+        # Rendered with their fallback (or nothing), never a resolver error
+        self.assertEqual(template.render(TICKET, AGENT), "Dear customer, Ann, ")
+
+    def test_malformed_placeholders_stay_literal(self):
+        for body in ["{{ customer_name", "customer_name }}", "{ customer_name }", "{{ }}", "{{ customer name }}", "{{-}}"]:
+            template = CannedTemplate(body)
+            self.assertEqual(template.placeholders, set(), body)
+            self.assertEqual(template.render(TICKET, AGENT), body)
+
+    def test_needs_customer(self):
+        self.assertTrue(CannedTemplate("{{ customer_id }}").needs_customer)
+        self.assertFalse(CannedTemplate("{{ agent_name }} / {{ ticket_id }}").needs_customer)
+        self.assertFalse(CannedTemplate("").needs_customer)
+        self.assertEqual(CannedTemplate("").render(TICKET, AGENT), "")
+
+
+@override_settings(CACHES=LOCMEM_CACHES, HOT_INBOX_ENABLED=False)
+@mock.patch.object(MessageCounters, "apply", lambda deltas: None)
+class CannedResponseApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def post(self, url, data):
+        return self.client.post(url, data, format="json", SERVER_NAME="127.0.0.1")
+
+    def test_unknown_placeholder_is_rejected(self):
+        response = self.post("/api/canned/", {"title": "Typo", "body": "Hi {{ customer_nmae }}"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Unknown placeholders: customer_nmae", str(response.json()["errors"]["body"]))
+        self.assertFalse(CannedResponse.objects.exists())
+
+    def test_malformed_placeholder_is_saved_as_text(self):
+        response = self.post("/api/canned/", {"title": "Braces", "body": "Use {{ customer_name to greet"})
+        self.assertEqual(response.status_code, 201)
+
+    def test_canned_reply_renders_for_the_ticket(self):
+        agent = Agent.objects.create(name="Ann")
+        customer = Customer.objects.create(user_id="canned-test", name="Ada Lovelace")
+        msg = Message.objects.create(customer=customer, body="help", timestamp=timezone.now())
+        canned = CannedResponse.objects.create(
+            title="Greeting", body="Hi {{ customer_first_name | there }}, {{ agent_name }} is on it. {{ note"
+        )
+        response = self.post(
+            f"/api/messages/{msg.external_id}/use_canned/",
+            {"agent_id": str(agent.external_id), "canned_id": str(canned.external_id)},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(MessageReply.objects.get(message=msg).text, "Hi Ada, Ann is on it. {{ note")
+
+    def test_unknown_canned_response(self):
+        agent = Agent.objects.create(name="Ann")
+        msg = Message.objects.create(
+            customer=Customer.objects.create(user_id="canned-test"), body="help", timestamp=timezone.now()
+        )
+        response = self.post(
+            f"/api/messages/{msg.external_id}/use_canned/",
+            {"agent_id": str(agent.external_id), "canned_id": "7d0c6a3e-0000-4000-8000-000000000009"},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "canned reply not found")
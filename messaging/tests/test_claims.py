@@ -0,0 +1,93 @@
+import threading
+from datetime import timedelta
+from unittest import mock, skipUnless
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from messaging.counters import MessageCounters
+from messaging.models import Agent, Customer, Message
+from messaging.services import MessageService
+
+
+def make_tickets(*specs, status=Message.STATUS_UNASSIGNED):
+    """`specs`: (keyword_score, age in hours) per ticket, returned in the same order."""
+    customer, _ = Customer.objects.get_or_create(user_id="claims-test")
+    now = timezone.now()
+    return Message.objects.bulk_create([
+        Message(
+            customer=customer, body=f"ticket {i}", status=status, keyword_score=keyword_score,
+            timestamp=now, created_at=now - timedelta(hours=age_hours),
+        )
+        for i, (keyword_score, age_hours) in enumerate(specs)
+    ])
+
+
+class ClaimNextTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agent = Agent.objects.create(name="Ann")
+
+    def claim_next(self, count):
+        return MessageService.claim_next(agent_external_id=str(self.agent.external_id), count=count)
+
+    def test_takes_effective_priority_order(self):
+        # An old low-scoring ticket outranks fresh high-scoring ones once its waiting penalty applies
+        fresh_a, fresh_b, overdue, low = make_tickets((10, 1), (10, 2), (4, 72), (1, 72))
+        self.assertEqual([msg.pk for msg in self.claim_next(2)], [overdue.pk, fresh_b.pk])
+        self.assertEqual([msg.pk for msg in self.claim_next(5)], [fresh_a.pk, low.pk])
+        self.assertEqual(self.claim_next(1), [])
+
+    def test_bound_keeps_every_row_that_can_reach_the_top(self):
+        # The 3rd best keyword score is 9, so rows down to 9 - MAX_AGE_SCORE = 1 are considered:
+        # an overdue score-2 ticket ties the fresh 9s and wins the tie by age
+        fresh = make_tickets(*[(9, 1)] * 3)
+        overdue, below = make_tickets((2, 72), (0, 72))
+        self.assertEqual([msg.pk for msg in self.claim_next(3)], [overdue.pk, fresh[0].pk, fresh[1].pk])
+        self.assertEqual([msg.pk for msg in self.claim_next(3)], [fresh[2].pk, below.pk])
+
+    def test_claimed_rows_are_assigned(self):
+        tickets = make_tickets((3, 1), (2, 1))
+        self.claim_next(2)
+        self.assertEqual(
+            set(Message.objects.filter(pk__in=[msg.pk for msg in tickets]).values_list('status', 'assigned_to')),
+            {(Message.STATUS_IN_PROGRESS, self.agent.pk)},
+        )
+
+
+@skipUnless(connection.features.has_select_for_update_skip_locked, "needs SELECT ... FOR UPDATE SKIP LOCKED")
+@override_settings(HOT_INBOX_ENABLED=False)
+@mock.patch.object(MessageCounters, "apply", lambda deltas: None)
+class ClaimNextContentionTests(TransactionTestCase):
+    """Concurrent agents draining the inbox with claim_next never get the same ticket twice."""
+    AGENTS = 8
+    TICKETS = 200
+
+    def test_parallel_claimers_get_disjoint_tickets(self):
+        agents = [str(Agent.objects.create(name=f"Agent {i}").external_id) for i in range(self.AGENTS)]
+        make_tickets(*[(i % 7, i % 60) for i in range(self.TICKETS)])
+        claimed, errors = [], []
+        lock = threading.Lock()
+
+        def drain(agent_external_id):
+            try:
+                while True:
+                    batch = MessageService.claim_next(agent_external_id=agent_external_id, count=3)
+                    if not batch:
+                        return
+                    with lock:
+                        claimed.extend(msg.pk for msg in batch)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=drain, args=(agent,)) for agent in agents]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(claimed), self.TICKETS)
+        self.assertEqual(len(set(claimed)), self.TICKETS)
+        self.assertFalse(Message.objects.filter(status=Message.STATUS_UNASSIGNED).exists())
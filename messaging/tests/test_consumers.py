@@ -0,0 +1,55 @@
+import uuid
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.test import TestCase, override_settings
+from messaging.consumers import AgentConsumer
+from messaging.signals import BroadcastBatch
+from messaging.topics import event_groups
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class AgentConsumerTests(TestCase):
+    async def connect(self, topics=None):
+        communicator = WebsocketCommunicator(AgentConsumer.as_asgi(), "/ws/agents/")
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        if topics:
+            await communicator.send_json_to({"action": "subscribe", "topics": topics})
+            self.assertEqual(await communicator.receive_json_from(), {"type": "subscriptions", "topics": sorted(topics)})
+        return communicator
+
+    async def broadcast(self, *events):
+        batch = BroadcastBatch()
+        for event in events:
+            batch.add(event["message_id"], event, event_groups([event["message_id"]], [event["status"]], []))
+        await sync_to_async(batch.send)(raise_errors=True)
+
+    def update(self, ticket, status="closed"):
+        return {"type": "message_update", "message_id": ticket, "status": status, "assigned_to": None}
+
+    async def test_overlapping_topics_get_each_event_once(self):
+        ticket, other = str(uuid.uuid4()), str(uuid.uuid4())
+        communicator = await self.connect([f"ticket:{ticket}", "status:closed"])
+        await self.broadcast(self.update(ticket), self.update(other))
+        received = [await communicator.receive_json_from(), await communicator.receive_json_from()]
+        self.assertEqual(sorted(event["message_id"] for event in received), sorted([ticket, other]))
+        self.assertNotIn("event_id", received[0])
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def test_firehose_connection(self):
+        ticket = str(uuid.uuid4())
+        communicator = await self.connect()
+        await self.broadcast(self.update(ticket))
+        self.assertEqual(await communicator.receive_json_from(), self.update(ticket))
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def test_unsubscribe_stops_the_topic(self):
+        ticket = str(uuid.uuid4())
+        communicator = await self.connect([f"ticket:{ticket}", "status:closed"])
+        await communicator.send_json_to({"action": "unsubscribe", "topics": ["status:closed"]})
+        self.assertEqual(await communicator.receive_json_from(), {"type": "subscriptions", "topics": [f"ticket:{ticket}"]})
+        await self.broadcast(self.update(str(uuid.uuid4())))
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
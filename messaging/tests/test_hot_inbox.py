@@ -0,0 +1,55 @@
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from messaging.inbox_cache import KEY_PREFIX, ROWS_KEY, HotInbox
+from messaging.models import Customer, Message
+from messaging.selectors import MessageSelector
+from messaging.utils import get_redis
+from .utils import requires_redis
+
+
+@requires_redis
+@override_settings(HOT_INBOX_ENABLED=True)
+class HotInboxTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(user_id="hot-inbox", name="Ada")
+        self.msg = Message.objects.create(customer=self.customer, body="help", timestamp=timezone.now())
+        HotInbox.rebuild()
+        self.addCleanup(lambda: get_redis().delete(*get_redis().keys(f"{KEY_PREFIX}:*")))
+
+    def cached(self, msg):
+        return get_redis().hexists(ROWS_KEY, HotInbox._member(msg.pk))
+
+    def test_sync_racing_a_claim_does_not_re_add_the_ticket(self):
+        inbox_rows = MessageSelector.get_inbox_rows
+
+        def rows_read_before_the_claim(*args, **kwargs):
+            # The claim commits and discards the ticket after sync read its version,
+            # but sync's DB read still saw it unassigned
+            HotInbox.discard([self.msg])
+            return inbox_rows(*args, **kwargs)
+
+        with mock.patch.object(MessageSelector, "get_inbox_rows", rows_read_before_the_claim):
+            HotInbox.sync(self.msg)
+        self.assertFalse(self.cached(self.msg))
+        self.assertEqual(HotInbox.check()["stale"], [])
+
+    def test_ticket_back_in_the_inbox_is_re_added(self):
+        HotInbox.discard([self.msg])
+        self.assertFalse(self.cached(self.msg))
+        HotInbox.sync(self.msg)
+        self.assertTrue(self.cached(self.msg))
+
+    def test_customer_change_refreshes_cached_rows(self):
+        self.customer.name = "Ada Lovelace"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer.save()
+        results, *_ = HotInbox.first_page(10)
+        self.assertEqual(results[0]["customer"]["name"], "Ada Lovelace")
+
+    def test_repair_rebuilds_a_drifted_cache(self):
+        get_redis().hdel(ROWS_KEY, HotInbox._member(self.msg.pk))
+        with self.assertLogs("messaging.inbox_cache", "WARNING"):
+            drift = HotInbox.repair()
+        self.assertEqual(drift["rowless"], [self.msg.pk])
+        self.assertTrue(self.cached(self.msg))
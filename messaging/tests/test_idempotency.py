@@ -0,0 +1,95 @@
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from messaging.counters import MessageCounters
+from messaging.idempotency import MAX_KEY_LENGTH, REPLAYED_HEADER
+from messaging.models import Agent, Customer, Message, MessageReply
+from .utils import LOCMEM_CACHES
+
+
+@override_settings(CACHES=LOCMEM_CACHES, HOT_INBOX_ENABLED=False)
+@mock.patch.object(MessageCounters, "apply", lambda deltas: None)
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def post(self, url, data, key=None):
+        headers = {"HTTP_IDEMPOTENCY_KEY": key} if key is not None else {}
+        return self.client.post(url, data, format="json", SERVER_NAME="127.0.0.1", **headers)
+
+    def create(self, key, body="My loan was not disbursed"):
+        return self.post("/api/messages/", {"user_id": "idem-test", "body": body}, key)
+
+    def test_replay_returns_the_first_response(self):
+        first = self.create("key-1")
+        self.assertEqual(first.status_code, 201)
+        self.assertNotIn(REPLAYED_HEADER, first)
+
+        retry = self.create("key-1")
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry[REPLAYED_HEADER], "true")
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Message.objects.count(), 1)
+
+    def test_different_keys_run_separately(self):
+        self.create("key-1")
+        self.create("key-2")
+        self.create(None)
+        self.assertEqual(Message.objects.count(), 3)
+
+    def test_same_key_with_a_different_body(self):
+        self.create("key-1")
+        response = self.create("key-1", body="Something else")
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(response.json()["success"])
+        self.assertEqual(Message.objects.count(), 1)
+
+    def test_keys_are_scoped_to_the_endpoint(self):
+        msg = Message.objects.create(
+            customer=Customer.objects.create(user_id="idem-test"), body="help", timestamp=timezone.now()
+        )
+        agent = Agent.objects.create(name="Ann")
+        url = f"/api/messages/{msg.external_id}/reply/"
+        data = {"agent_id": str(agent.external_id), "text": "On it"}
+        self.assertEqual(self.create("shared-key").status_code, 201)
+        self.assertEqual(self.post(url, data, "shared-key").status_code, 200)
+        replay = self.post(url, data, "shared-key")
+        self.assertEqual((replay.status_code, replay[REPLAYED_HEADER]), (200, "true"))
+        self.assertEqual(MessageReply.objects.filter(message=msg).count(), 1)
+
+    def test_invalid_request_does_not_use_up_the_key(self):
+        # Validation errors are raised, not returned, so nothing is stored for the key
+        response = self.post("/api/messages/", {"user_id": "idem-test"}, "key-1")
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn(REPLAYED_HEADER, response)
+        self.assertEqual(self.create("key-1").status_code, 201)
+
+    def test_application_errors_are_replayed(self):
+        agent = Agent.objects.create(name="Ann")
+        url = "/api/messages/7d0c6a3e-0000-4000-8000-000000000009/reply/"
+        data = {"agent_id": str(agent.external_id), "text": "On it"}
+        self.assertEqual(self.post(url, data, "key-1").status_code, 400)
+        retry = self.post(url, data, "key-1")
+        self.assertEqual((retry.status_code, retry[REPLAYED_HEADER]), (400, "true"))
+
+    def test_retry_while_the_first_request_runs(self):
+        with mock.patch("messaging.idempotency.cache.add", return_value=False):
+            response = self.create("key-1")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Message.objects.count(), 0)
+        # The key is usable once the first request is done
+        self.assertEqual(self.create("key-1").status_code, 201)
+
+    def test_key_too_long(self):
+        response = self.create("k" * (MAX_KEY_LENGTH + 1))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Message.objects.count(), 0)
+
+    def test_store_unavailable_runs_the_request(self):
+        with mock.patch("messaging.idempotency.cache.get", side_effect=ConnectionError("down")), \
+                self.assertLogs("messaging.idempotency", "WARNING"):
+            self.assertEqual(self.create("key-1").status_code, 201)
+        self.assertEqual(Message.objects.count(), 1)
@@ -0,0 +1,44 @@
+import tempfile
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase
+from messaging.counters import MessageCounters
+from messaging.inbox_cache import HotInbox
+from messaging.models import Message
+from messaging.tasks import ingest_csv_data
+
+CSV = (
+    "User ID,Timestamp (UTC),Message Body\n"
+    "201,2026-01-01 10:00:00,My loan was approved but not disbursed\n"
+    "202,2026-01-01 10:05:00,How do I update my phone number?\n"
+    ",2026-01-01 10:10:00,no user id\n"
+)
+
+
+@mock.patch.object(MessageCounters, "apply", lambda deltas: None)
+@mock.patch.object(HotInbox, "sync_many")
+class ImportHotInboxTests(TestCase):
+    """Bulk imports bypass MessageService, so they must sync the hot inbox themselves."""
+
+    def assertSyncedOnCommit(self, sync_many, callbacks):
+        sync_many.assert_not_called()
+        for callback in callbacks:
+            callback()
+        sync_many.assert_called_once()
+        synced = sync_many.call_args.args[0]
+        self.assertEqual(sorted(msg.pk for msg in synced), sorted(Message.objects.values_list('pk', flat=True)))
+        self.assertTrue(all(msg.status == Message.STATUS_UNASSIGNED for msg in synced))
+
+    def test_csv_ingest_task(self, sync_many):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(ingest_csv_data(CSV), 2)
+        self.assertSyncedOnCommit(sync_many, callbacks)
+
+    def test_import_messages_command(self, sync_many):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as f:
+            f.write(CSV)
+            f.flush()
+            with self.captureOnCommitCallbacks() as callbacks:
+                call_command("import_messages", path=f.name, stdout=mock.Mock())
+        self.assertEqual(Message.objects.count(), 2)
+        self.assertSyncedOnCommit(sync_many, callbacks)
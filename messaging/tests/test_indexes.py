@@ -0,0 +1,70 @@
+from unittest import skipUnless
+from django.db import connection
+from django.test import TestCase
+from messaging.models import Message
+from messaging.selectors import MessageSelector
+
+
+def index_name(*fields):
+    return next(index.name for index in Message._meta.indexes if tuple(index.fields) == fields)
+
+
+@skipUnless(connection.vendor == "sqlite", "asserts on SQLite's EXPLAIN QUERY PLAN output")
+class MessageIndexPlanTests(TestCase):
+    """What the Message indexes deliver to the inbox queries, read from the query plans."""
+
+    def assertUsesIndex(self, queryset, name, sorted_in_index=True):
+        plan = queryset.explain()
+        self.assertIn(f"INDEX {name} ", plan)
+        if sorted_in_index:
+            self.assertNotIn("TEMP B-TREE", plan)
+        return plan
+
+    def test_status_listing_reads_rows_in_created_order(self):
+        queryset = Message.objects.filter(status=Message.STATUS_CLOSED).order_by('created_at')[:50]
+        self.assertUsesIndex(queryset, index_name("status", "created_at"))
+
+    def test_keyword_score_order_served_by_composite(self):
+        queryset = Message.objects.filter(status=Message.STATUS_UNASSIGNED).order_by(
+            '-keyword_score'
+        ).values_list('keyword_score', flat=True)[:20]
+        plan = self.assertUsesIndex(queryset, index_name("status", "keyword_score", "created_at"))
+        self.assertIn("COVERING INDEX", plan)
+
+    def test_agent_queue_seeks_agent_and_status(self):
+        # The index finds the agent's rows; their age-dependent priority is still sorted on read
+        plan = self.assertUsesIndex(
+            MessageSelector.get_agent_queue(1), "message_agent_queue_idx", sorted_in_index=False
+        )
+        self.assertIn("(assigned_to_id=? AND status=?)", plan)
+        self.assertIn("TEMP B-TREE FOR ORDER BY", plan)
+
+    def test_open_ticket_count_per_agent(self):
+        queryset = Message.objects.filter(assigned_to_id=1, status=Message.STATUS_IN_PROGRESS)
+        self.assertUsesIndex(queryset, "message_agent_queue_idx")
+
+    def test_claim_queue_sorts_computed_priority(self):
+        # Effective priority depends on the ticket's age, so no index can return it pre-sorted:
+        # the status prefix narrows the rows and the sort runs on the unassigned slice.
+        plan = self.assertUsesIndex(
+            MessageSelector.get_claim_queue()[:5], index_name("status", "keyword_score", "created_at"),
+            sorted_in_index=False,
+        )
+        self.assertIn("TEMP B-TREE FOR ORDER BY", plan)
+
+    def test_inbox_pages_sort_the_status_slice(self):
+        # Keyset pages skip OFFSET but not the sort: a deep page filters on the computed
+        # priority and sorts the whole slice like the first one
+        first = MessageSelector.get_priority_inbox(Message.STATUS_UNASSIGNED)
+        deep = first.filter(effective_priority__lt=3)
+        for queryset in (first[:20], deep[:20]):
+            plan = self.assertUsesIndex(
+                queryset, index_name("status", "keyword_score", "created_at"), sorted_in_index=False
+            )
+            self.assertIn("TEMP B-TREE FOR ORDER BY", plan)
+
+    def test_claim_queue_bound_is_an_index_range(self):
+        plan = MessageSelector.get_claim_queue(limit=5)[:5].explain()
+        self.assertIn(
+            f"INDEX {index_name('status', 'keyword_score', 'created_at')} (status=? AND keyword_score>?)", plan
+        )
@@ -0,0 +1,82 @@
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from messaging.models import OutboxEvent
+from messaging.outbox import OutboxRelay
+from messaging.signals import BroadcastBatch
+from messaging.topics import FIREHOSE_GROUP
+
+
+class FakeChannelLayer:
+    def __init__(self, error=None):
+        self.sent = []
+        self.error = error
+
+    async def group_send(self, group, message):
+        if self.error:
+            raise self.error
+        self.sent.append((group, message))
+
+
+def queue(*keys):
+    return OutboxEvent.objects.bulk_create([
+        OutboxEvent(key=key, event={"type": "message_update", "message_id": key}, groups=[FIREHOSE_GROUP])
+        for key in keys
+    ])
+
+
+class OutboxRelayTests(TestCase):
+    def relay_with(self, layer, batch_size=None):
+        with mock.patch("messaging.signals.get_channel_layer", return_value=layer):
+            return OutboxRelay.relay_once(batch_size)
+
+    def test_sends_oldest_first_and_deletes(self):
+        queue("a", "b", "c")
+        layer = FakeChannelLayer()
+        self.assertEqual(self.relay_with(layer, batch_size=2), 2)
+        [(_, message)] = layer.sent
+        self.assertEqual([event["message_id"] for event in message["events"]], ["a", "b"])
+        self.assertEqual(list(OutboxEvent.objects.values_list('key', flat=True)), ["c"])
+
+    def test_rows_are_claimed_while_sending(self):
+        queue("a", "b")
+        seen = {}
+        send = BroadcastBatch.send
+
+        def checked_send(batch, **kwargs):
+            # Another relay finds the head claimed and leaves it alone
+            seen["claimed"] = list(OutboxEvent.objects.values_list('claimed_until', flat=True))
+            seen["other relay"] = OutboxRelay.relay_once()
+            return send(batch, **kwargs)
+
+        with mock.patch.object(BroadcastBatch, "send", checked_send):
+            self.assertEqual(self.relay_with(FakeChannelLayer()), 2)
+        self.assertTrue(all(claimed_until > timezone.now() for claimed_until in seen["claimed"]))
+        self.assertEqual(seen["other relay"], 0)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_failed_send_releases_the_batch(self):
+        queue("a")
+        with self.assertRaises(ConnectionError):
+            self.relay_with(FakeChannelLayer(ConnectionError("channel layer down")))
+        self.assertEqual(list(OutboxEvent.objects.values_list('attempts', 'claimed_until')), [(1, None)])
+        self.assertEqual(self.relay_with(FakeChannelLayer()), 1)
+
+    def test_lapsed_claim_is_taken_over(self):
+        queue("a")
+        OutboxEvent.objects.update(claimed_until=timezone.now() + timedelta(seconds=30))
+        self.assertEqual(self.relay_with(FakeChannelLayer()), 0)
+        OutboxEvent.objects.update(claimed_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.relay_with(FakeChannelLayer()), 1)
+
+    @override_settings(OUTBOX_BACKLOG_ALERT_AGE=60)
+    def test_backlog_with_no_relay_is_logged(self):
+        queue("a", "b")
+        with self.assertNoLogs("messaging.outbox", level="ERROR"):
+            OutboxRelay.check_backlog()
+        OutboxEvent.objects.update(created_at=timezone.now() - timedelta(seconds=120))
+        with self.assertLogs("messaging.outbox", level="ERROR") as logs:
+            depth = OutboxRelay.check_backlog()
+        self.assertEqual(depth["pending"], 2)
+        self.assertIn("2 websocket events pending", logs.output[0])
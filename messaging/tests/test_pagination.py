@@ -0,0 +1,98 @@
+import json
+from base64 import b64encode
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from messaging.counters import MessageCounters
+from messaging.models import Customer, Message
+
+
+def token(values, reverse=False):
+    return b64encode(json.dumps({'v': values, 'r': reverse}).encode()).decode()
+
+
+@override_settings(HOT_INBOX_ENABLED=False)
+@mock.patch.object(MessageCounters, "apply", lambda deltas: None)
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        customer = Customer.objects.create(user_id="pages-test")
+        now = timezone.now()
+        Message.objects.bulk_create([
+            Message(customer=customer, body=f"ticket {i}", keyword_score=i % 4, timestamp=now,
+                    created_at=now - timedelta(hours=7 * i))
+            for i in range(25)
+        ])
+
+    def get(self, url, **params):
+        return APIClient().get(url, params, SERVER_NAME="127.0.0.1")
+
+    def test_next_links_walk_every_row_once(self):
+        seen, url, params = [], "/api/messages/", {"status": "unassigned", "page_size": 7}
+        while url:
+            data = self.get(url, **params).json()
+            seen += [row["external_id"] for row in data["results"]]
+            url, params = data["next"], {}
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+
+    def test_tampered_cursor_values_are_404(self):
+        for values in (
+            ["x", "2020-01-01T00:00:00+00:00", 1],
+            ["1", "notadate", "1"],
+            [{"a": 1}, "2020-01-01T00:00:00+00:00", 1],
+            [1, "2020-01-01T00:00:00+00:00", [1]],
+            [None, "2020-01-01T00:00:00+00:00", 1],
+            [True, "2020-01-01T00:00:00+00:00", 1],
+            [1, 2],
+        ):
+            response = self.get("/api/messages/", status="unassigned", cursor=token(values))
+            self.assertEqual(response.status_code, 404, values)
+            self.assertEqual(response.json()["message"], "Invalid cursor")
+
+    def test_malformed_tokens_are_404(self):
+        for cursor in ("not-base64!", b64encode(b"[1, 2]").decode(), b64encode(b'{"v": 1}').decode()):
+            self.assertEqual(self.get("/api/messages/", cursor=cursor).status_code, 404, cursor)
+
+    def test_search_cursor(self):
+        response = self.get("/api/messages/", q="ticket", cursor=token(["0.5", 3, "2020-01-01T00:00:00+00:00", 1]))
+        self.assertEqual(response.status_code, 200)
+        response = self.get("/api/messages/", q="ticket", cursor=token(["high", 3, "2020-01-01T00:00:00+00:00", 1]))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(HOT_INBOX_ENABLED=False)
+class CursorSnapshotTimeTests(TestCase):
+    """Every page of a listing orders tickets as of the first page's time."""
+
+    def test_ticket_crossing_an_age_step_between_pages(self):
+        customer = Customer.objects.create(user_id="pages-test")
+        now = timezone.now()
+        # At `now`: fresh ones rank 2 + 1, the nearly day-old one 0 + 1. An hour later that one
+        # is overdue (0 + 3) and, as the oldest of the 3s, would sort before the first page's boundary.
+        fresh_a, fresh_b, nearly_overdue, older = Message.objects.bulk_create([
+            Message(customer=customer, body=body, keyword_score=kw, timestamp=now, created_at=now - age)
+            for body, kw, age in [
+                ("fresh a", 2, timedelta(hours=1)), ("fresh b", 2, timedelta(hours=2)),
+                ("nearly overdue", 0, timedelta(hours=23, minutes=30)), ("older", 0, timedelta(hours=10)),
+            ]
+        ])
+        client = APIClient()
+        with mock.patch("django.utils.timezone.now", return_value=now):
+            first = client.get("/api/messages/", {"status": "unassigned", "page_size": 2}, SERVER_NAME="127.0.0.1").json()
+        with mock.patch("django.utils.timezone.now", return_value=now + timedelta(hours=1)):
+            second = client.get(first["next"], SERVER_NAME="127.0.0.1").json()
+
+        self.assertEqual([row["external_id"] for row in first["results"]], [str(fresh_b.external_id), str(fresh_a.external_id)])
+        self.assertEqual(
+            [(row["external_id"], row["priority"]) for row in second["results"]],
+            [(str(nearly_overdue.external_id), 1), (str(older.external_id), 1)],
+        )
+
+    def test_invalid_snapshot_time(self):
+        for when in ("yesterday", "2026-01-01T00:00:00", 5):
+            cursor = b64encode(json.dumps({'v': [1, "2026-01-01T00:00:00+00:00", 1], 'r': False, 't': when}).encode()).decode()
+            response = APIClient().get("/api/messages/", {"cursor": cursor}, SERVER_NAME="127.0.0.1")
+            self.assertEqual(response.status_code, 404, when)
@@ -0,0 +1,121 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from messaging.cache import agent_cache, canned_response_cache
+from messaging.models import Agent, CannedResponse, Customer, Message, OutboxEvent
+from messaging.selectors import AgentSelector, CannedResponseSelector
+from messaging.services import ApplicationError, MessageService
+from .utils import LOCMEM_CACHES, SAVEPOINT, SAVEPOINT_ROLLBACK
+
+
+class QueryCountTestCase(TestCase):
+    """
+    Hot write paths with the agent (and canned response) caches warm, as in check_query_budgets.
+    Subclasses pin the shared cache to LOCMEM_CACHES: with Redis down every lookup would go to
+    the database and the counts would depend on the environment.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.agent = Agent.objects.create(name="Ann")
+        cls.other_agent = Agent.objects.create(name="Ben")
+        cls.customer = Customer.objects.create(user_id="query-counts")
+
+    def setUp(self):
+        cache.clear()
+        agent_cache.invalidate()
+        for agent in (self.agent, self.other_agent):
+            AgentSelector.get_by_external_id(str(agent.external_id))
+
+    def ticket(self, status=Message.STATUS_UNASSIGNED, assigned_to=None):
+        # bulk_create: no post_save outbox row, so each test only counts the call under test
+        msg, = Message.objects.bulk_create([Message(
+            customer=self.customer, body="query count", status=status, assigned_to=assigned_to,
+            timestamp=timezone.now(),
+        )])
+        return str(msg.external_id)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, REALTIME_OUTBOX=True)
+class ClaimQueryCountTests(QueryCountTestCase):
+    def test_claim(self):
+        # Conditional UPDATE ... RETURNING, outbox insert
+        ticket = self.ticket()
+        with self.assertNumQueries(2 + SAVEPOINT):
+            MessageService.claim_message(message_external_id=ticket, agent_external_id=str(self.agent.external_id))
+
+    def test_lost_race(self):
+        # The UPDATE matches nothing, one lookup names the winner
+        ticket = self.ticket()
+        MessageService.claim_message(message_external_id=ticket, agent_external_id=str(self.agent.external_id))
+        with self.assertNumQueries(2 + SAVEPOINT_ROLLBACK):
+            with self.assertRaisesMessage(ApplicationError, "already_claimed_by:Ann"):
+                MessageService.claim_message(message_external_id=ticket, agent_external_id=str(self.other_agent.external_id))
+
+
+@override_settings(CACHES=LOCMEM_CACHES, REALTIME_OUTBOX=True)
+class ReplyQueryCountTests(QueryCountTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.canned = CannedResponse.objects.create(title="Hello", body="Hi {{ customer_name }}, we are on it")
+
+    def setUp(self):
+        super().setUp()
+        canned_response_cache.invalidate()
+        CannedResponseSelector.get_template(str(self.canned.external_id))
+
+    def reply(self, ticket):
+        return MessageService.reply_message(
+            message_external_id=ticket, agent_external_id=str(self.agent.external_id), text="On it"
+        )
+
+    def canned_reply(self, ticket):
+        return MessageService.use_canned_reply(
+            message_external_id=ticket, agent_external_id=str(self.agent.external_id),
+            canned_external_id=str(self.canned.external_id),
+        )
+
+    def test_reply(self):
+        # Message lookup, reply insert
+        ticket = self.ticket(Message.STATUS_IN_PROGRESS, self.agent)
+        with self.assertNumQueries(2 + SAVEPOINT):
+            self.reply(ticket)
+
+    def test_reply_assigns_unassigned_ticket(self):
+        # + the assigning UPDATE and its outbox event
+        ticket = self.ticket()
+        with self.assertNumQueries(4 + SAVEPOINT):
+            self.reply(ticket)
+
+    def test_canned_reply(self):
+        # Template and agent cached: message lookup (customer joined for the placeholder), reply insert
+        ticket = self.ticket(Message.STATUS_IN_PROGRESS, self.agent)
+        with self.assertNumQueries(2 + SAVEPOINT):
+            self.canned_reply(ticket)
+
+    def test_canned_reply_cold_caches(self):
+        # + the agent and the canned response lookups
+        ticket = self.ticket(Message.STATUS_IN_PROGRESS, self.agent)
+        agent_cache.invalidate()
+        canned_response_cache.invalidate()
+        with self.assertNumQueries(4 + SAVEPOINT):
+            self.canned_reply(ticket)
+
+    def test_customer_reply(self):
+        # Message lookup without the body or the agent row, reply insert
+        ticket = self.ticket(Message.STATUS_IN_PROGRESS, self.agent)
+        with self.assertNumQueries(2 + SAVEPOINT) as captured:
+            MessageService.customer_reply(message_external_id=ticket, text="Thanks")
+        lookup = captured.captured_queries[0]["sql"]
+        self.assertNotIn('"messaging_message"."body"', lookup)
+        self.assertNotIn('"messaging_agent"."name"', lookup)
+
+    def test_customer_reply_reopens_closed_ticket(self):
+        # + the status UPDATE and its outbox event
+        ticket = self.ticket(Message.STATUS_CLOSED, self.agent)
+        with self.assertNumQueries(4 + SAVEPOINT):
+            msg = MessageService.customer_reply(message_external_id=ticket, text="It happened again")
+        self.assertEqual(msg.status, Message.STATUS_IN_PROGRESS)
+        event = OutboxEvent.objects.get(key=ticket).event
+        self.assertEqual((event["status"], event["assigned_to"]), (Message.STATUS_IN_PROGRESS, str(self.agent.external_id)))
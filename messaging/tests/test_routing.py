@@ -0,0 +1,44 @@
+from unittest import mock
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from messaging.cache import agent_cache
+from messaging.counters import COUNTERS_KEY, MessageCounters
+from messaging.models import Agent, Message
+from messaging.services import MessageService
+from messaging.ticket_routing import TicketRouter
+from messaging.utils import get_redis
+from .utils import requires_redis
+
+
+@override_settings(TICKET_ROUTING_STRATEGY="least_loaded", HOT_INBOX_ENABLED=False)
+class RoutingReservationTests(TestCase):
+    """A ticket insert that rolls back must not keep the agent slot pick_agent reserved."""
+
+    def setUp(self):
+        TicketRouter._trackers.clear()
+        self.addCleanup(TicketRouter._trackers.clear)
+        # Agent saves invalidate the cached roster on commit, which a TestCase never reaches
+        agent_cache.invalidate()
+        self.agent = Agent.objects.create(name="Solo", capacity=1)
+
+    def create_fails_then_succeeds(self):
+        with mock.patch.object(Message.objects, "create", side_effect=IntegrityError("insert failed")):
+            with self.assertRaises(IntegrityError):
+                MessageService.create_message(user_id="routing", body="hello")
+        # Capacity 1: only routed if the failed attempt gave its slot back
+        msg = MessageService.create_message(user_id="routing", body="hello")
+        self.assertEqual(msg.assigned_to, self.agent)
+
+    @override_settings(TICKET_ROUTING_LOAD_BACKEND="memory")
+    def test_memory_tracker(self):
+        self.create_fails_then_succeeds()
+
+    @requires_redis
+    @override_settings(TICKET_ROUTING_LOAD_BACKEND="redis")
+    def test_redis_tracker(self):
+        redis = get_redis()
+        redis.delete(COUNTERS_KEY)
+        self.addCleanup(redis.delete, COUNTERS_KEY)
+        self.create_fails_then_succeeds()
+        field = MessageCounters.agent_field(self.agent.external_id, Message.STATUS_IN_PROGRESS)
+        self.assertEqual(redis.hget(COUNTERS_KEY, field), b"1")
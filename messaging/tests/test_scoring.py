@@ -0,0 +1,139 @@
+import itertools
+import random
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from messaging.models import ArchivedMessage, Customer, Message
+from messaging.serializers import ArchivedMessageSerializer, MessageSerializer
+from messaging.utils import (
+    URGENT_KEYWORDS, KeywordMatcher, calculate_keyword_score, calculate_keyword_score_batch,
+    calculate_priority, calculate_priority_batch,
+)
+
+
+def per_pattern_score(body):
+    # The scorer KeywordMatcher replaced: one re.search per table entry
+    if not body:
+        return 0
+    text = body.lower()
+    return sum(weight for pattern, weight in URGENT_KEYWORDS.items() if re.search(pattern, text))
+
+
+# Every keyword, the overlapping disburse forms, near misses and word-boundary cases
+WORDS = [
+    "loan", "loans", "disburse", "disbursed", "disbursement", "disbursements", "disburses", "disbursing",
+    "disburs", "approved", "unapproved", "urgent", "urgently", "failed", "error", "errors", "transfer",
+    "transferred", "LOAN", "Disbursed", "URGENT!", "(error)", "loan-approved", "transfer,failed",
+    "my", "the", "was", "not", "",
+]
+
+
+class KeywordMatcherTests(SimpleTestCase):
+    def assertScoresLikePerPatternLoop(self, body):
+        self.assertEqual(calculate_keyword_score(body), per_pattern_score(body), body)
+
+    def test_each_word_alone(self):
+        for word in WORDS:
+            self.assertScoresLikePerPatternLoop(word)
+
+    def test_word_pairs(self):
+        for first, second in itertools.product(WORDS, repeat=2):
+            self.assertScoresLikePerPatternLoop(f"{first} {second}")
+            self.assertScoresLikePerPatternLoop(f"{first}{second}")
+
+    def test_random_bodies(self):
+        rng = random.Random(1234)
+        separators = [" ", ", ", ".", "\n", "-", ""]
+        for _ in range(2000):
+            words = rng.choices(WORDS, k=rng.randint(1, 12))
+            self.assertScoresLikePerPatternLoop("".join(word + rng.choice(separators) for word in words))
+
+    def test_overlapping_entries_keep_their_own_weights(self):
+        # "disburse" only satisfies the first disburse entry, "disbursed" only the second; both count
+        self.assertEqual(calculate_keyword_score("please disburse"), 8)
+        self.assertEqual(calculate_keyword_score("was it disbursed"), 8)
+        self.assertEqual(calculate_keyword_score("disbursed, then disburse"), 8 + 8)
+        # Repeats count once, like re.search
+        self.assertEqual(calculate_keyword_score("urgent urgent error error"), 10 + 3)
+        self.assertEqual(calculate_keyword_score(" ".join(WORDS)), sum(URGENT_KEYWORDS.values()))
+
+    def test_matched_indexes(self):
+        matcher = KeywordMatcher(URGENT_KEYWORDS)
+        patterns = list(URGENT_KEYWORDS)
+        self.assertEqual(
+            {patterns[index] for index in matcher.matched("loan disbursement failed")},
+            {r"\bloan\b", r"\bdisburs(ed|ement)?\b", r"\bfailed\b"},
+        )
+        self.assertEqual(matcher.matched("nothing to see"), set())
+
+
+class PriorityBatchTests(SimpleTestCase):
+    """calculate_priority_batch gives exactly what calculate_priority gives row by row."""
+    NOW = timezone.make_aware(datetime(2026, 3, 10, 12, 0, 0))
+    # Ages around the 24h and 48h steps, plus a future timestamp and a very old one
+    AGES = [
+        timedelta(hours=-1), timedelta(0), timedelta(seconds=1), timedelta(hours=12),
+        timedelta(hours=24) - timedelta(microseconds=1), timedelta(hours=24), timedelta(hours=24, seconds=1),
+        timedelta(hours=48) - timedelta(microseconds=1), timedelta(hours=48), timedelta(hours=48, seconds=1),
+        timedelta(days=30),
+    ]
+    BODIES = ["", None, "urgent: loan disbursement failed", "loan approved", "hello", "urgent: loan disbursement failed"]
+    STATUSES = ["unassigned", "in_progress", "closed"]
+
+    def setUp(self):
+        patcher = mock.patch("django.utils.timezone.now", return_value=self.NOW)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_matches_per_row_scores(self):
+        rows = [
+            (body, self.NOW - age, status)
+            for body, age, status in itertools.product(self.BODIES, self.AGES, self.STATUSES)
+        ]
+        bodies, created_ats, statuses = zip(*rows)
+        self.assertEqual(
+            calculate_priority_batch(bodies, created_ats, statuses).tolist(),
+            [calculate_priority(*row) for row in rows],
+        )
+
+    def test_naive_timestamps_are_utc(self):
+        created_ats = [timezone.make_naive(self.NOW - age, dt_timezone.utc) for age in self.AGES]
+        self.assertEqual(
+            calculate_priority_batch(["loan"] * len(created_ats), created_ats, "unassigned").tolist(),
+            [calculate_priority("loan", created_at, "unassigned") for created_at in created_ats],
+        )
+
+    def test_keyword_scores(self):
+        bodies = self.BODIES + WORDS
+        self.assertEqual(
+            calculate_keyword_score_batch(bodies).tolist(), [calculate_keyword_score(body) for body in bodies]
+        )
+
+    def test_empty(self):
+        self.assertEqual(calculate_priority_batch([], [], []).tolist(), [])
+
+
+class ReportedPriorityTests(TestCase):
+    """
+    No priority is stored: single-ticket responses score the ticket at read time.
+    """
+
+    def test_open_ticket_gains_its_waiting_penalty(self):
+        customer = Customer.objects.create(user_id="reported-priority")
+        msg = Message.objects.create(
+            customer=customer, body="urgent", keyword_score=calculate_keyword_score("urgent"),
+            timestamp=timezone.now(), created_at=timezone.now() - timedelta(hours=30),
+        )
+        # 30h old: no recency bonus, the 24h waiting penalty
+        self.assertEqual(MessageSerializer(msg).data["priority"], calculate_keyword_score("urgent") + 3)
+
+    def test_archived_ticket_is_scored_as_closed(self):
+        customer = Customer.objects.create(user_id="reported-priority-archive")
+        created_at = timezone.now() - timedelta(days=120)
+        archived = ArchivedMessage.objects.create(
+            external_id="00000000-0000-0000-0000-000000000001", customer=customer, body="urgent",
+            timestamp=created_at, created_at=created_at,
+        )
+        self.assertEqual(ArchivedMessageSerializer(archived).data["priority"], calculate_keyword_score("urgent"))
@@ -0,0 +1,22 @@
+from unittest import skipUnless
+import redis
+from messaging.utils import get_redis
+
+
+def redis_available() -> bool:
+    try:
+        return bool(get_redis().ping())
+    except redis.RedisError:
+        return False
+
+
+# Tests of the Redis-backed helpers run against REDIS_URL and only touch their own keys
+requires_redis = skipUnless(redis_available(), "needs a Redis server at REDIS_URL")
+
+# The shared Django cache for tests that must not depend on (or leave state in) a Redis server
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "messaging-tests"}}
+
+# Inside a TestCase the service's transaction.atomic() is a savepoint: SAVEPOINT and RELEASE
+# on success, plus ROLLBACK TO when the block raises. Budgets in check_query_budgets exclude them.
+SAVEPOINT = 2
+SAVEPOINT_ROLLBACK = 3
@@ -0,0 +1,204 @@
+import itertools
+import logging
+import threading
+import time
+import redis
+from django.conf import settings
+from django.db.models import Count
+from .cache import agent_cache
+from .counters import COUNTERS_KEY, MessageCounters
+from .models import Agent, Message
+from .utils import get_redis, keyword_categories
+
+logger = logging.getLogger(__name__)
+
+STRATEGY_LEAST_LOADED = "least_loaded"
+STRATEGY_ROUND_ROBIN = "round_robin"
+STRATEGY_SKILL = "skill"
+STRATEGIES = (STRATEGY_LEAST_LOADED, STRATEGY_ROUND_ROBIN, STRATEGY_SKILL)
+
+ROUND_ROBIN_KEY = "messaging:routing:round_robin"
+
+# Pick an agent under capacity and count the ticket against it, atomically.
+# KEYS: counters hash, round-robin pointer. ARGV: mode, then (load field, capacity) per candidate.
+# Returns the candidate's 0-based index, -1 when all are full, -2 when the counters are not built.
+RESERVE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return -2 end
+local n = (#ARGV - 1) / 2
+local start = 0
+if ARGV[1] == 'rr' then start = redis.call('INCR', KEYS[2]) end
+local best, best_load = -1, nil
+for i = 0, n - 1 do
+    local j = (start + i) % n
+    local load = tonumber(redis.call('HGET', KEYS[1], ARGV[2 + j * 2]) or '0')
+    if load < tonumber(ARGV[3 + j * 2]) then
+        if ARGV[1] == 'rr' then best = j break end
+        if best_load == nil or load < best_load then best, best_load = j, load end
+    end
+end
+if best >= 0 then redis.call('HINCRBY', KEYS[1], ARGV[2 + best * 2], 1) end
+return best
+"""
+
+
+class RedisLoadTracker:
+    """
+    Agent load is the agent's in_progress counter in the MessageCounters hash, so
+    claims and replies from every process count. Capacity is enforced atomically.
+    """
+    counts_in_hash = True
+
+    def __init__(self):
+        self._script = None
+
+    def reserve(self, candidates, round_robin: bool):
+        if self._script is None:
+            self._script = get_redis().register_script(RESERVE_SCRIPT)
+        args = ['rr' if round_robin else 'least']
+        for agent in candidates:
+            args += [MessageCounters.agent_field(agent.external_id, Message.STATUS_IN_PROGRESS), agent.capacity]
+
+        index = self._script(keys=[COUNTERS_KEY, ROUND_ROBIN_KEY], args=args)
+        if index == -2:
+            MessageCounters.reconcile()
+            index = self._script(keys=[COUNTERS_KEY, ROUND_ROBIN_KEY], args=args)
+        return candidates[index] if index >= 0 else None
+
+    def release(self, agent):
+        # Same atomic, exists-guarded HINCRBY as the counters; a hash rebuilt since counts from the DB
+        MessageCounters.apply({MessageCounters.agent_field(agent.external_id, Message.STATUS_IN_PROGRESS): -1})
+
+
+class MemoryLoadTracker:
+    """
+    Per-process loads, reloaded from the database every `refresh` seconds.
+    Capacity is only strict within one process; for single-worker setups and development.
+    """
+    counts_in_hash = False
+
+    def __init__(self, refresh: int = 30):
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        self._loads = {}
+        self._loaded_at = None
+        self._turn = itertools.count()
+
+    def reserve(self, candidates, round_robin: bool):
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh:
+                self._reload()
+            start = next(self._turn) % len(candidates) if round_robin else 0
+            best = None
+            for agent in candidates[start:] + candidates[:start]:
+                load = self._loads.get(agent.pk, 0)
+                if load >= agent.capacity:
+                    continue
+                if round_robin:
+                    best = agent
+                    break
+                if best is None or load < self._loads.get(best.pk, 0):
+                    best = agent
+            if best is not None:
+                self._loads[best.pk] = self._loads.get(best.pk, 0) + 1
+            return best
+
+    def release(self, agent):
+        with self._lock:
+            if self._loads.get(agent.pk):
+                self._loads[agent.pk] -= 1
+
+    def _reload(self):
+        rows = Message.objects.filter(
+            status=Message.STATUS_IN_PROGRESS, assigned_to__isnull=False
+        ).order_by().values('assigned_to').annotate(n=Count('id'))
+        self._loads = {row['assigned_to']: row['n'] for row in rows}
+        self._loaded_at = time.monotonic()
+
+
+class TicketRouter:
+    """
+    Chooses the agent a new ticket is assigned to, per TICKET_ROUTING_STRATEGY:
+    - least_loaded: the agent with the fewest in-progress tickets
+    - round_robin: agents in turn, skipping those at capacity
+    - skill: least loaded among agents whose skills cover the body's KEYWORD_CATEGORIES,
+      then anyone with room
+    Agents with capacity 0 are never routed to. Returns None (ticket stays in the inbox)
+    when routing is off, everyone is full or the load store is unreachable.
+    """
+    _trackers = {}
+
+    @staticmethod
+    def strategy() -> str:
+        return settings.TICKET_ROUTING_STRATEGY
+
+    @classmethod
+    def pick_agent(cls, body: str):
+        strategy = cls.strategy()
+        if not strategy:
+            return None
+        if strategy not in STRATEGIES:
+            logger.error(f"Unknown TICKET_ROUTING_STRATEGY {strategy!r}, leaving ticket unassigned")
+            return None
+
+        roster = cls._get_roster()
+        if not roster:
+            return None
+        pools = [roster]
+        if strategy == STRATEGY_SKILL:
+            categories = keyword_categories(body)
+            skilled = [agent for agent in roster if agent.skill_set & categories]
+            if skilled:
+                pools = [skilled, [agent for agent in roster if not agent.skill_set & categories]]
+
+        tracker = cls._tracker()
+        try:
+            for pool in pools:
+                if pool:
+                    agent = tracker.reserve(pool, round_robin=strategy == STRATEGY_ROUND_ROBIN)
+                    if agent is not None:
+                        return agent
+        except redis.RedisError as e:
+            logger.warning(f"Ticket routing unavailable, leaving ticket unassigned: {str(e)}")
+        return None
+
+    @classmethod
+    def release(cls, agent: Agent):
+        """
+        Give back the slot pick_agent reserved, when the ticket was not created after all.
+        """
+        try:
+            cls._tracker().release(agent)
+        except redis.RedisError as e:
+            logger.warning(f"Could not release routing slot of {agent.external_id}, left to reconcile: {str(e)}")
+
+    @classmethod
+    def record_routed(cls, agent: Agent):
+        """
+        Counter deltas for a ticket created already assigned to `agent`.
+        The Redis tracker counted the agent's load when it reserved the slot.
+        """
+        new_agent = None if cls._tracker().counts_in_hash else agent.external_id
+        MessageCounters.record_transition(None, Message.STATUS_IN_PROGRESS, new_agent=new_agent)
+
+    @classmethod
+    def _get_roster(cls):
+        # Cached with the other agent lookups, so any Agent save re-reads it everywhere
+        return agent_cache.get("routing_roster", cls._load_roster)
+
+    @staticmethod
+    def _load_roster():
+        roster = list(
+            Agent.objects.filter(capacity__gt=0).only('id', 'external_id', 'name', 'capacity', 'skills').order_by('id')
+        )
+        for agent in roster:
+            agent.skill_set = frozenset(agent.skills or ())
+        return roster
+
+    @classmethod
+    def _tracker(cls):
+        backend = settings.TICKET_ROUTING_LOAD_BACKEND
+        tracker = cls._trackers.get(backend)
+        if tracker is None:
+            tracker = RedisLoadTracker() if backend == "redis" else MemoryLoadTracker()
+            cls._trackers[backend] = tracker
+        return tracker
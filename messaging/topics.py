@@ -0,0 +1,44 @@
+import uuid
+
+# Every connection starts here and gets all events, until it subscribes to topics
+FIREHOSE_GROUP = "agents"
+TOPIC_KINDS = ("agent", "status", "ticket")
+# Topics one connection may hold
+MAX_SUBSCRIPTIONS = 50
+
+
+def topic_group(kind: str, value) -> str:
+    # Channel layer group for a topic; names allow letters, digits, '-', '_' and '.'
+    return f"{kind}.{value}"
+
+
+def parse_topic(topic) -> str:
+    """
+    Group for a client topic ("agent:<external_id>", "status:<status>", "ticket:<external_id>"),
+    or None when it is not valid.
+    """
+    from .models import Message
+
+    if not isinstance(topic, str) or topic.count(":") != 1:
+        return None
+    kind, value = topic.split(":")
+    if kind == "status":
+        return topic_group(kind, value) if value in dict(Message.STATUS_CHOICES) else None
+    if kind in TOPIC_KINDS:
+        try:
+            return topic_group(kind, uuid.UUID(value))
+        except ValueError:
+            return None
+    return None
+
+
+def event_groups(message_external_ids, statuses, agents) -> set:
+    """
+    Groups an event about these tickets goes to: the firehose, each ticket, every status
+    the tickets left or entered and every agent they were taken from or given to.
+    """
+    groups = {FIREHOSE_GROUP}
+    groups.update(topic_group("ticket", external_id) for external_id in message_external_ids)
+    groups.update(topic_group("status", status) for status in statuses if status)
+    groups.update(topic_group("agent", agent) for agent in agents if agent)
+    return groups
@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import MessageViewSet, CannedResponseViewSet, AgentViewSet
+from .views import MessageViewSet, CannedResponseViewSet, AgentViewSet, AnalyticsViewSet
 
 router = DefaultRouter()
 router.register(r'messages', MessageViewSet, basename='message')
 router.register(r'canned', CannedResponseViewSet, basename='canned')
 router.register(r'agents', AgentViewSet, basename='agent')
+router.register(r'analytics', AnalyticsViewSet, basename='analytics')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,5 +1,10 @@
 import re
-from datetime import datetime, timezone as dt_timezone
+from datetime import datetime, timedelta, timezone as dt_timezone
+import numpy as np
+import pandas as pd
+import redis
+from django.conf import settings
+from django.db.models import Case, F, IntegerField, Value, When
 from django.utils import timezone
 from rest_framework.views import exception_handler
 from rest_framework.exceptions import ValidationError
@@ -18,18 +23,77 @@ URGENT_KEYWORDS = {
     r"\btransfer\b": 4,
 }
 
+# Routing skill categories, each covering some URGENT_KEYWORDS patterns
+KEYWORD_CATEGORIES = {
+    "lending": [r"\bloan\b", r"\bapproved\b"],
+    "disbursement": [r"\bdisburse\b", r"\bdisburs(ed|ement)?\b"],
+    "payments": [r"\bfailed\b", r"\berror\b", r"\btransfer\b"],
+    "escalation": [r"\burgent\b"],
+}
+
+class KeywordMatcher:
+    """
+    Compiles a keyword table into a single alternation so a body is scanned once.
+    Each matched token is resolved back to the table entries it satisfies (cached),
+    so overlapping patterns keep their individual weights.
+    Table entries are expected to be word-bounded (``\\b...\\b``).
+    """
+
+    def __init__(self, keywords: dict):
+        self._entries = [(re.compile(pattern), weight) for pattern, weight in keywords.items()]
+        self._matcher = re.compile("|".join(f"(?:{pattern})" for pattern in keywords))
+        self._resolved = {}
+
+    def _resolve(self, token: str) -> frozenset:
+        entries = self._resolved.get(token)
+        if entries is None:
+            entries = frozenset(
+                index for index, (pattern, _) in enumerate(self._entries)
+                if pattern.fullmatch(token)
+            )
+            self._resolved[token] = entries
+        return entries
+
+    def matched(self, text: str) -> set:
+        """
+        Indexes (in table order) of the patterns present in the text.
+        """
+        matched = set()
+        for match in self._matcher.finditer(text):
+            matched |= self._resolve(match.group(0))
+            if len(matched) == len(self._entries):
+                break
+        return matched
+
+    def score(self, text: str) -> int:
+        return sum(self._entries[index][1] for index in self.matched(text))
+
+
+_KEYWORD_MATCHER = KeywordMatcher(URGENT_KEYWORDS)
+
 def calculate_keyword_score(body: str) -> int:
     """
-    Count keyword occurrences and sum weights.
+    Sum the weights of every keyword pattern present in the body (single pass).
     """
     if not body:
         return 0
-    text = body.lower()
-    score = 0
-    for pattern, weight in URGENT_KEYWORDS.items():
-        if re.search(pattern, text):
-            score += weight
-    return score
+    return _KEYWORD_MATCHER.score(body.lower())
+
+_PATTERN_CATEGORIES = [
+    frozenset(category for category, patterns in KEYWORD_CATEGORIES.items() if pattern in patterns)
+    for pattern in URGENT_KEYWORDS
+]
+
+def keyword_categories(body: str) -> set:
+    """
+    KEYWORD_CATEGORIES whose patterns appear in the body.
+    """
+    if not body:
+        return set()
+    categories = set()
+    for index in _KEYWORD_MATCHER.matched(body.lower()):
+        categories |= _PATTERN_CATEGORIES[index]
+    return categories
 
 def calculate_priority(body: str, created_at: datetime, status: str) -> int:
     """
@@ -38,9 +102,15 @@ def calculate_priority(body: str, created_at: datetime, status: str) -> int:
     - Recency gives small boost for recent messages (within 2 days).
     - Waiting penalty increases score if message has been unhandled for too long.
     """
-    score = calculate_keyword_score(body)
+    return calculate_keyword_score(body) + calculate_age_score(created_at, status)
+
+def calculate_age_score(created_at: datetime, status: str, now: datetime = None) -> int:
+    """
+    Time-dependent part of calculate_priority: recency bonus plus waiting penalty.
+    """
+    score = 0
     # recency: messages less than 2 days old get a small bonus
-    now = timezone.now()
+    now = now or timezone.now()
 
     # Make sure created_at is timezone-aware
     if timezone.is_naive(created_at):
@@ -59,6 +129,71 @@ def calculate_priority(body: str, created_at: datetime, status: str) -> int:
             score += 5  # very overdue (ignored too long)
     return score
 
+def calculate_keyword_score_batch(bodies) -> np.ndarray:
+    """
+    calculate_keyword_score for a column of bodies, scoring each distinct body once.
+    """
+    bodies = pd.Series(bodies, dtype=object)
+    codes, uniques = pd.factorize(bodies.fillna(""))
+    unique_scores = np.fromiter(
+        (calculate_keyword_score(body) for body in uniques), dtype=np.int64, count=len(uniques)
+    )
+    return unique_scores[codes]
+
+def calculate_priority_batch(bodies, created_ats, statuses) -> np.ndarray:
+    """
+    Column-wise calculate_priority for bulk paths (CSV ingest, imports).
+    - Keyword scores are computed once per distinct body.
+    - Recency bonus and waiting penalty are plain array arithmetic on ages.
+    `statuses` may be a sequence aligned with `bodies` or a single status for every row.
+    Returns an int64 array with the same scores calculate_priority gives row by row.
+    """
+    bodies = pd.Series(bodies, dtype=object)
+    if bodies.empty:
+        return np.zeros(0, dtype=np.int64)
+
+    score = calculate_keyword_score_batch(bodies)
+
+    # Naive timestamps are treated as UTC, same as calculate_priority
+    created = pd.to_datetime(pd.Series(created_ats, index=bodies.index), utc=True)
+    age_hours = (pd.Timestamp(timezone.now()) - created).dt.total_seconds().to_numpy() / 3600.0
+
+    # recency: 2 - age/24 truncated, only within the first 48h
+    recency_bonus = np.where(age_hours < 48, np.maximum(0, np.trunc(2 - age_hours / 24)), 0)
+    score = score + recency_bonus.astype(np.int64)
+
+    # Waiting penalty for tickets still open
+    if isinstance(statuses, str):
+        statuses = [statuses] * len(bodies)
+    is_open = np.isin(np.asarray(statuses, dtype=object), ["unassigned", "in_progress"])
+    waiting_penalty = np.where(age_hours >= 24, 3, 0) + np.where(age_hours >= 48, 5, 0)
+    return score + np.where(is_open, waiting_penalty, 0)
+
+# Most the age terms (recency bonus plus waiting penalty) add to a ticket's keyword score
+MAX_AGE_SCORE = 3 + 5
+
+def priority_expression(now: datetime = None):
+    """
+    SQL counterpart of calculate_priority, evaluated by the database at query time.
+    The content part comes from the stored Message.keyword_score; the recency bonus
+    and waiting penalty are CASE expressions over created_at relative to `now`.
+    """
+    now = now or timezone.now()
+    open_statuses = ["unassigned", "in_progress"]
+    recency_bonus = Case(
+        When(created_at__gte=now, then=Value(2)),
+        When(created_at__gte=now - timedelta(hours=24), then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    waiting_penalty = Case(
+        When(status__in=open_statuses, created_at__lte=now - timedelta(hours=48), then=Value(3 + 5)),
+        When(status__in=open_statuses, created_at__lte=now - timedelta(hours=24), then=Value(3)),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    return F("keyword_score") + recency_bonus + waiting_penalty
+
 def custom_exception_handler(exc, context):
     """
     Unified error response format.
@@ -91,3 +226,15 @@ def generic_response(data=None, message="Success", success=True, status_code=200
         "data": data,
         "errors": None if success else data
     }, status=status_code)
+
+_redis_client = None
+
+def get_redis() -> redis.Redis:
+    """
+    Shared client for the Redis behind CHANNEL_LAYERS (hot inbox, counters).
+    Short timeouts: a slow Redis must not hold up a request, callers fall back to the DB.
+    """
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+    return _redis_client
@@ -2,42 +2,129 @@ from rest_framework import viewsets, mixins
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
+from datetime import timedelta
+from django.core.exceptions import ValidationError
+from django.http import Http404
 from django.utils import timezone
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
 from .models import Message, CannedResponse, Agent
 from .serializers import (
     MessageSerializer, 
+    MessageListSerializer,
+    ArchivedMessageSerializer,
+    MessageReplyObjectSerializer,
     CannedResponseSerializer,
     AgentSerializer,
     MessageCreateSerializer,
     MessageClaimSerializer,
+    MessageClaimNextSerializer,
+    MessageBulkActionSerializer,
     MessageReplySerializer,
     MessageCannedReplySerializer,
-    CustomerReplySerializer
+    CustomerReplySerializer,
+    AnalyticsQuerySerializer,
+    HourlySLAStatsSerializer,
+    AgentSLAStatsSerializer
 )
 from .services import MessageService, ApplicationError
-from .selectors import MessageSelector
+from .selectors import AnalyticsSelector, ArchiveSelector, CannedResponseSelector, MessageSelector
+from .pagination import KeysetPagination
+from .inbox_cache import HotInbox
+from .counters import MessageCounters
+from .outbox import OutboxRelay
 from .utils import generic_response
+from .idempotency import IDEMPOTENCY_HEADER, idempotent
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
+# Documented on the POST actions that accept it (see idempotency.idempotent)
+IDEMPOTENCY_KEY_PARAMETER = openapi.Parameter(
+    IDEMPOTENCY_HEADER, openapi.IN_HEADER, type=openapi.TYPE_STRING, required=False,
+    description="Client-chosen key; retries with the same key replay the first response"
+)
+
+# Analytics window: default when `since` is omitted, and the longest allowed
+ANALYTICS_DEFAULT_RANGE = timedelta(hours=24)
+ANALYTICS_MAX_RANGE = timedelta(days=31)
+
 class MessageViewSet(viewsets.ModelViewSet):
     """
     ViewSet for handling messages (List, Create, Claim, Reply, Canned).
     """
     serializer_class = MessageSerializer
     lookup_field = 'external_id'
+    # Keyset pages over the inbox ordering: no OFFSET, deep pages cost what the first does
+    # (a scan of the status slice, see KeysetPagination)
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
+        if self.action != 'list':
+            return MessageSelector.get_message_thread()
         status_q = self.request.query_params.get('status')
         search_q = self.request.query_params.get('q')
-        return MessageSelector.get_priority_inbox(status_q, search_q)
+        return MessageSelector.get_priority_inbox(status_q, search_q, now=self.paginator.get_now(self.request))
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('status', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter(
+                'q', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=False,
+                description="Full-text search on the ticket body, or an exact customer user_id "
+                            "(partial user_id matches are no longer returned)"
+            ),
+        ]
+    )
+    def list(self, request, *args, **kwargs):
+        # Polled first page of the unassigned inbox comes straight from the Redis hot inbox
+        params = request.query_params
+        if (params.get('status') == Message.STATUS_UNASSIGNED and not params.get('q')
+                and not params.get(self.paginator.cursor_query_param)):
+            cached = HotInbox.first_page(
+                self.paginator.get_page_size(request),
+                with_count=self.paginator.count_requested(request),
+                now=self.paginator.get_now(request)
+            )
+            if cached is not None:
+                return self.paginator.get_first_page_response(request, *cached, ordering=HotInbox.ORDERING)
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            # Closed tickets past retention live in the archive (see archive.TicketArchiver)
+            try:
+                archived = ArchiveSelector.get_archived_thread(kwargs[self.lookup_field])
+            except ValidationError:
+                archived = None
+            if archived is None:
+                raise
+            return Response(ArchivedMessageSerializer(archived).data)
+
+    def get_serializer_class(self):
+        # The full thread is only serialized for a single ticket
+        if self.action == 'list':
+            return MessageListSerializer
+        return super().get_serializer_class()
+
+    @swagger_auto_schema(
+        method='get',
+        responses={200: "Ticket counts per status and per agent (agent external_id -> status -> count), "
+                        "plus the realtime outbox depth"}
+    )
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        # One HGETALL on the incrementally maintained counters instead of a COUNT(*) per status
+        data = MessageCounters.snapshot()
+        # The outbox is near empty while the relay keeps up, growth here is what to alert on
+        data["outbox"] = OutboxRelay.depth()
+        return generic_response(data=data, message="Message stats")
 
     @swagger_auto_schema(
         request_body=MessageCreateSerializer,
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER],
         responses={201: "Message created"}
     )
+    @idempotent
     def create(self, request, *args, **kwargs):
         serializer = MessageCreateSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -95,9 +182,78 @@ class MessageViewSet(viewsets.ModelViewSet):
 
     @swagger_auto_schema(
         method='post',
-        request_body=MessageReplySerializer
+        request_body=MessageClaimNextSerializer,
+        responses={200: MessageListSerializer(many=True), 400: "Invalid agent or count"}
+    )
+    @action(detail=False, methods=['post'])
+    def claim_next(self, request):
+        """
+        Claim the next `count` highest-priority unassigned tickets for the agent.
+        Concurrent callers receive disjoint tickets; an empty list means the inbox is drained.
+        """
+        serializer = MessageClaimNextSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            claimed = MessageService.claim_next(
+                agent_external_id=str(serializer.validated_data['agent_id']),
+                count=serializer.validated_data['count']
+            )
+        except ApplicationError as e:
+            return generic_response(
+                message=str(e),
+                success=False,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        rows = MessageSelector.get_priority_inbox().filter(pk__in=[msg.pk for msg in claimed]) if claimed else []
+        return generic_response(
+            data=MessageListSerializer(rows, many=True).data,
+            message=f"Claimed {len(claimed)} messages"
+        )
+
+    @swagger_auto_schema(
+        method='post',
+        request_body=MessageBulkActionSerializer,
+        responses={200: "Per external_id result: ok, unchanged, not_found, closed or invalid", 400: "Invalid action or agent"}
+    )
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Close, reassign (agent_id: new owner) or unassign many tickets in one transaction.
+        """
+        serializer = MessageBulkActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        agent_id = serializer.validated_data.get('agent_id')
+        try:
+            results = MessageService.bulk_action(
+                action=serializer.validated_data['action'],
+                message_external_ids=serializer.validated_data['external_ids'],
+                agent_external_id=str(agent_id) if agent_id else None
+            )
+        except ApplicationError as e:
+            return generic_response(
+                message=str(e),
+                success=False,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        summary = {}
+        for result in results.values():
+            summary[result] = summary.get(result, 0) + 1
+        return generic_response(
+            data={"results": results, "summary": summary},
+            message=f"{summary.get('ok', 0)} of {len(results)} messages updated"
+        )
+
+    @swagger_auto_schema(
+        method='post',
+        request_body=MessageReplySerializer,
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER]
     )
     @action(detail=True, methods=['post'])
+    @idempotent
     def reply(self, request, external_id=None):
         serializer = MessageReplySerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -116,11 +272,34 @@ class MessageViewSet(viewsets.ModelViewSet):
                 status_code=status.HTTP_400_BAD_REQUEST
             )
 
+    @swagger_auto_schema(
+        method='get',
+        responses={200: MessageReplyObjectSerializer(many=True), 404: "Message not found"}
+    )
+    @action(detail=True, methods=['get'])
+    def replies(self, request, external_id=None):
+        """
+        Thread replies newest first; follow `next` to scroll back to older ones.
+        """
+        message_id = Message.objects.filter(external_id=external_id).values_list('id', flat=True).first()
+        if message_id is None:
+            return generic_response(
+                message="message not found",
+                success=False,
+                status_code=status.HTTP_404_NOT_FOUND
+            )
+
+        page = self.paginate_queryset(MessageSelector.get_message_replies(message_id))
+        serializer = MessageReplyObjectSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @swagger_auto_schema(
         method='post',
-        request_body=MessageCannedReplySerializer
+        request_body=MessageCannedReplySerializer,
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER]
     )
     @action(detail=True, methods=['post'])
+    @idempotent
     def use_canned(self, request, external_id=None):
         serializer = MessageCannedReplySerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -141,9 +320,11 @@ class MessageViewSet(viewsets.ModelViewSet):
 
     @swagger_auto_schema(
         method='post',
-        request_body=CustomerReplySerializer
+        request_body=CustomerReplySerializer,
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER]
     )
     @action(detail=True, methods=['post'])
+    @idempotent
     def customer_reply(self, request, external_id=None):
         serializer = CustomerReplySerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -163,15 +344,81 @@ class MessageViewSet(viewsets.ModelViewSet):
 
 
 class CannedResponseViewSet(viewsets.ModelViewSet):
-    queryset = CannedResponse.objects.all()
+    queryset = CannedResponse.objects.order_by('id')
     serializer_class = CannedResponseSerializer
     lookup_field = 'external_id'
 
-    @method_decorator(cache_page(60 * 60 * 2))  # Cache for 2 hours
     def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        # Served from the two-level cache; saves and deletes invalidate it in every worker
+        page = self.paginate_queryset(CannedResponseSelector.list_all())
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
 class AgentViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Agent.objects.all()
     serializer_class = AgentSerializer
     lookup_field = 'external_id'
+
+    @swagger_auto_schema(
+        method='get',
+        manual_parameters=[openapi.Parameter('status', openapi.IN_QUERY, type=openapi.TYPE_STRING, default=Message.STATUS_IN_PROGRESS)],
+        responses={200: MessageListSerializer(many=True)}
+    )
+    @action(detail=True, methods=['get'])
+    def queue(self, request, external_id=None):
+        """
+        The agent's own tickets (in progress by default), highest priority first.
+        """
+        agent = self.get_object()
+        status_q = request.query_params.get('status', Message.STATUS_IN_PROGRESS)
+
+        paginator = KeysetPagination()
+        queryset = MessageSelector.get_agent_queue(agent.id, status_q, now=paginator.get_now(request))
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = MessageListSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class AnalyticsViewSet(viewsets.ViewSet):
+    @swagger_auto_schema(
+        query_serializer=AnalyticsQuerySerializer,
+        responses={200: "Hourly SLA metrics (overall, or for agent_id) and per-agent totals; durations in seconds"}
+    )
+    def list(self, request):
+        """
+        Time-to-claim, time-to-first-reply and handle time over [since, until), read from the rollups only.
+        """
+        serializer = AnalyticsQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        until = serializer.validated_data.get('until') or timezone.now()
+        since = serializer.validated_data.get('since') or until - ANALYTICS_DEFAULT_RANGE
+        if until - since > ANALYTICS_MAX_RANGE:
+            return generic_response(
+                message=f"Range must be at most {ANALYTICS_MAX_RANGE.days} days",
+                success=False,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        agent = None
+        if serializer.validated_data.get('agent_id'):
+            agent = Agent.objects.filter(external_id=serializer.validated_data['agent_id']).only('id').first()
+            if agent is None:
+                return generic_response(
+                    message="Invalid agent_id",
+                    success=False,
+                    status_code=status.HTTP_404_NOT_FOUND
+                )
+
+        hourly = AnalyticsSelector.get_hourly(since, until, agent.id if agent else None)
+        agents = AnalyticsSelector.get_agent_totals(since, until)
+        if agent:
+            agents = agents.filter(agent_id=agent.id)
+        return generic_response(
+            data={
+                "since": since,
+                "until": until,
+                "hourly": HourlySLAStatsSerializer(hourly, many=True).data,
+                "agents": AgentSLAStatsSerializer(agents, many=True).data,
+            },
+            message="SLA analytics"
+        )